@@ -0,0 +1,187 @@
+"""
+Adaptive pose inference for low-power machines
+Wraps MediaPipe Pose with the same process(rgb) interface and spends less
+CPU per frame: the model complexity follows a target FPS, frames arriving
+faster than that rate and low-motion frames skip inference entirely
+"""
+
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from pose_angles import landmarks_to_array
+
+# Stand-in for MediaPipe's result on frames where inference was skipped
+PoseResult = namedtuple('PoseResult', 'pose_landmarks pose_world_landmarks')
+
+MOTION_THUMBNAIL = (64, 36)
+
+
+def default_pose_factory(complexity):
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=complexity,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+class AdaptivePose:
+    """
+    Drop-in replacement for mp.solutions.pose.Pose in FramePipeline.
+
+    - Complexity: the average inference latency of the active model is kept
+      under 1 / target_fps by stepping between complexities 0/1/2; after a
+      switch the new model gets `window` frames before it is judged again.
+    - Frame-rate skip: a frame arriving less than 1 / target_fps after the
+      last inferred frame reuses the last pose. Every inferred frame is a
+      full frame, so MediaPipe's video-mode tracking (which already crops
+      to the person found in the previous frame) keeps consistent state.
+    - Motion skip: if a small grayscale thumbnail changed by less than
+      `motion_threshold` (mean absolute difference, 0-255) since the last
+      inferred frame, up to `max_skip` frames in a row reuse the last pose,
+      extrapolated linearly from the last two inferred poses when those were
+      themselves low-motion (held as is after a jump).
+    """
+
+    def __init__(self, target_fps=15.0, complexities=(0, 1, 2), initial_complexity=1,
+                 motion_threshold=2.0, max_skip=2, window=30,
+                 pose_factory=default_pose_factory):
+        self.budget = 1.0 / target_fps
+        self.target_fps = target_fps
+        self.complexities = tuple(complexities)
+        self.level = self.complexities.index(initial_complexity)
+        self.window = window
+        self.pose_factory = pose_factory
+        self.models = {}
+        self.latency = {}
+        self.frames_since_switch = 0
+        self.switches = 0
+
+        self.last_inferred_at = None
+
+        self.motion_threshold = motion_threshold
+        self.max_skip = max_skip
+        self.thumbnail = None
+        self.steady = False
+        self.skipped_in_row = 0
+
+        # Last two inferred poses as (timestamp, (33, 4) full-frame array, result)
+        self.history = []
+
+        self.inferred = 0
+        self.skipped = 0
+        self.throttled = 0
+
+    @property
+    def complexity(self):
+        return self.complexities[self.level]
+
+    def process(self, rgb):
+        now = time.perf_counter()
+        if self.history and now - self.last_inferred_at < self.budget:
+            self.throttled += 1
+            return self._extrapolate(now)
+
+        thumbnail = self._thumbnail(rgb)
+        if self._can_skip(thumbnail):
+            self.skipped += 1
+            self.skipped_in_row += 1
+            return self._extrapolate(now)
+
+        self.skipped_in_row = 0
+        self.steady = self.thumbnail is not None and self._motion(thumbnail) < self.motion_threshold
+        self.thumbnail = thumbnail
+
+        start = time.perf_counter()
+        result = self._model().process(rgb)
+        self._record_latency(time.perf_counter() - start)
+        self.inferred += 1
+        self.last_inferred_at = now
+
+        if result.pose_landmarks:
+            landmarks = landmarks_to_array(result.pose_landmarks.landmark)
+            self.history = (self.history + [(now, landmarks, result)])[-2:]
+        else:
+            self.history = []
+        return result
+
+    def stats(self):
+        return {
+            'complexity': self.complexity,
+            'switches': self.switches,
+            'inferred': self.inferred,
+            'skipped': self.skipped,
+            'throttled': self.throttled,
+            'latency_ms': {c: round(1000 * s, 2) for c, s in self.latency.items()},
+        }
+
+    def close(self):
+        for model in self.models.values():
+            model.close()
+        self.models.clear()
+
+    # Inference
+
+    def _model(self):
+        complexity = self.complexity
+        if complexity not in self.models:
+            self.models[complexity] = self.pose_factory(complexity)
+        return self.models[complexity]
+
+    def _record_latency(self, seconds):
+        complexity = self.complexity
+        previous = self.latency.get(complexity)
+        self.latency[complexity] = seconds if previous is None else 0.9 * previous + 0.1 * seconds
+        self.frames_since_switch += 1
+        if self.frames_since_switch < self.window:
+            return
+
+        average = self.latency[complexity]
+        if average > self.budget and self.level > 0:
+            self._switch(self.level - 1)
+        elif average < 0.5 * self.budget and self.level < len(self.complexities) - 1:
+            # Only step up if the heavier model has not already proven too slow
+            heavier = self.latency.get(self.complexities[self.level + 1])
+            if heavier is None or heavier < 0.9 * self.budget:
+                self._switch(self.level + 1)
+
+    def _switch(self, level):
+        self.level = level
+        self.frames_since_switch = 0
+        self.switches += 1
+
+    # Motion skip
+
+    def _thumbnail(self, rgb):
+        small = cv2.resize(rgb, MOTION_THUMBNAIL, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY).astype(np.int16)
+
+    def _can_skip(self, thumbnail):
+        if self.thumbnail is None or not self.history or self.skipped_in_row >= self.max_skip:
+            return False
+        return self._motion(thumbnail) < self.motion_threshold
+
+    def _motion(self, thumbnail):
+        return float(np.abs(thumbnail - self.thumbnail).mean())
+
+    def _extrapolate(self, now):
+        t_last, last, result = self.history[-1]
+        landmarks = last
+        if len(self.history) == 2 and self.steady:
+            t_prev, prev, _ = self.history[0]
+            if t_last > t_prev:
+                # Clamp to one inference interval ahead so errors cannot run away
+                step = min((now - t_last) / (t_last - t_prev), 1.0)
+                landmarks = last + (last - prev) * step
+                landmarks[:, 3] = last[:, 3]
+
+        pose_landmarks = type(result.pose_landmarks)()
+        pose_landmarks.CopyFrom(result.pose_landmarks)
+        for lm, (x, y, z, _) in zip(pose_landmarks.landmark, landmarks):
+            lm.x, lm.y, lm.z = float(x), float(y), float(z)
+        return PoseResult(pose_landmarks, getattr(result, 'pose_world_landmarks', None))
@@ -0,0 +1,183 @@
+"""
+Server-side rep analytics
+Per-session summaries and per-exercise trends computed with NumPy from rep
+rows, so the dashboard downloads a small summary instead of every row
+"""
+
+import numpy as np
+
+from exercise_rules import EXERCISES
+
+# Reps (within a session) or sessions (within a trend) per rolling average
+ROLLING_WINDOW = 5
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    """Trailing mean over the last `window` values, ignoring NaN (NaN if all are)"""
+    values = np.asarray(values, dtype=np.float64)
+    measured = ~np.isnan(values)
+    sums = np.cumsum(np.where(measured, values, 0.0))
+    counts = np.cumsum(measured).astype(np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+
+
+def trend(values):
+    """Least-squares slope per step (0 with fewer than two values)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return 0.0
+    return float(np.polyfit(np.arange(len(values)), values, 1)[0])
+
+
+def perfect_ratios(perfect_frames, standard_frames):
+    """Share of in-range frames that were also perfect, 0 where nothing was in range"""
+    perfect = np.asarray(perfect_frames, dtype=np.float64)
+    standard = np.asarray(standard_frames, dtype=np.float64)
+    return np.divide(perfect, standard, out=np.zeros_like(perfect), where=standard > 0)
+
+
+def frame_scores(ratios):
+    """rep_scoring.score_from_ratio over an array of perfect ratios"""
+    ratios = np.asarray(ratios, dtype=np.float64)
+    return np.select(
+        [ratios > 0.8, ratios > 0.5],
+        [95 + 5 * (ratios - 0.8) / 0.2, 85 + 10 * (ratios - 0.5) / 0.3],
+        75 + 10 * ratios / 0.5
+    )
+
+
+def range_of_motion(best_angles, exercise, rules=EXERCISES):
+    """Degrees moved away from the rest angle (larger is better), or None for unknown exercises"""
+    if exercise not in rules:
+        return None
+    i = rules.index[exercise]
+    return (np.asarray(best_angles, dtype=np.float64) - rules.rest[i]) * rules.sign[i]
+
+
+def _round(values, digits=2):
+    """JSON-ready list; NaN (no measurement) becomes None"""
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def _thirds(values):
+    """(mean of first third, mean of last third) to show change across a series"""
+    third = max(1, len(values) // 3)
+    return float(np.mean(values[:third])), float(np.mean(values[-third:]))
+
+
+def session_summary(session, reps, form_counts, rules=EXERCISES, window=ROLLING_WINDOW):
+    """
+    Summary of one session from its row, its rep rows (dicts ordered by
+    rep_number) and {form_status: count} of its form events. Per-rep values
+    are returned as parallel arrays for the dashboard's rep cards.
+    """
+    exercise = session['exercise_type']
+    scores = np.array([r['score'] for r in reps], dtype=np.float64)
+    # A rep posted without an angle has no range of motion (NaN -> None), not 180 - 0
+    angles = np.array([r['best_angle'] if r['best_angle'] is not None else np.nan for r in reps],
+                      dtype=np.float64)
+    perfect = [r['perfect_frames'] or 0 for r in reps]
+    standard = [r['standard_frames'] or 0 for r in reps]
+    ratios = perfect_ratios(perfect, standard)
+    rom = range_of_motion(angles, exercise, rules)
+    sides = [r['tracked_side'] or 'NONE' for r in reps]
+
+    summary = {
+        'session_id': session['id'],
+        'exercise_type': exercise,
+        'session_mode': session['session_mode'],
+        'status': session['status'],
+        'start_time': session['start_time'],
+        'duration_seconds': session['duration_seconds'],
+        'total_reps': len(reps),
+        'reps': {
+            'rep_number': [r['rep_number'] for r in reps],
+            'score': _round(scores, 1),
+            'frame_score': _round(frame_scores(ratios), 1),
+            'perfect_ratio': _round(ratios, 3),
+            'best_angle': _round(angles, 1),
+            'range_of_motion': _round(rom, 1) if rom is not None else None,
+            'tracked_side': sides,
+        },
+        'perfect_ratio': round(float(ratios.mean()), 3) if len(reps) else 0.0,
+        'sides': {side: sides.count(side) for side in sorted(set(sides))},
+        'form': form_counts,
+    }
+    if not len(reps):
+        summary['score'] = summary['range_of_motion'] = None
+        return summary
+
+    first, last = _thirds(scores)
+    summary['score'] = {
+        'mean': round(float(scores.mean()), 2),
+        'min': round(float(scores.min()), 2),
+        'max': round(float(scores.max()), 2),
+        'std': round(float(scores.std()), 2),
+        'rolling': _round(rolling_mean(scores, window)),
+        'trend_per_rep': round(trend(scores), 3),
+        'first_third': round(first, 2),
+        'last_third': round(last, 2),
+    }
+    measured = rom[~np.isnan(rom)] if rom is not None else ()
+    if not len(measured):
+        summary['range_of_motion'] = None
+    else:
+        first, last = _thirds(measured)
+        summary['range_of_motion'] = {
+            'best': round(float(measured.max()), 1),
+            'mean': round(float(measured.mean()), 1),
+            'rolling': _round(rolling_mean(rom, window), 1),
+            'trend_per_rep': round(trend(measured), 3),
+            'first_third': round(first, 1),
+            'last_third': round(last, 1),
+        }
+    return summary
+
+
+def exercise_trends(exercise, sessions, rules=EXERCISES, window=ROLLING_WINDOW):
+    """
+    Progression across completed sessions of one exercise. `sessions` are
+    (session_id, start_time, average_score, total_reps, perfect_frames,
+    standard_frames, min_angle, max_angle) rows, oldest first.
+    """
+    if not sessions:
+        return {'exercise_type': exercise, 'sessions': 0, 'series': None}
+
+    ids, starts, scores, reps, perfect, standard, min_angle, max_angle = zip(*sessions)
+    scores = np.array(scores, dtype=np.float64)
+    ratios = perfect_ratios([p or 0 for p in perfect], [s or 0 for s in standard])
+
+    # The best rep of a session is its largest angle for rising exercises, smallest for falling
+    if exercise in rules and rules.rising(exercise):
+        best = np.array([a if a is not None else np.nan for a in max_angle], dtype=np.float64)
+    else:
+        best = np.array([a if a is not None else np.nan for a in min_angle], dtype=np.float64)
+    rom = range_of_motion(best, exercise, rules)
+
+    series = {
+        'session_id': list(ids),
+        'start_time': list(starts),
+        'total_reps': list(reps),
+        'average_score': _round(scores),
+        'rolling_score': _round(rolling_mean(scores, window)),
+        'perfect_ratio': _round(ratios, 3),
+        'rolling_perfect_ratio': _round(rolling_mean(ratios, window), 3),
+    }
+    result = {
+        'exercise_type': exercise,
+        'sessions': len(ids),
+        'window': window,
+        'score_trend_per_session': round(trend(scores), 3),
+        'perfect_ratio_trend_per_session': round(trend(ratios), 4),
+        'series': series,
+    }
+    if rom is not None:
+        # Sessions without reps have no range of motion (NaN -> None)
+        measured = rom[~np.isnan(rom)]
+        series['range_of_motion'] = _round(rom, 1)
+        series['rolling_range_of_motion'] = _round(rolling_mean(rom, window), 1)
+        result['range_of_motion_trend_per_session'] = round(trend(measured), 3)
+        result['best_range_of_motion'] = round(float(measured.max()), 1) if len(measured) else None
+    return result
@@ -1,25 +1,75 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from contextlib import contextmanager
 from datetime import datetime
+import base64
 import json
 import os
+import time
+
+from analytics import exercise_trends, session_summary
+from bulk_transfer import (FORMATS, TABLE_COLUMNS, batched, encode_stream, fetch_batches, json_default,
+                           read_columnar, read_ndjson, spool)
+from db_pool import pool_from_env
+from ingest_queue import IngestError, queue_from_env
+from landmark_store import save_stream
+from live_events import LiveEvents, PostgresLiveEvents, live_message
+from metrics import CONTENT_TYPE, MetricsRegistry, sql_label
+from migrations import migrate
+from profiler import SamplingProfiler
+from repository import FORM_EVENT_INSERT_COLUMNS, REP_INSERT_COLUMNS, SESSION_FILTERS, Repository
+from response_cache import cache_from_env
+from retention import ensure_partitions
+
+class ApiJSONProvider(DefaultJSONProvider):
+    """Timestamps as ISO 8601 (PostgreSQL rows carry datetime, SQLite rows ISO text)"""
+    # Keys keep the column order of the query; sorting them is wasted work per response
+    sort_keys = False
+    
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = ApiJSONProvider(app)
 CORS(app)
 
+# Prometheus metrics served on /metrics; METRICS_DIR merges all gunicorn workers
+metrics = MetricsRegistry(directory=os.environ.get('METRICS_DIR'))
+request_duration = metrics.histogram(
+    'physio_http_request_duration_seconds', 'API request latency by route',
+    ('method', 'route', 'status'))
+query_duration = metrics.histogram(
+    'physio_db_query_duration_seconds', 'Database statement latency by statement type and table',
+    ('statement',))
+
+def observe_query(sql, seconds):
+    query_duration.observe(seconds, statement=sql_label(sql))
+
+# Sampling profiler behind GET /api/debug/profile (off unless enabled)
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')
+MIN_PROFILE_SECONDS = 0.1
+MAX_PROFILE_SECONDS = 60
+
 # Database configuration - supports both PostgreSQL and SQLite
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
 if DATABASE_URL:
     # PostgreSQL for production (Render)
     import psycopg2
-    from psycopg2.extras import RealDictCursor
     from urllib.parse import urlparse
     
+    # Rows rejected by the database during a bulk import
+    IMPORT_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+    
     # Parse database URL
     url = urlparse(DATABASE_URL)
     
-    def get_db_connection():
+    def _connect():
         """Create PostgreSQL connection"""
         return psycopg2.connect(
             host=url.hostname,
@@ -81,6 +131,11 @@ if DATABASE_URL:
         
         conn.commit()
         cursor.close()
+        
+        # Indexes and later schema changes
+        migrate(conn, 'postgres')
+        # Monthly reps/form_events partitions for now and the next months
+        ensure_partitions(conn)
         conn.close()
         print("PostgreSQL database initialized successfully")
     
@@ -88,12 +143,27 @@ else:
     # SQLite for local development
     import sqlite3
     
-    DATABASE = 'physio_tracker.db'
+    DATABASE = os.environ.get('SQLITE_PATH', 'physio_tracker.db')
+    
+    # WAL lets readers run alongside the writer, and NORMAL only fsyncs at
+    # checkpoints (a power cut can lose the last commits, never corrupt)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    # Seconds a writer waits for another connection's lock before "database is locked"
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 10))
+    # Prepared statements kept per connection, keyed by SQL text
+    SQLITE_STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
     
-    def get_db_connection():
+    # Rows rejected by the database during a bulk import
+    IMPORT_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+    
+    def _connect():
         """Create SQLite connection"""
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
+        # Pooled connections are handed between request threads, one at a time
+        conn = sqlite3.connect(DATABASE, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=SQLITE_STATEMENT_CACHE)
+        conn.execute(f'PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous = {SQLITE_SYNCHRONOUS}')
         return conn
     
     def init_db():
@@ -147,12 +217,192 @@ else:
         ''')
         
         conn.commit()
+        cursor.close()
+        
+        # Indexes and later schema changes
+        migrate(conn, 'sqlite')
         conn.close()
         print("SQLite database initialized successfully")
 
+# Connection pool shared by all requests in this worker process
+db_pool = pool_from_env(_connect, on_query=observe_query)
+
+def get_db_connection():
+    """Check out a pooled connection; close() returns it to the pool"""
+    return db_pool.acquire()
+
+@contextmanager
+def db_cursor():
+    """Cursor of a pooled connection; both are released when the block exits"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+# Every query of the API, compiled for the configured backend
+repository = Repository('postgres' if DATABASE_URL else 'sqlite')
+
+# Cached GET responses, invalidated by the write endpoints below
+response_cache = cache_from_env()
+
+# Live rep/form event/session updates for GET /api/sessions/<id>/stream
+live_events = PostgresLiveEvents(_connect) if DATABASE_URL else LiveEvents()
+LIVE_STREAM_TIMEOUT = float(os.environ.get('LIVE_STREAM_TIMEOUT', 300))
+# Off when gunicorn runs sync workers (see gunicorn.conf.py): an open stream
+# would block every other request of its worker until it ends
+LIVE_STREAMING = os.environ.get('LIVE_STREAMING', '1').lower() in ('1', 'true', 'yes')
+
+metrics.gauge('physio_db_pool_connections', 'Database connections of this worker by state',
+              lambda: {(state,): db_pool.stats()[state] for state in ('opened', 'idle', 'checked_out')},
+              ('state',))
+metrics.counter_callback('physio_cache_requests_total', 'Response cache lookups by result',
+                         lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses},
+                         ('result',))
+metrics.gauge('physio_live_subscribers', 'Open live session streams',
+              lambda: live_events.stats()['subscribers'])
+
 # Initialize database on startup
 init_db()
 
+# Frame-level landmark recordings, one .npy file per session
+LANDMARK_DIR = os.environ.get('LANDMARK_DIR', 'landmarks')
+
+def landmark_path(session_id):
+    """Where the landmark recording of a session is stored"""
+    return os.path.join(LANDMARK_DIR, f'session_{session_id}.npy')
+
+# Session list pagination
+SESSIONS_PAGE_SIZE = 50
+MAX_SESSIONS_PAGE_SIZE = 200
+
+def encode_cursor(start_time, session_id):
+    """Opaque pagination cursor for the last row of a page"""
+    raw = json.dumps([start_time, session_id], default=json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; None when no cursor was given"""
+    if not cursor:
+        return None
+    start_time, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return str(start_time), int(session_id)
+
+def rebuild_exercise_stats():
+    """Recompute the exercise_stats rollup from the sessions table"""
+    write_transaction(repository.rebuild_exercise_stats)
+    response_cache.invalidate('stats')
+
+def rep_row(session_id, rep, now):
+    """Insert tuple for a reps row; raises KeyError/TypeError on a bad payload"""
+    return (
+        session_id,
+        rep['rep_number'],
+        rep['score'],
+        rep.get('perfect_frames', 0),
+        rep.get('standard_frames', 0),
+        rep.get('timestamp', now),
+        rep.get('tracked_side', 'NONE'),
+        rep.get('best_angle')
+    )
+
+def form_event_row(session_id, event, now):
+    """Insert tuple for a form_events row; raises KeyError/TypeError on a bad payload"""
+    return (
+        session_id,
+        event['event_type'],
+        event.get('timestamp', now),
+        event.get('angle', 0.0),
+        event.get('form_status', 'NONE'),
+        event.get('feedback_message', '')
+    )
+
+def write_events(rep_rows, event_rows):
+    """Insert rows and commit them as one transaction, then publish them live"""
+    messages = ([live_message('rep', row[0], dict(zip(REP_INSERT_COLUMNS, row))) for row in rep_rows] +
+                [live_message('form_event', row[0], dict(zip(FORM_EVENT_INSERT_COLUMNS, row)))
+                 for row in event_rows])
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            repository.insert_events(cursor, rep_rows, event_rows)
+            # Late rows for a completed session make its stored summary stale
+            repository.delete_summaries(cursor, {row[0] for row in rep_rows} | {row[0] for row in event_rows})
+            live_events.before_commit(cursor, messages)
+            conn.commit()
+        finally:
+            cursor.close()
+    live_events.after_commit(messages)
+
+def invalidate_event_sessions(rep_rows, event_rows):
+    """Drop cached session details touched by newly written rows"""
+    session_ids = {row[0] for row in rep_rows} | {row[0] for row in event_rows}
+    if session_ids:
+        response_cache.invalidate(*(f'session:{sid}' for sid in session_ids))
+
+# Write-behind queue for rep/form-event ingestion (None when INGEST_MODE=sync).
+# SQLite defaults to 'commit' mode, so each worker has a single writer thread.
+ingest_queue = queue_from_env(write_events, on_commit=invalidate_event_sessions,
+                              default_mode='sync' if DATABASE_URL else 'commit')
+
+def write_transaction(work):
+    """
+    Run work(cursor) as one committed transaction and return its result.
+    On SQLite with an ingest queue it runs on the queue's writer thread, so
+    all writes of this worker go through one thread and never wait on a
+    write lock held by another thread of the same worker.
+    """
+    def run():
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                result = work(cursor)
+                conn.commit()
+                return result
+            finally:
+                cursor.close()
+    
+    if ingest_queue is not None and not DATABASE_URL:
+        return ingest_queue.run(run)
+    return run()
+
+if ingest_queue:
+    metrics.gauge('physio_ingest_queue_depth', 'Batches waiting for the ingest writer', ingest_queue.depth)
+    metrics.counter_callback(
+        'physio_ingest_items_total', 'Ingest queue batches by outcome',
+        lambda: {(outcome,): getattr(ingest_queue, outcome) for outcome in ('accepted', 'rejected')},
+        ('outcome',))
+
+def store_events(rep_rows, event_rows):
+    """Write rows now, or hand them to the ingest queue; returns a response"""
+    counts = {'reps': len(rep_rows), 'form_events': len(event_rows)}
+    
+    if ingest_queue is None:
+        write_events(rep_rows, event_rows)
+        invalidate_event_sessions(rep_rows, event_rows)
+        return jsonify({'status': 'success', **counts})
+    
+    try:
+        accepted = ingest_queue.submit(rep_rows, event_rows)
+    except IngestError as e:
+        return jsonify({'error': f'Rows were not written: {e}'}), 500
+    if not accepted:
+        response = jsonify({'error': 'Ingestion queue is full, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    if ingest_queue.durability == 'commit':
+        # Committed by the writer thread before submit() returned
+        return jsonify({'status': 'success', **counts})
+    return jsonify({'status': 'queued', **counts}), 202
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the /api/stats rollup from raw session data"""
+    rebuild_exercise_stats()
+    print("Exercise stats rebuilt")
+
 @app.route('/')
 def index():
     """Main exercise tracking page"""
@@ -164,343 +414,276 @@ def analysis():
     return render_template('analysis.html')
 
 @app.route('/api/sessions', methods=['GET', 'POST'])
+@response_cache.cached('sessions')
 def sessions():
     """Handle session creation and retrieval"""
     if request.method == 'POST':
         data = request.json
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if DATABASE_URL:
-            # PostgreSQL
-            cursor.execute('''
-                INSERT INTO sessions (exercise_type, session_mode, start_time, status)
-                VALUES (%s, %s, %s, 'active')
-                RETURNING id
-            ''', (data['exercise_type'], data['session_mode'], datetime.now()))
-            session_id = cursor.fetchone()[0]
-        else:
-            # SQLite
-            cursor.execute('''
-                INSERT INTO sessions (exercise_type, session_mode, start_time, status)
-                VALUES (?, ?, ?, 'active')
-            ''', (data['exercise_type'], data['session_mode'], datetime.now().isoformat()))
-            session_id = cursor.lastrowid
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        session_id = write_transaction(lambda cursor: repository.create_session(
+            cursor, data['exercise_type'], data['session_mode'],
+            data.get('start_time', datetime.now().isoformat())))
+        response_cache.invalidate('sessions')
         
         return jsonify({'session_id': session_id, 'status': 'success'})
     
     else:  # GET
-        conn = get_db_connection()
-        
-        if DATABASE_URL:
-            # PostgreSQL
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute('SELECT * FROM sessions ORDER BY start_time DESC')
-            sessions = [dict(row) for row in cursor.fetchall()]
-            # Convert datetime objects to ISO format strings
-            for session in sessions:
-                if session['start_time']:
-                    session['start_time'] = session['start_time'].isoformat()
-                if session['end_time']:
-                    session['end_time'] = session['end_time'].isoformat()
-        else:
-            # SQLite
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM sessions ORDER BY start_time DESC')
-            sessions = [dict(row) for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'sessions': sessions})
+        try:
+            limit = int(request.args.get('limit', SESSIONS_PAGE_SIZE))
+            after = decode_cursor(request.args.get('cursor'))
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        limit = max(1, min(limit, MAX_SESSIONS_PAGE_SIZE))
+        
+        # Keyset pagination on (start_time, id), newest first
+        with db_cursor() as cursor:
+            sessions = repository.list_sessions(cursor, limit + 1, after,
+                                                {arg: request.args.get(arg) for arg in SESSION_FILTERS})
+        
+        next_cursor = None
+        if len(sessions) > limit:
+            sessions = sessions[:limit]
+            next_cursor = encode_cursor(sessions[-1]['start_time'], sessions[-1]['id'])
+        
+        return jsonify({'sessions': sessions, 'next_cursor': next_cursor})
 
 @app.route('/api/sessions/<int:session_id>', methods=['GET', 'PUT'])
+@response_cache.cached('session:{session_id}')
 def session_detail(session_id):
     """Get or update a specific session"""
-    conn = get_db_connection()
-    
     if request.method == 'PUT':
         data = request.json
-        cursor = conn.cursor()
-        
-        if DATABASE_URL:
-            # PostgreSQL
-            cursor.execute('''
-                UPDATE sessions
-                SET end_time = %s,
-                    total_reps = %s,
-                    average_score = %s,
-                    duration_seconds = %s,
-                    status = %s
-                WHERE id = %s
-            ''', (
-                data.get('end_time', datetime.now()),
-                data.get('total_reps', 0),
-                data.get('average_score', 0.0),
-                data.get('duration_seconds', 0),
-                data.get('status', 'completed'),
-                session_id
-            ))
-        else:
-            # SQLite
-            cursor.execute('''
-                UPDATE sessions
-                SET end_time = ?,
-                    total_reps = ?,
-                    average_score = ?,
-                    duration_seconds = ?,
-                    status = ?
-                WHERE id = ?
-            ''', (
+        # Explicit nulls count as defaults; the stats rollup columns are NOT NULL
+        status = data.get('status') or 'completed'
+        total_reps = data.get('total_reps') or 0
+        average_score = data.get('average_score') or 0.0
+        duration_seconds = data.get('duration_seconds') or 0
+        messages = [live_message('session', session_id, {
+            'status': status,
+            'total_reps': total_reps,
+            'average_score': average_score,
+            'duration_seconds': duration_seconds
+        })]
+        
+        def update(cursor):
+            previous = repository.lock_session(cursor, session_id)
+            repository.update_session(
+                cursor, session_id,
                 data.get('end_time', datetime.now().isoformat()),
-                data.get('total_reps', 0),
-                data.get('average_score', 0.0),
-                data.get('duration_seconds', 0),
-                data.get('status', 'completed'),
-                session_id
-            ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+                total_reps,
+                average_score,
+                duration_seconds,
+                status
+            )
+            
+            # Keep the /api/stats rollup in step within the same transaction
+            if previous:
+                exercise_type, old_status, old_reps, old_score = previous
+                if old_status == 'completed':
+                    repository.update_exercise_stats(cursor, exercise_type, -1, -(old_reps or 0), -(old_score or 0))
+                if status == 'completed':
+                    repository.update_exercise_stats(cursor, exercise_type, 1, total_reps, average_score)
+            repository.delete_summaries(cursor, [session_id])
+            live_events.before_commit(cursor, messages)
+        
+        write_transaction(update)
+        response_cache.invalidate(f'session:{session_id}', 'sessions', 'stats')
+        live_events.after_commit(messages)
         
         return jsonify({'status': 'success'})
     
     else:  # GET
-        if DATABASE_URL:
-            # PostgreSQL
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute('SELECT * FROM sessions WHERE id = %s', (session_id,))
-            session = cursor.fetchone()
-            
-            if not session:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Session not found'}), 404
-            
-            session_data = dict(session)
-            # Convert datetime objects
-            if session_data['start_time']:
-                session_data['start_time'] = session_data['start_time'].isoformat()
-            if session_data['end_time']:
-                session_data['end_time'] = session_data['end_time'].isoformat()
-            
-            # Get all reps for this session
-            cursor.execute('''
-                SELECT * FROM reps 
-                WHERE session_id = %s 
-                ORDER BY rep_number
-            ''', (session_id,))
-            reps = [dict(row) for row in cursor.fetchall()]
-            for rep in reps:
-                if rep['timestamp']:
-                    rep['timestamp'] = rep['timestamp'].isoformat()
-            
-            # Get form events
-            cursor.execute('''
-                SELECT * FROM form_events 
-                WHERE session_id = %s 
-                ORDER BY timestamp
-            ''', (session_id,))
-            events = [dict(row) for row in cursor.fetchall()]
-            for event in events:
-                if event['timestamp']:
-                    event['timestamp'] = event['timestamp'].isoformat()
-        else:
-            # SQLite
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM sessions WHERE id = ?', (session_id,))
-            session = cursor.fetchone()
-            
-            if not session:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Session not found'}), 404
-            
-            session_data = dict(session)
-            
-            # Get all reps
-            cursor.execute('''
-                SELECT * FROM reps 
-                WHERE session_id = ? 
-                ORDER BY rep_number
-            ''', (session_id,))
-            reps = [dict(row) for row in cursor.fetchall()]
-            
-            # Get form events
-            cursor.execute('''
-                SELECT * FROM form_events 
-                WHERE session_id = ? 
-                ORDER BY timestamp
-            ''', (session_id,))
-            events = [dict(row) for row in cursor.fetchall()]
+        with db_cursor() as cursor:
+            session = repository.get_session(cursor, session_id)
         
-        session_data['reps'] = reps
-        session_data['events'] = events
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(session_data)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        return jsonify(session)
 
 @app.route('/api/reps', methods=['POST'])
 def add_rep():
     """Add a new rep to a session"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    if DATABASE_URL:
-        # PostgreSQL
-        cursor.execute('''
-            INSERT INTO reps (session_id, rep_number, score, perfect_frames, 
-                             standard_frames, timestamp, tracked_side, best_angle)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            data['session_id'],
-            data['rep_number'],
-            data['score'],
-            data.get('perfect_frames', 0),
-            data.get('standard_frames', 0),
-            datetime.now(),
-            data.get('tracked_side', 'NONE'),
-            data.get('best_angle', 0.0)
-        ))
-    else:
-        # SQLite
-        cursor.execute('''
-            INSERT INTO reps (session_id, rep_number, score, perfect_frames, 
-                             standard_frames, timestamp, tracked_side, best_angle)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['session_id'],
-            data['rep_number'],
-            data['score'],
-            data.get('perfect_frames', 0),
-            data.get('standard_frames', 0),
-            datetime.now().isoformat(),
-            data.get('tracked_side', 'NONE'),
-            data.get('best_angle', 0.0)
-        ))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        row = rep_row(data['session_id'], data, datetime.now().isoformat())
+    except (KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid rep payload: {e}'}), 400
     
-    return jsonify({'status': 'success'})
+    return store_events([row], [])
 
 @app.route('/api/form_events', methods=['POST'])
 def add_form_event():
     """Log form feedback events"""
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    try:
+        row = form_event_row(data['session_id'], data, datetime.now().isoformat())
+    except (KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid form event payload: {e}'}), 400
     
-    if DATABASE_URL:
-        # PostgreSQL
-        cursor.execute('''
-            INSERT INTO form_events (session_id, event_type, timestamp, angle, 
-                                    form_status, feedback_message)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (
-            data['session_id'],
-            data['event_type'],
-            datetime.now(),
-            data.get('angle', 0.0),
-            data.get('form_status', 'NONE'),
-            data.get('feedback_message', '')
-        ))
-    else:
-        # SQLite
-        cursor.execute('''
-            INSERT INTO form_events (session_id, event_type, timestamp, angle, 
-                                    form_status, feedback_message)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            data['session_id'],
-            data['event_type'],
-            datetime.now().isoformat(),
-            data.get('angle', 0.0),
-            data.get('form_status', 'NONE'),
-            data.get('feedback_message', '')
-        ))
+    return store_events([], [row])
+
+@app.route('/api/sessions/<int:session_id>/events:batch', methods=['POST'])
+def add_events_batch(session_id):
+    """Add many reps and form events to a session in one transaction"""
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be an object with reps and form_events'}), 400
+    reps = data.get('reps', [])
+    form_events = data.get('form_events', [])
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    if not isinstance(reps, list) or not isinstance(form_events, list):
+        return jsonify({'error': 'reps and form_events must be arrays'}), 400
     
-    return jsonify({'status': 'success'})
+    now = datetime.now().isoformat()
+    
+    try:
+        rep_rows = [rep_row(session_id, rep, now) for rep in reps]
+        event_rows = [form_event_row(session_id, event, now) for event in form_events]
+    except (KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid event payload: {e}'}), 400
+    
+    return store_events(rep_rows, event_rows)
 
-@app.route('/api/stats')
-def get_stats():
-    """Get overall statistics"""
-    conn = get_db_connection()
+@app.route('/api/sessions/<int:session_id>/stream')
+def session_stream(session_id):
+    """Server-Sent Events stream of a session's reps, form events and updates"""
+    if not LIVE_STREAMING:
+        return jsonify({'error': 'Live streaming needs gthread or gevent workers '
+                                 '(set GUNICORN_WORKER_CLASS and LIVE_STREAMING=1)'}), 501
+    return Response(
+        stream_with_context(live_events.stream(session_id, timeout=LIVE_STREAM_TIMEOUT)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/sessions/<int:session_id>/landmarks', methods=['GET', 'PUT'])
+def session_landmarks(session_id):
+    """Upload (streamed) or download a session's landmark recording"""
+    path = landmark_path(session_id)
     
-    if DATABASE_URL:
-        # PostgreSQL
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Total sessions
-        cursor.execute("SELECT COUNT(*) as count FROM sessions WHERE status = 'completed'")
-        total_sessions = cursor.fetchone()['count']
-        
-        # Total reps
-        cursor.execute("SELECT SUM(total_reps) as total FROM sessions WHERE status = 'completed'")
-        result = cursor.fetchone()
-        total_reps = result['total'] if result['total'] else 0
-        
-        # Average score
-        cursor.execute("SELECT AVG(average_score) as avg FROM sessions WHERE status = 'completed'")
-        result = cursor.fetchone()
-        overall_avg = result['avg'] if result['avg'] else 0
-        
-        # Exercise breakdown
-        cursor.execute('''
-            SELECT exercise_type, 
-                   COUNT(*) as session_count,
-                   SUM(total_reps) as total_reps,
-                   AVG(average_score) as avg_score
-            FROM sessions 
-            WHERE status = 'completed'
-            GROUP BY exercise_type
-        ''')
-        exercise_breakdown = [dict(row) for row in cursor.fetchall()]
-    else:
-        # SQLite
-        cursor = conn.cursor()
-        
-        # Total sessions
-        cursor.execute("SELECT COUNT(*) as count FROM sessions WHERE status = 'completed'")
-        total_sessions = cursor.fetchone()['count']
+    if request.method == 'PUT':
+        with db_cursor() as cursor:
+            exists = repository.session_exists(cursor, session_id)
         
-        # Total reps
-        cursor.execute("SELECT SUM(total_reps) as total FROM sessions WHERE status = 'completed'")
-        result = cursor.fetchone()
-        total_reps = result['total'] if result['total'] else 0
+        if not exists:
+            return jsonify({'error': 'Session not found'}), 404
         
-        # Average score
-        cursor.execute("SELECT AVG(average_score) as avg FROM sessions WHERE status = 'completed'")
-        result = cursor.fetchone()
-        overall_avg = result['avg'] if result['avg'] else 0
+        try:
+            frames = save_stream(request.stream, path)
+        except (ValueError, EOFError) as e:
+            return jsonify({'error': f'Invalid landmark recording: {e}'}), 400
         
-        # Exercise breakdown
-        cursor.execute('''
-            SELECT exercise_type, 
-                   COUNT(*) as session_count,
-                   SUM(total_reps) as total_reps,
-                   AVG(average_score) as avg_score
-            FROM sessions 
-            WHERE status = 'completed'
-            GROUP BY exercise_type
-        ''')
-        exercise_breakdown = [dict(row) for row in cursor.fetchall()]
+        return jsonify({'status': 'success', 'frames': frames})
     
-    cursor.close()
-    conn.close()
+    else:  # GET
+        if not os.path.exists(path):
+            return jsonify({'error': 'Recording not found'}), 404
+        return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                         download_name=os.path.basename(path), conditional=True)
+
+@app.route('/api/export/<table>')
+def export_table(table):
+    """Stream a whole table (or rows after ?after_id=) as NDJSON or column blocks"""
+    if table not in TABLE_COLUMNS:
+        return jsonify({'error': f'Unknown table {table!r}'}), 404
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    try:
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError:
+        return jsonify({'error': 'after_id must be an integer'}), 400
+    
+    columns = TABLE_COLUMNS[table]
+    conn = get_db_connection()
+    cursor = None
+    
+    def release():
+        # Runs when the server closes the response, even if it never iterated it
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+    
+    try:
+        cursor = repository.export(conn, table, after_id)
+        extension = 'ndjson' if fmt == 'ndjson' else 'cols.gz'
+        response = Response(encode_stream(fmt, fetch_batches(cursor), columns), mimetype=FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename={table}.{extension}',
+            'X-Accel-Buffering': 'no'
+        })
+        response.call_on_close(release)
+    except Exception:
+        release()
+        raise
+    return response
+
+@app.route('/api/import/<table>', methods=['POST'])
+def import_table(table):
+    """Bulk-load rows in either export format as one transaction"""
+    if table not in TABLE_COLUMNS:
+        return jsonify({'error': f'Unknown table {table!r}'}), 404
+    fmt = request.args.get('format') or (
+        'columnar' if request.mimetype == FORMATS['columnar'] else 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    read = read_columnar if fmt == 'columnar' else read_ndjson
+    
+    # Received in full on this thread: on SQLite the load below runs on the
+    # single writer thread, which must not wait on a slow upload
+    stream = spool(request.stream)
+    session_ids = set()
+    
+    def tracking(rows, key):
+        for row in rows:
+            session_ids.add(row[key])
+            yield row
+    
+    def load(cursor):
+        columns, rows = read(stream, table)
+        if not columns:
+            return None
+        key = 'id' if table == 'sessions' else 'session_id'
+        if key in columns:
+            rows = tracking(rows, columns.index(key))
+        imported = repository.bulk_insert(cursor, table, columns, rows)
+        # Imported reps and events make stored summaries of their sessions stale
+        for chunk in batched(sorted(sid for sid in session_ids if sid is not None), 500):
+            repository.delete_summaries(cursor, chunk)
+        return imported
+    
+    try:
+        imported = write_transaction(load)
+    except (ValueError, *IMPORT_ERRORS) as e:
+        return jsonify({'error': f'Import failed, nothing was written: {e}'}), 400
+    finally:
+        stream.close()
+    if imported is None:
+        return jsonify({'error': 'No rows to import'}), 400
+    
+    ordered = sorted(sid for sid in session_ids if sid is not None)
+    if table == 'sessions':
+        rebuild_exercise_stats()
+    response_cache.invalidate('sessions', 'stats', *(f'session:{sid}' for sid in ordered))
+    
+    return jsonify({'status': 'success', 'table': table, 'rows': imported})
+
+@app.route('/api/stats')
+@response_cache.cached('stats')
+def get_stats():
+    """Get overall statistics from the per-exercise rollup"""
+    with db_cursor() as cursor:
+        rows = repository.exercise_stats(cursor)
+    
+    total_sessions = sum(row[1] for row in rows)
+    total_reps = sum(row[2] for row in rows)
+    score_sum = sum(row[3] for row in rows)
+    overall_avg = score_sum / total_sessions if total_sessions else 0
+    
+    exercise_breakdown = [{
+        'exercise_type': exercise_type,
+        'session_count': session_count,
+        'total_reps': reps,
+        'avg_score': scores / session_count
+    } for exercise_type, session_count, reps, scores in rows]
     
     return jsonify({
         'total_sessions': total_sessions,
@@ -509,47 +692,145 @@ def get_stats():
         'exercise_breakdown': exercise_breakdown
     })
 
+MAX_TREND_SESSIONS = 365
+
+def build_session_summary(cursor, session_id):
+    """
+    (status, summary JSON) of a session computed from its rows, or None if
+    it does not exist. Holds the session row for the current transaction so
+    rows written meanwhile wait and then delete the stored summary, instead
+    of being missed by it.
+    """
+    if not repository.lock_session(cursor, session_id):
+        return None
+    session, reps, form_counts = repository.summary_inputs(cursor, session_id)
+    return session['status'], json.dumps(session_summary(session, reps, form_counts), default=json_default)
+
+def store_summary(cursor, session_id, body):
+    repository.store_summary(cursor, session_id, body, datetime.now().isoformat())
+
+def store_missing_summaries(conn, before):
+    """Store summaries of completed sessions with reps older than `before`; returns the count"""
+    cursor = conn.cursor()
+    session_ids = repository.sessions_missing_summaries(cursor, before.isoformat())
+    conn.commit()
+    for session_id in session_ids:
+        summary = build_session_summary(cursor, session_id)
+        if summary and summary[0] == 'completed':
+            store_summary(cursor, session_id, summary[1])
+        conn.commit()
+    cursor.close()
+    return len(session_ids)
+
+@app.route('/api/sessions/<int:session_id>/summary')
+@response_cache.cached('session:{session_id}')
+def get_session_summary(session_id):
+    """Analytics summary of a session; stored once the session is completed"""
+    with db_cursor() as cursor:
+        stored = repository.stored_summary(cursor, session_id)
+        if stored:
+            return Response(stored, mimetype='application/json')
+        inputs = repository.summary_inputs(cursor, session_id)
+    
+    if inputs is None:
+        return jsonify({'error': 'Session not found'}), 404
+    session, reps, form_counts = inputs
+    if session['status'] != 'completed':
+        # Still changing: computed per request, never queued behind the writer
+        return Response(json.dumps(session_summary(session, reps, form_counts), default=json_default),
+                        mimetype='application/json')
+    
+    def build(cursor):
+        # Recomputed under the session lock so no late row is missed by the stored copy
+        summary = build_session_summary(cursor, session_id)
+        if summary and summary[0] == 'completed':
+            store_summary(cursor, session_id, summary[1])
+        return summary
+    
+    summary = write_transaction(build)
+    if not summary:
+        return jsonify({'error': 'Session not found'}), 404
+    return Response(summary[1], mimetype='application/json')
+
+@app.route('/api/exercises/<exercise>/trends')
+@response_cache.cached('stats')
+def get_exercise_trends(exercise):
+    """Score, perfect-ratio and range-of-motion progression over completed sessions"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 30)), MAX_TREND_SESSIONS))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    with db_cursor() as cursor:
+        rows = repository.exercise_trend(cursor, exercise, limit)
+
+    return jsonify(exercise_trends(exercise, rows))
+
 @app.route('/api/sessions/<int:session_id>/delete', methods=['DELETE'])
 def delete_session(session_id):
     """Delete a session and all related data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def delete(cursor):
+        previous = repository.lock_session(cursor, session_id)
+        repository.delete_session(cursor, session_id)
+        
+        if previous and previous[1] == 'completed':
+            exercise_type, _, old_reps, old_score = previous
+            repository.update_exercise_stats(cursor, exercise_type, -1, -(old_reps or 0), -(old_score or 0))
     
-    if DATABASE_URL:
-        # PostgreSQL (CASCADE will auto-delete related records)
-        cursor.execute('DELETE FROM sessions WHERE id = %s', (session_id,))
-    else:
-        # SQLite (manual deletion)
-        cursor.execute('DELETE FROM reps WHERE session_id = ?', (session_id,))
-        cursor.execute('DELETE FROM form_events WHERE session_id = ?', (session_id,))
-        cursor.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+    write_transaction(delete)
+    response_cache.invalidate(f'session:{session_id}', 'sessions', 'stats')
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    if os.path.exists(landmark_path(session_id)):
+        os.remove(landmark_path(session_id))
     
     return jsonify({'status': 'success'})
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_duration.observe(time.perf_counter() - start, method=request.method,
+                                 route=route, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/debug/profile')
+def profile():
+    """Sample all threads for ?seconds=N and return folded stacks for flamegraph.pl"""
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'Profiler disabled (set PROFILER_ENABLED=1)'}), 404
+    try:
+        seconds = max(MIN_PROFILE_SECONDS, min(float(request.args.get('seconds', 10)), MAX_PROFILE_SECONDS))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    folded = SamplingProfiler().profile(seconds)
+    return Response(folded, mimetype='text/plain')
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint for monitoring"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if DATABASE_URL:
-            cursor.execute('SELECT 1')
-        else:
+        with db_cursor() as cursor:
             cursor.execute('SELECT 1')
         
-        cursor.close()
-        conn.close()
-        
         db_type = 'PostgreSQL' if DATABASE_URL else 'SQLite'
         
         return jsonify({
             'status': 'healthy',
             'database': db_type,
+            'pool': db_pool.stats(),
+            'cache': response_cache.stats(),
+            'ingest': ingest_queue.stats() if ingest_queue else {'mode': 'sync'},
+            'live': live_events.stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -0,0 +1,207 @@
+"""
+Offline batch analysis of recorded exercise videos
+Scores every video in a directory with MediaPipe pose in a process pool
+and uploads the sessions, reps and form events through the API
+
+Usage:
+    python batch_analysis.py recordings/ --exercise squat
+    python batch_analysis.py recordings/ --workers 4 --no-upload --output results.json
+
+The exercise is taken from the file name when it starts with a known
+exercise (e.g. `elbow_patient12.mp4`), otherwise from --exercise.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import requests
+
+from pose_angles import EXERCISE_JOINTS, AngleEngine, NUM_LANDMARKS, landmarks_to_array
+from rep_scoring import count_reps
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+# Per-process MediaPipe state, created once by _init_worker
+_pose = None
+_engine = None
+
+
+def _init_worker():
+    global _pose, _engine
+    import mediapipe as mp
+
+    # One inference thread per process; the pool already uses every core
+    cv2.setNumThreads(1)
+    _pose = mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=1,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+    _engine = AngleEngine()
+
+
+def analyze_video(path, exercise):
+    """Run pose + rep scoring on one video (executes inside a pool worker)"""
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {'file': path, 'exercise': exercise, 'error': 'Could not open video'}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    capacity = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 1)
+    stack = np.zeros((capacity, NUM_LANDMARKS, 4), dtype=np.float32)
+
+    _pose.reset()
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frames == len(stack):
+            stack = np.concatenate([stack, np.zeros_like(stack)])
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb.flags.writeable = False
+        result = _pose.process(rgb)
+        if result.pose_landmarks:
+            landmarks_to_array(result.pose_landmarks.landmark, out=stack[frames])
+        frames += 1
+    cap.release()
+
+    angles = _engine.bilateral_series(stack[:frames], exercise, fill=np.nan)
+    reps, events = count_reps(angles, exercise, fps)
+    scores = [rep['score'] for rep in reps]
+
+    return {
+        'file': path,
+        'exercise': exercise,
+        'frames': frames,
+        'video_fps': fps,
+        'duration_seconds': int(frames / fps),
+        'total_reps': len(reps),
+        'average_score': round(float(np.mean(scores)), 2) if scores else 0.0,
+        'reps': reps,
+        'form_events': events,
+        'processing_seconds': time.perf_counter() - started
+    }
+
+
+def upload_result(http, api_url, result):
+    """Write one analysed video as a completed session; returns the session id"""
+    recorded_at = datetime.fromtimestamp(os.path.getmtime(result['file']))
+    start = recorded_at - timedelta(seconds=result['duration_seconds'])
+
+    def stamp(item):
+        item = dict(item)
+        item['timestamp'] = (start + timedelta(seconds=item.pop('offset'))).isoformat()
+        return item
+
+    response = http.post(f'{api_url}/sessions', json={
+        'exercise_type': result['exercise'],
+        'session_mode': 'recorded',
+        'start_time': start.isoformat()
+    }, timeout=30)
+    response.raise_for_status()
+    session_id = response.json()['session_id']
+
+    http.post(f'{api_url}/sessions/{session_id}/events:batch', json={
+        'reps': [stamp(rep) for rep in result['reps']],
+        'form_events': [stamp(event) for event in result['form_events']]
+    }, timeout=60).raise_for_status()
+
+    http.put(f'{api_url}/sessions/{session_id}', json={
+        'end_time': recorded_at.isoformat(),
+        'total_reps': result['total_reps'],
+        'average_score': result['average_score'],
+        'duration_seconds': result['duration_seconds'],
+        'status': 'completed'
+    }, timeout=30).raise_for_status()
+    return session_id
+
+
+def exercise_for(path, default):
+    name = os.path.basename(path).lower()
+    for exercise in EXERCISE_JOINTS:
+        if name.startswith(exercise):
+            return exercise
+    return default
+
+
+def find_videos(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score recorded exercise videos headless")
+    parser.add_argument('directory', help='directory of video files')
+    parser.add_argument('--exercise', choices=sorted(EXERCISE_JOINTS),
+                        help='exercise for files whose name does not start with one')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--api-url', default='http://localhost:5000/api')
+    parser.add_argument('--no-upload', action='store_true', help='do not write results to the API')
+    parser.add_argument('--output', help='also write all results to this JSON file')
+    args = parser.parse_args()
+
+    jobs = []
+    for path in find_videos(args.directory):
+        exercise = exercise_for(path, args.exercise)
+        if exercise is None:
+            print(f"Skipping {path}: unknown exercise (use --exercise)")
+            continue
+        jobs.append((path, exercise))
+
+    if not jobs:
+        print("No videos to analyse.")
+        return
+
+    http = requests.Session()
+    results = []
+    total_frames = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(analyze_video, path, exercise) for path, exercise in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            if 'error' in result:
+                print(f"{result['file']}: {result['error']}")
+                continue
+
+            total_frames += result['frames']
+            if not args.no_upload:
+                try:
+                    result['session_id'] = upload_result(http, args.api_url, result)
+                except requests.RequestException as e:
+                    result['upload_error'] = str(e)
+                    print(f"Error uploading {result['file']}: {e}")
+
+            print(f"{result['file']}: {result['total_reps']} reps, "
+                  f"avg {result['average_score']:.1f}, "
+                  f"{result['frames'] / result['processing_seconds']:.1f} frames/sec")
+
+    elapsed = time.perf_counter() - started
+    print("\n--- BATCH COMPLETE ---")
+    print(f"Videos: {len(results)} with {args.workers} workers in {elapsed:.1f}s")
+    print(f"Throughput: {total_frames / elapsed:.1f} frames/sec, "
+          f"{len(results) / elapsed * 3600:.0f} videos/hour")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
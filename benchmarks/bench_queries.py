@@ -0,0 +1,155 @@
+"""
+Benchmark the session list/detail endpoints on a large seeded database,
+with the migration-1 indexes rolled back and then re-applied
+
+Usage:
+    python benchmarks/bench_queries.py                        # ~2.4M rows in a temp SQLite file
+    python benchmarks/bench_queries.py --sessions 100000      # bigger run
+    DATABASE_URL=postgresql://... python benchmarks/bench_queries.py
+
+Seeding a PostgreSQL database adds rows to it; point it at a scratch database.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXERCISES = ['squat', 'abduction', 'elbow', 'hipflex', 'wristext']
+CHUNK = 50_000
+
+
+def seed(conn, backend, sessions, reps_per_session, events_per_session):
+    """Insert synthetic sessions, reps and form events in large batches"""
+    cursor = conn.cursor()
+    start = datetime(2024, 1, 1)
+    rng = random.Random(42)
+
+    if backend == 'postgres':
+        from psycopg2.extras import execute_values
+
+        def insert(table, columns, rows):
+            execute_values(cursor, f'INSERT INTO {table} ({columns}) VALUES %s', rows, page_size=5000)
+    else:
+        def insert(table, columns, rows):
+            marks = ', '.join('?' * len(columns.split(',')))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({marks})', rows)
+
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM sessions')
+    first_id = cursor.fetchone()[0] + 1
+
+    for base in range(0, sessions, CHUNK):
+        ids = range(first_id + base, first_id + min(base + CHUNK, sessions))
+        session_rows, rep_rows, event_rows = [], [], []
+        for session_id in ids:
+            began = start + timedelta(minutes=session_id * 7)
+            session_rows.append((
+                session_id, rng.choice(EXERCISES), 'solo', began.isoformat(),
+                (began + timedelta(minutes=5)).isoformat(), reps_per_session,
+                rng.uniform(70, 100), 300, 'completed'
+            ))
+            for r in range(reps_per_session):
+                rep_rows.append((
+                    session_id, r + 1, rng.uniform(70, 100), 10, 20,
+                    (began + timedelta(seconds=r * 10)).isoformat(), 'LEFT', 90.0
+                ))
+            for e in range(events_per_session):
+                event_rows.append((
+                    session_id, 'form_check', (began + timedelta(seconds=e * 3)).isoformat(),
+                    90.0, 'CORRECT', ''
+                ))
+
+        insert('sessions', 'id, exercise_type, session_mode, start_time, end_time, total_reps, '
+                           'average_score, duration_seconds, status', session_rows)
+        insert('reps', 'session_id, rep_number, score, perfect_frames, standard_frames, '
+                       'timestamp, tracked_side, best_angle', rep_rows)
+        insert('form_events', 'session_id, event_type, timestamp, angle, form_status, '
+                              'feedback_message', event_rows)
+        conn.commit()
+        print(f"  seeded {min(base + CHUNK, sessions)}/{sessions} sessions", flush=True)
+
+    if backend == 'postgres':
+        cursor.execute("SELECT setval('sessions_id_seq', (SELECT MAX(id) FROM sessions))")
+        conn.commit()
+        cursor.execute('ANALYZE')
+    else:
+        cursor.execute('ANALYZE')
+    conn.commit()
+    cursor.close()
+    return list(range(first_id, first_id + sessions))
+
+
+def time_endpoint(client, paths, repeat):
+    """Mean and max milliseconds per request over `paths`"""
+    timings = []
+    for _ in range(repeat):
+        for path in paths:
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, (path, response.status_code)
+    return 1000 * sum(timings) / len(timings), 1000 * max(timings)
+
+
+def run(args):
+    sys.path.insert(0, ROOT)
+    import app as physio_app
+    from migrations import MIGRATIONS
+
+    backend = 'postgres' if physio_app.DATABASE_URL else 'sqlite'
+    client = physio_app.app.test_client()
+    conn = physio_app.get_db_connection()
+
+    total = args.sessions * (1 + args.reps + args.events)
+    print(f"Seeding {total:,} rows into {backend}...")
+    started = time.perf_counter()
+    session_ids = seed(conn, backend, args.sessions, args.reps, args.events)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    detail_paths = [f'/api/sessions/{rng.choice(session_ids)}' for _ in range(args.samples)]
+
+    # Toggle only the migration-1 indexes; later migrations add tables the routes read
+    _, _, up, down = MIGRATIONS[0]
+    for label, statements in (('without indexes', down[backend]), ('with indexes', up[backend])):
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        conn.commit()
+        cursor.close()
+        detail_avg, detail_max = time_endpoint(client, detail_paths, 1)
+        list_avg, list_max = time_endpoint(client, ['/api/sessions'], args.list_repeat)
+        print(f"\n{label}:")
+        print(f"  GET /api/sessions/<id>  avg {detail_avg:8.2f} ms  max {detail_max:8.2f} ms")
+        print(f"  GET /api/sessions       avg {list_avg:8.2f} ms  max {list_max:8.2f} ms")
+
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark list/detail endpoints with and without indexes')
+    parser.add_argument('--sessions', type=int, default=20_000)
+    parser.add_argument('--reps', type=int, default=20, help='reps per session')
+    parser.add_argument('--events', type=int, default=100, help='form events per session')
+    parser.add_argument('--samples', type=int, default=50, help='detail requests per run')
+    parser.add_argument('--list-repeat', type=int, default=3, help='list requests per run')
+    args = parser.parse_args()
+
+    # Time the queries themselves: no cached responses, no write-behind queue
+    os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    os.environ['INGEST_MODE'] = 'sync'
+
+    if os.environ.get('DATABASE_URL') or os.environ.get('SQLITE_PATH'):
+        run(args)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ['SQLITE_PATH'] = os.path.join(tmp, 'bench.db')
+            run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark POST /api/reps throughput with and without connection pooling
+
+Usage:
+    python benchmarks/bench_reps.py                 # compare pool off vs on
+    python benchmarks/bench_reps.py --pool-size 5   # single run
+
+Runs against SQLite by default (a temporary database file); set DATABASE_URL
+to benchmark a PostgreSQL server instead.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(requests_total, threads):
+    sys.path.insert(0, ROOT)
+    import app as physio_app
+
+    client = physio_app.app.test_client()
+    session_id = client.post('/api/sessions', json={
+        'exercise_type': 'squat',
+        'session_mode': 'solo'
+    }).get_json()['session_id']
+
+    per_thread = requests_total // threads
+
+    def worker(offset):
+        c = physio_app.app.test_client()
+        for i in range(per_thread):
+            c.post('/api/reps', json={
+                'session_id': session_id,
+                'rep_number': offset + i,
+                'score': 90.0,
+                'perfect_frames': 10,
+                'standard_frames': 20,
+                'tracked_side': 'LEFT',
+                'best_angle': 88.5
+            })
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    done = per_thread * threads
+    print(f"pool_size={physio_app.db_pool.size} requests={done} threads={threads} "
+          f"elapsed={elapsed:.2f}s rps={done / elapsed:.1f}")
+
+
+def compare(args):
+    for pool_size in (0, args.compare_size):
+        env = dict(os.environ, DB_POOL_SIZE=str(pool_size))
+        with tempfile.TemporaryDirectory() as tmp:
+            env.setdefault('SQLITE_PATH', os.path.join(tmp, 'bench.db'))
+            subprocess.run([
+                sys.executable, __file__,
+                '--pool-size', str(pool_size),
+                '--requests', str(args.requests),
+                '--threads', str(args.threads)
+            ], env=env, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--pool-size', type=int, help='run once with this DB_POOL_SIZE')
+    parser.add_argument('--compare-size', type=int, default=5, help='pool size for the "after" run')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.pool_size is None:
+        compare(args)
+    else:
+        os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+        run_once(args.requests, args.threads)
+
+
+if __name__ == '__main__':
+    main()
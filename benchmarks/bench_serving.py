@@ -0,0 +1,165 @@
+"""
+Load-test the API under sync and gevent gunicorn workers
+
+Usage:
+    python benchmarks/bench_serving.py                             # sync vs gevent
+    python benchmarks/bench_serving.py --worker-class gevent --clients 64 256
+    python benchmarks/bench_serving.py --url http://localhost:5000  # a running server
+
+Each simulated client plays one live session: create it, post reps and form
+events, read it back and complete it. For every concurrency level the run
+reports p50/p99 request latency, and finally the largest number of concurrent
+sessions whose p99 stayed under --slo-ms without errors.
+
+Runs against SQLite by default (a temporary database file); set DATABASE_URL
+to load a PostgreSQL server instead. gevent workers only overlap requests
+while they wait on PostgreSQL, so compare the two on the Postgres path.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def play_session(api_url, reps, latencies, errors):
+    """One client session; appends per-request latencies (ms) and error count"""
+    http = requests.Session()
+
+    def call(method, path, payload=None):
+        start = time.perf_counter()
+        try:
+            response = http.request(method, api_url + path, json=payload, timeout=30)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors.append(path)
+        return response if ok else None
+
+    response = call('POST', '/api/sessions', {'exercise_type': 'squat', 'session_mode': 'bench'})
+    if response is None:
+        return
+    session_id = response.json()['session_id']
+
+    for rep in range(1, reps + 1):
+        call('POST', '/api/reps', {
+            'session_id': session_id, 'rep_number': rep, 'score': 90.0,
+            'perfect_frames': 10, 'standard_frames': 20,
+            'tracked_side': 'LEFT', 'best_angle': 88.5
+        })
+        call('POST', '/api/form_events', {
+            'session_id': session_id, 'event_type': 'rep_complete', 'angle': 88.5,
+            'form_status': 'PERFECT', 'feedback_message': f'Rep {rep} complete'
+        })
+
+    call('GET', f'/api/sessions/{session_id}')
+    call('PUT', f'/api/sessions/{session_id}', {
+        'total_reps': reps, 'average_score': 90.0, 'status': 'completed'
+    })
+    http.close()
+
+
+def run_level(api_url, clients, reps):
+    latencies, errors = [], []
+    threads = [threading.Thread(target=play_session, args=(api_url, reps, latencies, errors))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def start_server(worker_class, workers, port, env):
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--worker-class', worker_class,
+        '--workers', str(workers),
+        '--bind', f'127.0.0.1:{port}',
+        '--log-level', 'warning'
+    ], cwd=ROOT, env=env)
+
+    api_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(api_url + '/api/health', timeout=1).status_code == 200:
+                return server, api_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not become healthy')
+
+
+def benchmark(api_url, label, args):
+    print(f"\n{label}")
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    max_sessions = 0
+    for clients in args.clients:
+        result = run_level(api_url, clients, args.reps)
+        print(f"{result['clients']:>8} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+        if result['errors'] == 0 and result['p99_ms'] <= args.slo_ms:
+            max_sessions = clients
+    print(f"max concurrent sessions with p99 <= {args.slo_ms:.0f} ms: {max_sessions}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', help='benchmark an already running server instead')
+    parser.add_argument('--worker-class', action='append',
+                        help='gunicorn worker class to test (repeatable, default: sync and gevent)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers per run')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, nargs='+', default=[8, 32, 128, 256],
+                        help='concurrent sessions per level')
+    parser.add_argument('--reps', type=int, default=10, help='reps logged per session')
+    parser.add_argument('--slo-ms', type=float, default=500.0, help='p99 latency budget')
+    args = parser.parse_args()
+
+    if args.url:
+        benchmark(args.url.rstrip('/'), args.url, args)
+        return
+
+    for worker_class in args.worker_class or ['sync', 'gevent']:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class)
+            env.setdefault('SQLITE_PATH', os.path.join(tmp, 'bench.db'))
+            server, api_url = start_server(worker_class, args.workers, args.port, env)
+            try:
+                benchmark(api_url, f"worker_class={worker_class} workers={args.workers}", args)
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
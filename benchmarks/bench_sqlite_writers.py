@@ -0,0 +1,175 @@
+"""
+Sustained SQLite insert rate with many concurrent clients
+
+Usage:
+    python benchmarks/bench_sqlite_writers.py                      # compare all configurations
+    python benchmarks/bench_sqlite_writers.py --clients 64 --seconds 20
+    python benchmarks/bench_sqlite_writers.py --config wal-writer  # one configuration
+
+Each configuration runs --workers processes (like gunicorn workers) against
+one temporary database file. Each process has --clients threads that post
+reps to POST /api/reps for --seconds through the Flask test client. Reported
+per configuration: committed inserts per second, p50/p99 latency and the
+number of failed requests (mostly "database is locked").
+
+    rollback      -- default SQLite before tuning: rollback journal, synchronous=FULL,
+                     1 s busy timeout, every request thread writes
+    wal           -- WAL, synchronous=NORMAL, 10 s busy timeout
+    wal-writer    -- as wal, with writes going through one writer thread per
+                     process (INGEST_MODE=commit, group commit)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'rollback': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                 'SQLITE_BUSY_TIMEOUT': '1', 'INGEST_MODE': 'sync'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL',
+            'SQLITE_BUSY_TIMEOUT': '10', 'INGEST_MODE': 'sync'},
+    'wal-writer': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL',
+                   'SQLITE_BUSY_TIMEOUT': '10', 'INGEST_MODE': 'commit'},
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_app(env):
+    """Import the API in a child process configured by `env` (always SQLite)"""
+    os.environ.pop('DATABASE_URL', None)
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    import app as physio_app
+    return physio_app
+
+
+def worker_process(env, clients, seconds, session_id, results):
+    """One simulated gunicorn worker: `clients` threads posting reps until the deadline"""
+    physio_app = load_app(env)
+    # Failures are counted below; one traceback per locked write is noise
+    physio_app.app.logger.disabled = True
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        c = physio_app.app.test_client()
+        rep_number = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = c.post('/api/reps', json={
+                    'session_id': session_id,
+                    'rep_number': rep_number,
+                    'score': 90.0,
+                    'perfect_frames': 10,
+                    'standard_frames': 20,
+                    'tracked_side': 'LEFT',
+                    'best_angle': 88.5
+                }).status_code < 400
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors.append(rep_number)
+            rep_number += 1
+
+    threads = [threading.Thread(target=client, args=(i * 1_000_000,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if physio_app.ingest_queue:
+        physio_app.ingest_queue.close()
+    results.put((latencies, len(errors)))
+
+
+def run_config(name, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(CONFIGS[name], SQLITE_PATH=os.path.join(tmp, 'bench.db'),
+                   RESPONSE_CACHE_SIZE='0', DB_POOL_SIZE=str(args.clients))
+
+        # Create the schema and one session in a throwaway process first
+        ctx = multiprocessing.get_context('spawn')
+        setup = ctx.Queue()
+        p = ctx.Process(target=_create_session, args=(env, setup))
+        p.start()
+        session_id = setup.get()
+        p.join()
+
+        results = ctx.Queue()
+        workers = [ctx.Process(target=worker_process,
+                               args=(env, args.clients, args.seconds, session_id, results))
+                   for _ in range(args.workers)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        outcomes = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+
+        conn = sqlite3.connect(env['SQLITE_PATH'])
+        committed = conn.execute('SELECT COUNT(*) FROM reps').fetchone()[0]
+        conn.close()
+
+    latencies = sorted(ms for lat, _ in outcomes for ms in lat)
+    return {
+        'config': name,
+        'workers': args.workers,
+        'clients': args.workers * args.clients,
+        'inserts_per_s': round(committed / elapsed, 1),
+        'committed': committed,
+        'failed': sum(e for _, e in outcomes),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def _create_session(env, out):
+    client = load_app(env).app.test_client()
+    out.put(client.post('/api/sessions', json={
+        'exercise_type': 'squat',
+        'session_mode': 'bench'
+    }).get_json()['session_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--config', choices=sorted(CONFIGS), action='append',
+                        help='configuration to run (repeatable, default: all)')
+    parser.add_argument('--workers', type=int, default=2, help='processes sharing the database')
+    parser.add_argument('--clients', type=int, default=32, help='client threads per process')
+    parser.add_argument('--seconds', type=float, default=10.0, help='load duration per configuration')
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.config or list(CONFIGS):
+        result = run_config(name, args)
+        results.append(result)
+        print(f"{name:<11} {result['inserts_per_s']:>9.1f} inserts/s  "
+              f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+              f"failed {result['failed']}  ({result['clients']} clients)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""
+Reproducible benchmark suite: API routes per database backend and the pose
+angle/rep pipeline, written to one JSON file for tracking between releases
+
+Usage:
+    python benchmarks/bench_suite.py                                 # SQLite + pose replay
+    python benchmarks/bench_suite.py --postgres postgresql://localhost/physio_bench
+    python benchmarks/bench_suite.py --only pose --landmarks landmarks/session_12.npy --exercise elbow
+    python benchmarks/bench_suite.py --output new.json --baseline bench-results.json
+
+API: each backend runs in a fresh process against a seeded database
+(synthetic sessions, reps and form events from bench_queries.seed) and every
+route is timed through the Flask test client, with the response cache off
+and synchronous ingestion so the numbers measure the database path. SQLite
+uses a temporary file; the Postgres database gets rows added, so point
+--postgres at a scratch database.
+
+Pose: a landmark stream (synthetic reps by default, or a recording) is
+replayed without a camera through the scalar calc_angle of the pose client,
+the per-frame get_bilateral_angles path, the vectorized series path,
+count_reps and the live RepTracker. The synthetic stream contains a known number of reps, so the
+results also record whether rep detection still finds all of them.
+
+Seeds are fixed, so two runs on the same machine see the same data.
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_queries import seed  # noqa: E402
+
+Landmark = namedtuple('Landmark', 'x y z visibility')
+
+REP_PAYLOAD = {
+    'score': 90.0,
+    'perfect_frames': 10,
+    'standard_frames': 20,
+    'tracked_side': 'LEFT',
+    'best_angle': 88.5
+}
+EVENT_PAYLOAD = {
+    'event_type': 'form_check',
+    'angle': 92.0,
+    'form_status': 'CORRECT',
+    'feedback_message': ''
+}
+
+
+def summarize(timings):
+    """Latency summary (ms) of a list of durations in seconds"""
+    ms = np.sort(np.asarray(timings) * 1000)
+    return {
+        'n': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms[-1]), 3),
+        'per_s': round(float(len(ms) / (ms.sum() / 1000)), 1) if ms.sum() > 0 else 0.0,
+    }
+
+
+# API routes
+
+def time_route(client, method, path, payload=None, data=None, requests=200, warmup=5):
+    """Time `requests` calls; path/payload may be callables of the call index"""
+    timings = []
+    for i in range(-warmup, requests):
+        url = path(i) if callable(path) else path
+        body = payload(i) if callable(payload) else payload
+        start = time.perf_counter()
+        response = client.open(url, method=method, json=body, data=data)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {url} returned {response.status_code}')
+        if i >= 0:
+            timings.append(elapsed)
+    return summarize(timings)
+
+
+def run_api(args):
+    """Seed the configured backend and time every route (runs in a child process)"""
+    import app as physio_app
+
+    backend = 'postgres' if physio_app.DATABASE_URL else 'sqlite'
+    client = physio_app.app.test_client()
+    rng = np.random.default_rng(7)
+
+    conn = physio_app.get_db_connection()
+    started = time.perf_counter()
+    session_ids = seed(conn, backend, args.sessions, args.reps, args.events)
+    seed_seconds = time.perf_counter() - started
+    conn.close()
+    # The seeded rows bypass the exercise_stats rollup; rebuild it once
+    from migrations import EXERCISE_STATS_BACKFILL
+    conn = physio_app.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM exercise_stats')
+    cursor.execute(EXERCISE_STATS_BACKFILL)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+    def any_session(_):
+        return int(session_ids[rng.integers(len(session_ids))])
+
+    live_id = client.post('/api/sessions', json={
+        'exercise_type': 'squat', 'session_mode': 'bench'
+    }).get_json()['session_id']
+    recording = synthetic_recording(900)
+
+    n = args.requests
+    routes = {
+        'GET /api/sessions': ('GET', '/api/sessions', None),
+        'GET /api/sessions?limit=200': ('GET', '/api/sessions?limit=200', None),
+        'GET /api/sessions/<id>': ('GET', lambda i: f'/api/sessions/{any_session(i)}', None),
+        'GET /api/stats': ('GET', '/api/stats', None),
+        'GET /api/health': ('GET', '/api/health', None),
+        'POST /api/sessions': ('POST', '/api/sessions',
+                               {'exercise_type': 'squat', 'session_mode': 'bench'}),
+        'POST /api/reps': ('POST', '/api/reps',
+                           lambda i: dict(REP_PAYLOAD, session_id=live_id, rep_number=i + 1)),
+        'POST /api/form_events': ('POST', '/api/form_events',
+                                  dict(EVENT_PAYLOAD, session_id=live_id)),
+        'POST /api/sessions/<id>/events:batch': (
+            'POST', f'/api/sessions/{live_id}/events:batch', {
+                'reps': [dict(REP_PAYLOAD, rep_number=r + 1) for r in range(10)],
+                'form_events': [EVENT_PAYLOAD] * 50
+            }),
+        'PUT /api/sessions/<id>': ('PUT', f'/api/sessions/{live_id}', {
+            'total_reps': 10, 'average_score': 90.0, 'duration_seconds': 300, 'status': 'completed'
+        }),
+    }
+
+    results = {}
+    for name, (method, path, payload) in routes.items():
+        results[name] = time_route(client, method, path, payload, requests=n)
+        print(f"  [{backend}] {name:<40} p50 {results[name]['p50_ms']:8.3f} ms  "
+              f"p99 {results[name]['p99_ms']:8.3f} ms", flush=True)
+
+    name = 'PUT /api/sessions/<id>/landmarks'
+    results[name] = time_route(client, 'PUT', f'/api/sessions/{live_id}/landmarks',
+                               data=recording, requests=max(1, n // 10))
+    name = 'GET /api/sessions/<id>/landmarks'
+    results[name] = time_route(client, 'GET', f'/api/sessions/{live_id}/landmarks', requests=n)
+
+    return {
+        'backend': backend,
+        'seed': {
+            'sessions': args.sessions,
+            'rows': args.sessions * (1 + args.reps + args.events),
+            'seconds': round(seed_seconds, 2),
+        },
+        'routes': results,
+    }
+
+
+def api_backends(args):
+    """Run run_api in a fresh process per backend (the app reads its config at import)"""
+    backends = {'sqlite': None}
+    postgres = args.postgres or os.environ.get('DATABASE_URL')
+    if postgres:
+        backends['postgres'] = postgres
+
+    results = {}
+    for backend, url in backends.items():
+        print(f"API on {backend}: seeding {args.sessions:,} sessions...", flush=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, RESPONSE_CACHE_SIZE='0', INGEST_MODE='sync',
+                       LANDMARK_DIR=os.path.join(tmp, 'landmarks'),
+                       SQLITE_PATH=os.path.join(tmp, 'bench.db'))
+            env.pop('DATABASE_URL', None)
+            if url:
+                env['DATABASE_URL'] = url
+            output = os.path.join(tmp, 'api.json')
+            subprocess.run([
+                sys.executable, __file__, '--api-child', output,
+                '--sessions', str(args.sessions), '--reps', str(args.reps),
+                '--events', str(args.events), '--requests', str(args.requests)
+            ], env=env, check=True)
+            with open(output) as f:
+                results[backend] = json.load(f)
+    return results
+
+
+# Pose pipeline replay
+
+def synthetic_stream(exercise, seconds=60.0, fps=30.0, period=4.0, seed=42):
+    """
+    (timestamps, (frames, 33, 4) landmarks, rep count) of a person doing one
+    rep every `period` seconds with both sides and a little jitter. The
+    length is rounded to whole reps, so the stream starts and ends at rest.
+    """
+    from exercise_rules import EXERCISES
+
+    rng = np.random.default_rng(seed)
+    reps = max(1, round(seconds / period))
+    frames = int(reps * period * fps) + 1
+    t = np.arange(frames) / fps
+
+    i = EXERCISES.index[exercise]
+    sign, rest, perfect = EXERCISES.sign[i], EXERCISES.rest[i], EXERCISES.perfect[i]
+    # From 10 degrees past rest to 5 past perfect and back, once per period
+    low, high = rest - 10 * sign, perfect + 5 * sign
+    phase = (1 - np.cos(2 * np.pi * t / period)) / 2
+    angle = np.clip(low + (high - low) * phase, 1, 179)
+
+    landmarks = rng.uniform(0.2, 0.8, (frames, 33, 4)).astype(np.float32)
+    landmarks[..., 3] = 1.0
+    for side, offset in (('right', 0.3), ('left', 0.7)):
+        a, b, c = EXERCISES.joints[exercise][side]
+        jitter = np.radians(angle + rng.normal(0, 0.5, frames))
+        landmarks[:, b, :2] = (offset, 0.5)
+        landmarks[:, a, 0], landmarks[:, a, 1] = offset, 0.5 - 0.2
+        landmarks[:, c, 0] = offset + 0.2 * np.sin(jitter)
+        landmarks[:, c, 1] = 0.5 - 0.2 * np.cos(jitter)
+    return t, landmarks, reps
+
+
+def synthetic_recording(frames):
+    """A FRAME_DTYPE recording as uploaded by the pose client (.npy bytes)"""
+    from landmark_store import FRAME_DTYPE
+
+    t, landmarks, _ = synthetic_stream('squat', seconds=frames / 30.0)
+    recording = np.zeros(len(t), dtype=FRAME_DTYPE)
+    recording['t'], recording['landmarks'] = t, landmarks
+    buffer = io.BytesIO()
+    np.save(buffer, recording)
+    return buffer.getvalue()
+
+
+def load_client_calc_angle():
+    """The pose client's scalar calc_angle, or (None, reason) without its dependencies"""
+    path = os.path.join(ROOT, 'physio-web-integration.py')
+    spec = importlib.util.spec_from_file_location('physio_client', path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError as e:
+        return None, f'pose client not importable: {e}'
+    return module.SmartPhysioWebIntegrated.calc_angle, None
+
+
+def run_pose(args):
+    from exercise_rules import EXERCISES
+    from landmark_store import open_landmarks
+    from pose_angles import AngleEngine, landmarks_to_array
+    from rep_scoring import RepTracker, count_reps
+
+    exercise = args.exercise
+    if args.landmarks:
+        timestamps, landmarks = open_landmarks(args.landmarks)
+        landmarks = np.asarray(landmarks)
+        expected = None
+        source = args.landmarks
+    else:
+        timestamps, landmarks, expected = synthetic_stream(exercise, seconds=args.pose_seconds)
+        source = f'synthetic {args.pose_seconds:g}s at 30 FPS'
+    frames = len(landmarks)
+    fps = (frames - 1) / max(float(timestamps[-1] - timestamps[0]), 1e-6)
+    print(f"Pose replay: {frames} frames of {exercise} ({source})", flush=True)
+
+    # MediaPipe-style landmark objects, built outside the timed loops
+    objects = [[Landmark(*lm) for lm in frame] for frame in landmarks]
+    engine = AngleEngine()
+    right, left = EXERCISES.joints[exercise]['right'], EXERCISES.joints[exercise]['left']
+    stages = {}
+
+    calc_angle, skipped = load_client_calc_angle()
+    if calc_angle is None:
+        stages['calc_angle'] = {'skipped': skipped}
+    else:
+        timings = []
+        for lms in objects:
+            start = time.perf_counter()
+            calc_angle(None, *(lms[j] for j in right))
+            calc_angle(None, *(lms[j] for j in left))
+            timings.append(time.perf_counter() - start)
+        stages['calc_angle'] = summarize(timings)
+
+    # What get_bilateral_angles does per live frame
+    buffer = np.zeros((33, 4), dtype=np.float32)
+    timings = []
+    for lms in objects:
+        start = time.perf_counter()
+        engine.bilateral(landmarks_to_array(lms, out=buffer), exercise)
+        timings.append(time.perf_counter() - start)
+    stages['get_bilateral_angles'] = summarize(timings)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        angles = engine.bilateral_series(landmarks, exercise, fill=np.nan)
+        timings.append(time.perf_counter() - start)
+    stages['bilateral_series'] = dict(summarize(timings),
+                                      frames_per_s=round(frames / min(timings), 1))
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        reps, _ = count_reps(angles, exercise, fps)
+        timings.append(time.perf_counter() - start)
+    stages['count_reps'] = dict(summarize(timings), frames_per_s=round(frames / min(timings), 1))
+
+    # What the live client does per frame: smoothing, debounce and the rep FSM
+    tracker = RepTracker.live(exercise, fps)
+    timings = []
+    for (right, left), t in zip(angles.tolist(), timestamps.tolist()):
+        start = time.perf_counter()
+        tracker.update(right, left, t)
+        timings.append(time.perf_counter() - start)
+    stages['rep_tracker'] = summarize(timings)
+
+    for name, stats in stages.items():
+        if 'skipped' in stats:
+            print(f"  {name:<22} skipped ({stats['skipped']})")
+        else:
+            print(f"  {name:<22} p50 {stats['p50_ms']:8.4f} ms  mean {stats['mean_ms']:8.4f} ms")
+    print(f"  reps detected {len(reps)}, live tracker {tracker.repcount}"
+          + (f" (expected {expected})" if expected is not None else ''))
+
+    return {
+        'exercise': exercise,
+        'source': source,
+        'frames': frames,
+        'stages': stages,
+        'reps_detected': len(reps),
+        'reps_detected_live': tracker.repcount,
+        'reps_expected': expected,
+    }
+
+
+# Results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=''):
+    """{'api.sqlite.routes.GET /api/stats.p50_ms': value, ...} of the timing leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and key.endswith(('p50_ms', 'p99_ms', 'frames_per_s')):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline_path):
+    """Print the change of every timing against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old, new = flatten(baseline), flatten(results)
+    print(f"\nChange vs {baseline_path} ({baseline['meta'].get('commit')}):")
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name]:
+            continue
+        change = 100 * (new[name] - old[name]) / old[name]
+        # Latency should go down, throughput up
+        worse = change > 0 if name.endswith('_ms') else change < 0
+        flag = '  <-- slower' if worse and abs(change) > 10 else ''
+        print(f"  {name:<72} {old[name]:>10} -> {new[name]:>10} ({change:+.1f}%){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API and pose pipeline benchmark suite')
+    parser.add_argument('--only', choices=('api', 'pose'), help='run one half of the suite')
+    parser.add_argument('--postgres', help='also benchmark this PostgreSQL URL (default: DATABASE_URL)')
+    parser.add_argument('--sessions', type=int, default=2000, help='seeded sessions')
+    parser.add_argument('--reps', type=int, default=20, help='seeded reps per session')
+    parser.add_argument('--events', type=int, default=50, help='seeded form events per session')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--exercise', default='squat', help='exercise of the replayed stream')
+    parser.add_argument('--landmarks', help='replay this landmark recording (.npy) instead of a synthetic one')
+    parser.add_argument('--pose-seconds', type=float, default=120.0, help='length of the synthetic stream')
+    parser.add_argument('--repeat', type=int, default=20, help='runs of the whole-stream stages')
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--api-child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.api_child:
+        with open(args.api_child, 'w') as f:
+            json.dump(run_api(args), f)
+        return
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': f'{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)',
+            'args': {k: v for k, v in vars(args).items() if k not in ('api_child', 'baseline', 'output')},
+        }
+    }
+    if args.only != 'pose':
+        results['api'] = api_backends(args)
+    if args.only != 'api':
+        results['pose'] = run_pose(args)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Bulk export and import of whole tables
+Rows are streamed in fixed-size batches in either of two formats, so memory
+stays flat however large the table is:
+
+ndjson   -- one JSON object per row (application/x-ndjson)
+columnar -- gzip-compressed column blocks: a header line naming the columns,
+            then one JSON line per batch of rows holding one array per column
+            ({"rows": n, "columns": {"id": [...], ...}}). Each block loads
+            straight into a DataFrame, and grouping values by column
+            compresses far better than rows.
+"""
+
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import zlib
+from datetime import date, datetime
+
+TABLE_COLUMNS = {
+    'sessions': ('id', 'exercise_type', 'session_mode', 'start_time', 'end_time',
+                 'total_reps', 'average_score', 'duration_seconds', 'status'),
+    'reps': ('id', 'session_id', 'rep_number', 'score', 'perfect_frames',
+             'standard_frames', 'timestamp', 'tracked_side', 'best_angle'),
+    'form_events': ('id', 'session_id', 'event_type', 'timestamp', 'angle',
+                    'form_status', 'feedback_message'),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'columnar': 'application/gzip',
+}
+
+COLUMNAR_FORMAT = 'physio-columnar'
+COLUMNAR_VERSION = 1
+
+# NULL marker of the CSV sent to COPY
+COPY_NULL = '\\N'
+
+# Rows per fetch from the database, per columnar block and per import batch
+BATCH_ROWS = 2000
+
+# Uploads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+def json_default(value):
+    """Timestamps from PostgreSQL become ISO strings like SQLite's"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def fetch_batches(cursor, size=BATCH_ROWS):
+    """Lists of row tuples from an executed cursor, `size` at a time"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+
+
+def ndjson_stream(batches, columns):
+    """Encode row batches as NDJSON, one bytes chunk per batch"""
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=json_default) + '\n' for row in rows
+        ).encode()
+
+
+def columnar_stream(batches, columns):
+    """Encode row batches as gzip-compressed column blocks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    header = {'format': COLUMNAR_FORMAT, 'version': COLUMNAR_VERSION, 'columns': list(columns)}
+    chunk = compressor.compress(json.dumps(header).encode() + b'\n')
+    if chunk:
+        yield chunk
+    for rows in batches:
+        block = {'rows': len(rows), 'columns': dict(zip(columns, map(list, zip(*rows))))}
+        chunk = compressor.compress(json.dumps(block, default=json_default).encode() + b'\n')
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def encode_stream(fmt, batches, columns):
+    """Bytes chunks of `batches` in an export format (a key of FORMATS)"""
+    if fmt == 'columnar':
+        return columnar_stream(batches, columns)
+    return ndjson_stream(batches, columns)
+
+
+def spool(stream, max_memory=SPOOL_MAX_MEMORY):
+    """
+    Copy an upload into a temporary file (in memory up to max_memory bytes)
+    positioned at its start, so it can be parsed without waiting on the
+    network. The caller closes it.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        shutil.copyfileobj(stream, spooled)
+        spooled.seek(0)
+    except Exception:
+        spooled.close()
+        raise
+    return spooled
+
+
+def read_ndjson(stream, table):
+    """
+    (columns, rows) from an NDJSON upload. The columns are those of the
+    first record (in table order), so 'id' is kept only if records carry it;
+    rows is a lazy iterator of tuples. Raises ValueError on bad input.
+    """
+    lines = (line for line in stream if line.strip())
+    first = next(lines, None)
+    if first is None:
+        return (), iter(())
+    first = _record(first)
+    columns = _columns(table, first)
+
+    def rows():
+        yield tuple(first.get(c) for c in columns)
+        for line in lines:
+            record = _record(line)
+            yield tuple(record.get(c) for c in columns)
+
+    return columns, rows()
+
+
+def read_columnar(stream, table):
+    """(columns, rows) from a columnar upload; raises ValueError on bad input"""
+    lines = gzip.GzipFile(fileobj=stream, mode='rb')
+    try:
+        header = json.loads(lines.readline() or b'{}')
+    except (OSError, EOFError, ValueError) as e:
+        raise ValueError(f'not a columnar export: {e}')
+    if header.get('format') != COLUMNAR_FORMAT or header.get('version') != COLUMNAR_VERSION:
+        raise ValueError(f'expected {COLUMNAR_FORMAT} version {COLUMNAR_VERSION}')
+    columns = _columns(table, header.get('columns') or ())
+
+    missing = object()
+
+    def rows():
+        try:
+            for line in lines:
+                if not line.strip():
+                    continue
+                block = json.loads(line)['columns']
+                arrays = [block.get(c, missing) for c in columns]
+                if any(a is missing for a in arrays):
+                    raise ValueError('column block is missing columns from the header')
+                yield from zip(*arrays)
+        except (OSError, EOFError, KeyError, TypeError) as e:
+            raise ValueError(f'corrupt column block: {e}')
+
+    return columns, rows()
+
+
+def _record(line):
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('each NDJSON line must be an object')
+    return record
+
+
+def _columns(table, present):
+    columns = tuple(c for c in TABLE_COLUMNS[table] if c in present)
+    unknown = set(present) - set(TABLE_COLUMNS[table])
+    if unknown:
+        raise ValueError(f"unknown {table} columns: {', '.join(sorted(unknown))}")
+    if not columns:
+        raise ValueError(f'no {table} columns in the upload')
+    return columns
+
+
+def batched(rows, size=BATCH_ROWS):
+    """Lists of up to `size` items from an iterator"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CsvReader:
+    """
+    Read-only file over row tuples rendered as CSV, for PostgreSQL's
+    COPY ... FROM STDIN WITH (FORMAT csv, NULL '\\N'). None is written as
+    an unquoted \\N so that it loads as NULL, while '' still loads as an
+    empty string.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+        self.rows = 0
+
+    def read(self, size=-1):
+        for row in self._rows:
+            self._writer.writerow([COPY_NULL if v is None else v for v in row])
+            self.rows += 1
+            if 0 <= size <= self._buffer.tell():
+                break
+        self._pending += self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
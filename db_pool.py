@@ -0,0 +1,234 @@
+"""
+Database connection pooling for the Flask API
+Works with both psycopg2 and sqlite3 connections
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out in time"""
+
+
+class PooledConnection:
+    """Proxy around a DB-API connection that returns it to the pool on close()"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.on_query is None:
+            return cursor
+        return TimedCursor(cursor, self._pool.on_query)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __del__(self):
+        # A handler that forgot close() must not leak its checkout slot
+        if getattr(self, '_conn', None) is not None:
+            self.close()
+
+
+class TimedCursor:
+    """Cursor proxy reporting (sql, seconds) of every execute to on_query"""
+
+    def __init__(self, cursor, on_query):
+        self._cursor = cursor
+        self._on_query = on_query
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def execute(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, *args, **kwargs)
+        finally:
+            self._on_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, *args, **kwargs)
+        finally:
+            self._on_query(sql, time.perf_counter() - start)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections for one worker process.
+
+    size            -- maximum number of connections checked out at once;
+                       0 disables pooling (connect and close per request)
+    timeout         -- seconds to wait for a free slot before PoolTimeout
+    ping_interval   -- connections idle longer than this are pinged with
+                       SELECT 1 on checkout; 0 pings on every checkout
+    on_query        -- optional callback(sql, seconds) timing every statement
+                       run through a pooled connection's cursors
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0, ping_interval=30.0, on_query=None):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.on_query = on_query
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size) if self.size > 0 else None
+        self.opened = 0
+        self.checked_out = 0
+
+    def _check_pid(self):
+        # Connections must never be shared across a fork (gunicorn --preload);
+        # drop the inherited ones without closing the parent's sockets.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def acquire(self):
+        """Check out a healthy connection wrapped in a PooledConnection"""
+        self._check_pid()
+
+        if self._slots is not None and not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f'No database connection available after {self.timeout}s')
+
+        try:
+            conn = self._take_idle() or self._open()
+        except Exception:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+
+        with self._lock:
+            self.checked_out += 1
+        return PooledConnection(self, conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for a with block; it goes back even if the block raises"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if self._pid != os.getpid():
+            return
+
+        with self._lock:
+            self.checked_out -= 1
+
+        try:
+            if self._slots is None:
+                self._discard(conn)
+                return
+
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection (called on worker shutdown)"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Return current pool counters"""
+        return {
+            'size': self.size,
+            'opened': self.opened,
+            'idle': self._idle.qsize(),
+            'checked_out': self.checked_out,
+        }
+
+    def _open(self):
+        conn = self._connect()
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if self._is_healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+
+    def _is_healthy(self, conn, last_used):
+        # psycopg2 exposes a non-zero .closed once the socket is gone
+        if getattr(conn, 'closed', 0):
+            return False
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self.opened -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def pool_from_env(connect, on_query=None):
+    """Build a ConnectionPool configured from DB_POOL_* environment variables"""
+    return ConnectionPool(
+        connect,
+        size=int(os.environ.get('DB_POOL_SIZE', 5)),
+        timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        ping_interval=float(os.environ.get('DB_POOL_PING_INTERVAL', 30)),
+        on_query=on_query,
+    )
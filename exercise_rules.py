@@ -0,0 +1,114 @@
+"""
+Declarative exercise definitions compiled into NumPy lookup arrays
+Each exercise in exercises.json lists its landmark triples, rest angle,
+correct range, perfect angle and direction ('rising' or 'falling')
+"""
+
+import json
+import os
+
+import numpy as np
+
+EXERCISES_FILE = os.environ.get(
+    'EXERCISES_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exercises.json')
+)
+
+DIRECTIONS = {'rising': 1.0, 'falling': -1.0}
+REQUIRED_FIELDS = {'joints', 'direction', 'rest', 'correct', 'perfect'}
+
+
+def load_definitions(path=EXERCISES_FILE):
+    """Read and validate exercise definitions from a JSON file"""
+    with open(path) as f:
+        definitions = json.load(f)
+
+    for name, definition in definitions.items():
+        missing = REQUIRED_FIELDS - definition.keys()
+        if missing:
+            raise ValueError(f"Exercise '{name}' is missing {sorted(missing)}")
+        if definition['direction'] not in DIRECTIONS:
+            raise ValueError(f"Exercise '{name}': direction must be 'rising' or 'falling'")
+        joints = definition['joints']
+        if set(joints) != {'right', 'left'} or any(len(joints[side]) != 3 for side in joints):
+            raise ValueError(f"Exercise '{name}': joints needs a right and left landmark triple")
+        if len(definition['correct']) != 2:
+            raise ValueError(f"Exercise '{name}': correct must be a [low, high] range")
+    return definitions
+
+
+class ExerciseRules:
+    """
+    Exercise thresholds compiled into parallel float32 arrays, one slot per
+    exercise in self.names.
+
+    Comparisons are folded into one direction by multiplying with the sign
+    (+1 rising, -1 falling): a rising joint is perfect when angle >= perfect,
+    a falling one when -angle >= -perfect. classify() therefore evaluates any
+    mix of exercises and frames with the same three array comparisons.
+    """
+
+    def __init__(self, definitions):
+        self.definitions = definitions
+        self.names = list(definitions)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.joints = {
+            name: {side: tuple(d['joints'][side]) for side in ('right', 'left')}
+            for name, d in definitions.items()
+        }
+
+        def column(values):
+            return np.array(values, dtype=np.float32)
+
+        ds = list(definitions.values())
+        self.sign = column([DIRECTIONS[d['direction']] for d in ds])
+        self.rest = column([d['rest'] for d in ds])
+        self.correct_low = column([d['correct'][0] for d in ds])
+        self.correct_high = column([d['correct'][1] for d in ds])
+        self.perfect = column([d['perfect'] for d in ds])
+        self.signed_rest = self.rest * self.sign
+        self.signed_perfect = self.perfect * self.sign
+
+    @classmethod
+    def load(cls, path=EXERCISES_FILE):
+        return cls(load_definitions(path))
+
+    def __contains__(self, exercise):
+        return exercise in self.index
+
+    def rising(self, exercise):
+        """True if the joint angle increases during a rep (e.g. abduction)"""
+        return bool(self.sign[self.index[exercise]] > 0)
+
+    def classify(self, angles, exercises):
+        """
+        (at_rest, correct, perfect) boolean arrays shaped like `angles`.
+
+        `exercises` is a single name, or a sequence of names matching the
+        last axis of `angles` (one column per exercise). NaN angles are
+        False in all three.
+        """
+        if isinstance(exercises, str):
+            idx = self.index[exercises]
+        else:
+            idx = np.array([self.index[ex] for ex in exercises], dtype=np.intp)
+
+        angles = np.asarray(angles, dtype=np.float32)
+        signed = angles * self.sign[idx]
+        with np.errstate(invalid='ignore'):
+            at_rest = signed <= self.signed_rest[idx]
+            correct = (angles >= self.correct_low[idx]) & (angles <= self.correct_high[idx])
+            perfect = signed >= self.signed_perfect[idx]
+        return at_rest, correct, perfect
+
+    def is_correct(self, angle, exercise):
+        i = self.index.get(exercise)
+        return i is not None and bool(self.correct_low[i] <= angle <= self.correct_high[i])
+
+    def is_perfect(self, angle, exercise):
+        i = self.index.get(exercise)
+        return i is not None and bool(angle * self.sign[i] >= self.signed_perfect[i])
+
+
+# Definitions from EXERCISES_FILE, compiled once at import
+EXERCISES = ExerciseRules.load()
@@ -0,0 +1,82 @@
+"""
+Gunicorn configuration (loaded automatically by `gunicorn app:app`)
+Selects the worker class and manages the per-worker database connection
+pool, ingest queue and metrics exporter lifecycle
+"""
+
+import os
+import sys
+
+# GET /api/sessions/<id>/stream holds its request open for minutes, which a
+# sync worker cannot do without blocking every other request it would serve
+LIVE_STREAMING = os.environ.get('LIVE_STREAMING', '1').lower() in ('1', 'true', 'yes')
+
+# 'sync' (one request per worker at a time), 'gthread' (a thread per request)
+# or 'gevent' (cooperative I/O: a worker keeps serving other requests while
+# one waits on PostgreSQL). Live streaming needs gthread or gevent.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread' if LIVE_STREAMING else 'sync')
+
+# Threads per gthread worker; each open live stream takes one. Gunicorn turns
+# a sync worker with more than one thread into gthread, so sync keeps 1.
+threads = int(os.environ.get('GUNICORN_THREADS', 16)) if worker_class == 'gthread' else 1
+
+# Tell the app (imported after this file, in the workers) whether it may
+# hold requests open; on sync workers it answers streams with 501
+os.environ['LIVE_STREAMING'] = '1' if LIVE_STREAMING and worker_class not in (
+    'sync', 'gunicorn.workers.sync.SyncWorker') else '0'
+
+# Max simultaneous clients per gevent worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+
+def _db_pool():
+    app_module = sys.modules.get('app')
+    return getattr(app_module, 'db_pool', None)
+
+
+def _ingest_queue():
+    app_module = sys.modules.get('app')
+    return getattr(app_module, 'ingest_queue', None)
+
+
+def _metrics():
+    app_module = sys.modules.get('app')
+    return getattr(app_module, 'metrics', None)
+
+
+def _uses_gevent(worker):
+    return 'gevent' in worker.cfg.worker_class_str.lower()
+
+
+def post_fork(server, worker):
+    """Start each worker with an empty pool and its own ingest writer (matters with --preload)"""
+    if _uses_gevent(worker):
+        # Make psycopg2 wait for the server through gevent instead of blocking the worker
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    pool = _db_pool()
+    if pool is not None:
+        pool._check_pid()
+
+    ingest = _ingest_queue()
+    if ingest is not None:
+        ingest._check_pid()
+
+
+def post_worker_init(worker):
+    """Publish this worker's metrics for /metrics on the other workers (METRICS_DIR)"""
+    metrics = _metrics()
+    if metrics is not None:
+        metrics.start_exporter()
+
+
+def worker_exit(server, worker):
+    """Commit queued ingestion, then close pooled connections, when a worker shuts down"""
+    ingest = _ingest_queue()
+    if ingest is not None:
+        ingest.close()
+
+    pool = _db_pool()
+    if pool is not None:
+        pool.close_all()
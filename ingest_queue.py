@@ -0,0 +1,285 @@
+"""
+Write-behind ingestion for reps and form events
+Requests are validated and queued; a writer thread commits them in groups.
+Other write transactions can run on the same thread (run()), so one thread
+does all of a process's writes.
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+DURABILITY_MODES = ('async', 'journal', 'commit')
+
+
+class IngestQueue:
+    """
+    Bounded in-process queue drained by one writer thread.
+
+    write_batch(rep_rows, event_rows) must insert and commit the rows in a
+    single transaction. The writer takes everything queued (up to max_batch
+    requests) per transaction, so under load many requests share one commit.
+
+    durability:
+        'async'   -- 202 as soon as the request is queued; queued rows are
+                     lost if the process dies before the writer commits them
+        'journal' -- each request is appended and fsync'd to a per-process
+                     journal before the 202; journals left by dead workers
+                     are replayed on startup
+        'commit'  -- submit() blocks until the writer has committed the
+                     request's rows (group commit): the same guarantee as
+                     writing synchronously, but with a single writer per
+                     process, so SQLite writers never contend for the lock
+    """
+
+    def __init__(self, write_batch, max_depth=10000, max_batch=500, durability='async',
+                 journal_dir='ingest_journal', on_commit=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f'Unknown durability mode: {durability}')
+
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.durability = durability
+        self.on_commit = on_commit
+
+        self.max_depth = max_depth
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.transactions = 0
+
+        self.journal_dir = journal_dir
+        self.journal = None
+        self.pid = None
+        self._check_pid()
+
+    def _check_pid(self):
+        """Start the writer (and journal) in this process; threads do not survive fork"""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.items = queue.Queue(maxsize=self.max_depth)
+
+        if self.durability == 'journal':
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._replay_orphaned_journals()
+            self.journal = open(os.path.join(self.journal_dir, f'journal-{self.pid}.jsonl'), 'a')
+
+        self.thread = threading.Thread(target=self._writer, name='ingest-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, rep_rows, event_rows):
+        """
+        Queue one request's rows; False means the queue is full (apply
+        backpressure). In 'commit' mode this returns once the rows are
+        committed and raises IngestError if they were rejected.
+        """
+        self._check_pid()
+        waiter = _Waiter() if self.durability == 'commit' else None
+        item = (list(rep_rows), list(event_rows), waiter)
+        with self.lock:
+            if self.items.full():
+                self.rejected += 1
+                return False
+            if self.journal is not None:
+                self.journal.write(json.dumps(item[:2]) + '\n')
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+            self.items.put_nowait(item)
+            self.accepted += 1
+
+        if waiter is not None:
+            waiter.done.wait()
+            if waiter.error is not None:
+                raise IngestError(str(waiter.error))
+        return True
+
+    def run(self, work):
+        """
+        Run work() on the writer thread, between group commits, and return
+        its result or raise its exception
+        """
+        self._check_pid()
+        if threading.current_thread() is self.thread or not self.thread.is_alive():
+            return work()
+        call = _Call(work)
+        self.items.put(call)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def depth(self):
+        return self.items.qsize()
+
+    def stats(self):
+        return {
+            'mode': self.durability,
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'failed': self.failed,
+            'transactions': self.transactions,
+        }
+
+    def close(self, timeout=10.0):
+        """Stop accepting work and let the writer drain what is queued"""
+        self.items.put(None)
+        self.thread.join(timeout)
+
+    def _writer(self):
+        while True:
+            item = self.items.get()
+            if item is None:
+                break
+
+            # Group queued rows up to the next run() call, close() or max_batch
+            batch, call, stop = [], None, False
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, _Call):
+                    call = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self.items.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._commit(batch)
+                self._truncate_journal()
+            if call is not None:
+                call.run()
+            if stop:
+                break
+
+    def _commit(self, batch):
+        rep_rows = [row for reps, _, _ in batch for row in reps]
+        event_rows = [row for _, events, _ in batch for row in events]
+        errors = {}
+        try:
+            self.write_batch(rep_rows, event_rows)
+            self.transactions += 1
+            self.written += len(batch)
+        except Exception as e:
+            # One bad row (e.g. unknown session) must not sink the whole group
+            print(f"Ingest group of {len(batch)} failed ({e}); retrying individually")
+            for i, (reps, events, _) in enumerate(batch):
+                try:
+                    self.write_batch(reps, events)
+                    self.transactions += 1
+                    self.written += 1
+                except Exception as item_error:
+                    self.failed += 1
+                    errors[i] = item_error
+                    print(f"Dropping ingest request: {item_error}")
+
+        try:
+            if self.on_commit is not None:
+                self.on_commit(rep_rows, event_rows)
+        except Exception as e:
+            # The rows are committed; a failing callback must not stop the writer
+            print(f"Ingest on_commit callback failed: {e}")
+        finally:
+            for i, (_, _, waiter) in enumerate(batch):
+                if waiter is not None:
+                    waiter.error = errors.get(i)
+                    waiter.done.set()
+
+    def _truncate_journal(self):
+        # Everything journaled so far is committed once the queue is empty
+        if self.journal is None:
+            return
+        with self.lock:
+            if self.items.empty():
+                self.journal.truncate(0)
+                self.journal.seek(0)
+
+    def _replay_orphaned_journals(self):
+        """Commit journals left behind by workers that are no longer running"""
+        for path in glob.glob(os.path.join(self.journal_dir, 'journal-*.jsonl')):
+            pid = int(os.path.basename(path)[len('journal-'):-len('.jsonl')])
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+
+            # Claim the file atomically so only one starting worker replays it
+            claimed = f'{path}.replay-{os.getpid()}-{time.time_ns()}'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed) as f:
+                batch = [(*json.loads(line), None) for line in f if line.strip()]
+            if batch:
+                print(f"Replaying {len(batch)} journaled ingest requests from {path}")
+                for start in range(0, len(batch), self.max_batch):
+                    self._commit(batch[start:start + self.max_batch])
+            os.remove(claimed)
+
+
+class IngestError(Exception):
+    """Raised by submit() in 'commit' mode when the database rejected the rows"""
+
+
+class _Waiter:
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class _Call:
+    __slots__ = ('work', 'done', 'result', 'error')
+
+    def __init__(self, work):
+        self.work = work
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.work()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def queue_from_env(write_batch, on_commit=None, default_mode='sync'):
+    """IngestQueue configured from INGEST_* environment variables, or None in sync mode"""
+    mode = os.environ.get('INGEST_MODE', default_mode)
+    if mode == 'sync':
+        return None
+    return IngestQueue(
+        write_batch,
+        max_depth=int(os.environ.get('INGEST_MAX_DEPTH', 10000)),
+        max_batch=int(os.environ.get('INGEST_MAX_BATCH', 500)),
+        durability=mode,
+        journal_dir=os.environ.get('INGEST_JOURNAL_DIR', 'ingest_journal'),
+        on_commit=on_commit,
+    )
@@ -0,0 +1,112 @@
+"""
+Frame-level pose landmark recordings
+One structured .npy file per session: a float64 timestamp plus the 33
+landmarks (x, y, z, visibility) as float32 per frame. The files can be
+memory-mapped with np.load(mmap_mode='r') for replay and re-scoring.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from pose_angles import NUM_LANDMARKS, AngleEngine, landmarks_to_array
+from rep_scoring import count_reps
+
+FRAME_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('landmarks', '<f4', (NUM_LANDMARKS, 4)),
+])
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class LandmarkRecorder:
+    """
+    Records every frame's landmarks into preallocated FRAME_DTYPE chunks.
+
+    record() only copies into the current chunk, so per-frame cost is
+    constant; a new chunk is allocated every `chunk_frames` frames (30s of
+    video at 30 FPS by default). Frames without a detected pose are stored
+    with zero visibility.
+    """
+
+    def __init__(self, chunk_frames=900):
+        self.chunk_frames = chunk_frames
+        self.chunks = []
+        self.filled = 0
+        self.frames = 0
+        self.started_at = None
+
+    def record(self, landmarks, timestamp=None):
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        if self.started_at is None:
+            self.started_at = timestamp
+
+        if not self.chunks or self.filled == self.chunk_frames:
+            self.chunks.append(np.zeros(self.chunk_frames, dtype=FRAME_DTYPE))
+            self.filled = 0
+
+        chunk = self.chunks[-1]
+        chunk['t'][self.filled] = timestamp - self.started_at
+        if landmarks is not None:
+            if isinstance(landmarks, np.ndarray):
+                chunk['landmarks'][self.filled] = landmarks
+            else:
+                landmarks_to_array(landmarks, out=chunk['landmarks'][self.filled])
+
+        self.filled += 1
+        self.frames += 1
+
+    def save(self, path):
+        """Write all recorded frames to a .npy file; returns the path"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=FRAME_DTYPE, shape=(self.frames,))
+        offset = 0
+        for i, chunk in enumerate(self.chunks):
+            count = self.filled if i == len(self.chunks) - 1 else self.chunk_frames
+            out[offset:offset + count] = chunk[:count]
+            offset += count
+        out.flush()
+        del out
+        return path
+
+
+def open_landmarks(path):
+    """Memory-map a recording; returns (timestamps, landmarks) views of shape (F,) and (F, 33, 4)"""
+    frames = np.load(path, mmap_mode='r')
+    if frames.dtype != FRAME_DTYPE:
+        raise ValueError(f'Not a landmark recording: dtype {frames.dtype}')
+    return frames['t'], frames['landmarks']
+
+
+def save_stream(stream, path):
+    """Copy an uploaded recording from a file-like stream to `path`; returns the frame count"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.part'
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+        timestamps, _ = open_landmarks(tmp_path)
+        frames = len(timestamps)
+        del timestamps
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return frames
+
+
+def rescore(path, exercise, engine=None):
+    """Re-run rep detection over a recording; returns (reps, form_events)"""
+    timestamps, landmarks = open_landmarks(path)
+    if len(timestamps) < 2:
+        return [], []
+    fps = (len(timestamps) - 1) / max(float(timestamps[-1] - timestamps[0]), 1e-6)
+    angles = (engine or AngleEngine()).bilateral_series(landmarks, exercise, fill=np.nan)
+    return count_reps(angles, exercise, fps)
@@ -0,0 +1,176 @@
+"""
+Live per-session event streams (Server-Sent Events)
+Writes publish rep, form event and session updates; browsers watching a
+session receive them over GET /api/sessions/<id>/stream
+"""
+
+import itertools
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+# Max messages buffered for a slow subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+PG_CHANNEL = 'session_events'
+
+
+def live_message(event, session_id, data):
+    """A message as published and streamed: event name, session and payload"""
+    return {'event': event, 'session_id': session_id, 'data': data}
+
+
+class LiveEvents:
+    """
+    In-process fan-out from writers to stream subscribers.
+
+    Writers call before_commit(cursor, messages) inside their transaction and
+    after_commit(messages) once it committed. This class delivers in
+    after_commit, which only reaches subscribers in the same process - fine
+    for a single worker (SQLite, development server).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.ids = itertools.count(1)
+
+    def subscribe(self, session_id):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.setdefault(session_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, session_id, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[session_id]
+
+    def before_commit(self, cursor, messages):
+        pass
+
+    def after_commit(self, messages):
+        self._deliver(messages)
+
+    def stats(self):
+        with self.lock:
+            return {'sessions': len(self.subscribers),
+                    'subscribers': sum(len(s) for s in self.subscribers.values())}
+
+    def _deliver(self, messages):
+        for message in messages:
+            with self.lock:
+                subscribers = list(self.subscribers.get(message['session_id'], ()))
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    # The browser fell behind; have it reload the session instead
+                    _replace_with_resync(subscriber, message['session_id'])
+
+    def stream(self, session_id, timeout=300.0, keepalive=15.0):
+        """
+        Generator of SSE text for one subscriber. Ends after `timeout` seconds
+        or when the session completes; EventSource reconnects on its own.
+        """
+        subscriber = self.subscribe(session_id)
+        deadline = time.monotonic() + timeout
+        try:
+            yield 'retry: 2000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    message = subscriber.get(timeout=min(keepalive, max(deadline - time.monotonic(), 0.01)))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+                if message['event'] == 'session' and message['data'].get('status') == 'completed':
+                    yield 'event: end\ndata: {}\n\n'
+                    break
+        finally:
+            self.unsubscribe(session_id, subscriber)
+
+
+def _replace_with_resync(subscriber, session_id):
+    while True:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            break
+    try:
+        subscriber.put_nowait(live_message('resync', session_id, {}))
+    except queue.Full:
+        pass
+
+
+class PostgresLiveEvents(LiveEvents):
+    """
+    Fan-out across gunicorn workers through PostgreSQL LISTEN/NOTIFY.
+
+    Messages are NOTIFYed inside the writer's transaction, so they are sent
+    only if it commits. Each worker runs one listener thread (started with the
+    first subscriber, on its own connection) that delivers them locally.
+    """
+
+    def __init__(self, connect):
+        super().__init__()
+        self.connect = connect
+        self.listener = None
+        self.pid = os.getpid()
+
+    def subscribe(self, session_id):
+        self._ensure_listener()
+        return super().subscribe(session_id)
+
+    def before_commit(self, cursor, messages):
+        if not messages:
+            return
+        # The id keeps identical payloads apart (NOTIFY folds duplicates per transaction)
+        payloads = [json.dumps(dict(m, id=f'{self.pid}-{next(self.ids)}')) for m in messages]
+        cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                       (PG_CHANNEL, payloads))
+
+    def after_commit(self, messages):
+        pass
+
+    def _ensure_listener(self):
+        with self.lock:
+            if self.listener is not None and self.listener.is_alive() and self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.listener = threading.Thread(target=self._listen, name='live-events', daemon=True)
+            self.listener.start()
+
+    def _listen(self):
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {PG_CHANNEL}')
+                backoff = 1.0
+                while True:
+                    if select.select([conn], [], [], 30.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    messages = []
+                    while conn.notifies:
+                        messages.append(json.loads(conn.notifies.pop(0).payload))
+                    self._deliver(messages)
+            except Exception as e:
+                print(f"Live event listener error: {e}; reconnecting in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
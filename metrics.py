@@ -0,0 +1,278 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4)
+Counters, histograms and callback gauges with labels, shared by the API
+(/metrics) and the pose client (optional local exporter)
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+"?(\w+)', re.IGNORECASE)
+
+
+def sql_label(sql):
+    """Low-cardinality label for a statement, e.g. 'INSERT reps' or 'SELECT sessions'"""
+    if isinstance(sql, bytes):
+        sql = sql[:200].decode('utf-8', 'replace')
+    words = sql.split(None, 1)
+    if not words:
+        return 'EMPTY'
+    table = _SQL_TABLE.search(sql[:500])
+    return f"{words[0].upper()} {table.group(1)}" if table else words[0].upper()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self.lock:
+            return {key: value for key, value in self.values.items()}
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            return {key: list(state) for key, state in self.values.items()}
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Callback(_Metric):
+    """Value read at scrape time: fn() returns a number or {label values tuple: number}"""
+
+    def __init__(self, name, help, fn, labelnames=(), kind='gauge'):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in key): float(v) for key, v in value.items()}
+        return {(): float(value)}
+
+
+class MetricsRegistry:
+    """
+    Metrics of one process. With `directory` set (e.g. shared by all gunicorn
+    workers) each process also writes its snapshot there every
+    `export_interval` seconds, and render() merges the snapshots of all
+    workers seen within `stale_after` seconds, so any worker can answer a
+    scrape for the whole server.
+    """
+
+    def __init__(self, directory=None, export_interval=5.0, stale_after=60.0):
+        self.metrics = []
+        self.directory = directory
+        self.export_interval = export_interval
+        self.stale_after = stale_after
+        self.exporter = None
+        self.pid = None
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self._add(Callback(name, help, fn, labelnames, 'gauge'))
+
+    def counter_callback(self, name, help, fn, labelnames=()):
+        """A counter maintained elsewhere (e.g. cache hits), read at scrape time"""
+        return self._add(Callback(name, help, fn, labelnames, 'counter'))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        snapshot = {}
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                # A failing callback must not break the whole scrape
+                continue
+            snapshot[metric.name] = {
+                'kind': metric.kind,
+                'help': metric.help,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': [[list(key), value] for key, value in samples.items()],
+            }
+        return snapshot
+
+    def render(self):
+        snapshots = [self.snapshot()]
+        if self.directory:
+            self.start_exporter()
+            snapshots += self._other_snapshots()
+        return render_snapshots(snapshots)
+
+    # Cross-process aggregation
+
+    def start_exporter(self):
+        """Begin writing this process's snapshot to `directory` (idempotent, fork-aware)"""
+        if not self.directory or self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        self.exporter = threading.Thread(target=self._export_loop, name='metrics-export', daemon=True)
+        self.exporter.start()
+
+    def _export_loop(self):
+        path = os.path.join(self.directory, f'{self.pid}.json')
+        while True:
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+            time.sleep(self.export_interval)
+
+    def _other_snapshots(self):
+        snapshots = []
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            if os.path.basename(path) == f'{os.getpid()}.json':
+                continue
+            try:
+                if now - os.path.getmtime(path) > self.stale_after:
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def render_snapshots(snapshots):
+    """Sum snapshots of several processes and format them for Prometheus"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            for key, value in metric['samples']:
+                key = tuple(key)
+                if key not in target['samples']:
+                    target['samples'][key] = value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(target['samples'][key], value)]
+                else:
+                    target['samples'][key] += value
+
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric['labelnames']
+        for key, value in sorted(metric['samples'].items()):
+            labels = list(zip(labelnames, key))
+            if metric['kind'] == 'histogram':
+                cumulative = 0
+                bounds = [_format_number(b) for b in metric['buckets']] + ['+Inf']
+                for bound, count in zip(bounds, value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_format_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_format_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def serve(registry, port, host='127.0.0.1'):
+    """Expose a registry on http://host:port/metrics from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
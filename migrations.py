@@ -0,0 +1,326 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL
+init_db creates the base tables; every later schema change is a numbered
+migration recorded in the schema_migrations table
+
+Usage:
+    python migrations.py             # apply pending migrations
+    python migrations.py --status    # list applied/pending versions
+    python migrations.py --to 0      # roll back to a version
+"""
+
+# Recomputes the exercise_stats rollup from raw sessions (same SQL on both backends)
+EXERCISE_STATS_BACKFILL = '''
+    INSERT INTO exercise_stats (exercise_type, session_count, total_reps, score_sum)
+    SELECT exercise_type, COUNT(*), COALESCE(SUM(total_reps), 0), COALESCE(SUM(average_score), 0)
+    FROM sessions
+    WHERE status = 'completed'
+    GROUP BY exercise_type
+'''
+
+# Creates a monthly partition of {table} for every month with rows in {source}
+_MONTH_PARTITIONS = '''
+    DO $$
+    DECLARE month DATE;
+    BEGIN
+        FOR month IN SELECT DISTINCT date_trunc('month', timestamp)::date FROM {source} LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                           '{table}_' || to_char(month, 'YYYY_MM'), month, month + interval '1 month');
+        END LOOP;
+    END $$
+'''
+
+_PARTITIONED_COLUMNS = {
+    'reps': '''
+        id INTEGER NOT NULL DEFAULT nextval('reps_id_seq'),
+        session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+        rep_number INTEGER NOT NULL,
+        score REAL NOT NULL,
+        perfect_frames INTEGER DEFAULT 0,
+        standard_frames INTEGER DEFAULT 0,
+        timestamp TIMESTAMP NOT NULL,
+        tracked_side VARCHAR(10),
+        best_angle REAL''',
+    'form_events': '''
+        id INTEGER NOT NULL DEFAULT nextval('form_events_id_seq'),
+        session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+        event_type VARCHAR(50) NOT NULL,
+        timestamp TIMESTAMP NOT NULL,
+        angle REAL,
+        form_status VARCHAR(20),
+        feedback_message TEXT''',
+}
+
+# Per-session lookup indexes from migration 1, recreated on the new table
+_SESSION_INDEXES = {
+    'reps': ('idx_reps_session_rep', 'session_id, rep_number'),
+    'form_events': ('idx_form_events_session_ts', 'session_id, timestamp'),
+}
+
+
+def _rebuild_table(table, partitioned):
+    """
+    PostgreSQL statements moving `table` into a new table partitioned by
+    month of timestamp (or back to a plain table), keeping ids and sequence
+    """
+    old = f'{table}_old'
+    index, index_columns = _SESSION_INDEXES[table]
+    if partitioned:
+        create = [
+            f'CREATE TABLE {table} ({_PARTITIONED_COLUMNS[table]},\n        PRIMARY KEY (id, timestamp)'
+            f') PARTITION BY RANGE (timestamp)',
+            f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT',
+            _MONTH_PARTITIONS.format(table=table, source=old),
+        ]
+    else:
+        create = [f'CREATE TABLE {table} ({_PARTITIONED_COLUMNS[table]},\n        PRIMARY KEY (id))']
+    return [
+        f'ALTER TABLE {table} RENAME TO {old}',
+        f'ALTER INDEX {table}_pkey RENAME TO {old}_pkey',
+        f'DROP INDEX IF EXISTS {index}',
+        *create,
+        f'INSERT INTO {table} SELECT * FROM {old}',
+        f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id',
+        f'DROP TABLE {old}',
+        f'CREATE INDEX IF NOT EXISTS {index} ON {table} ({index_columns})',
+    ]
+
+
+# (version, description, {backend: up statements}, {backend: down statements})
+MIGRATIONS = [
+    (
+        1,
+        'Indexes for session list and per-session rep/event lookups',
+        {
+            'sqlite': [
+                'CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions (start_time, id)',
+                'CREATE INDEX IF NOT EXISTS idx_reps_session_rep ON reps (session_id, rep_number)',
+                'CREATE INDEX IF NOT EXISTS idx_form_events_session_ts ON form_events (session_id, timestamp)',
+            ],
+            'postgres': [
+                'CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions (start_time DESC, id DESC)',
+                'CREATE INDEX IF NOT EXISTS idx_reps_session_rep ON reps (session_id, rep_number)',
+                'CREATE INDEX IF NOT EXISTS idx_form_events_session_ts ON form_events (session_id, timestamp)',
+            ],
+        },
+        {
+            'sqlite': [
+                'DROP INDEX IF EXISTS idx_sessions_start_time',
+                'DROP INDEX IF EXISTS idx_reps_session_rep',
+                'DROP INDEX IF EXISTS idx_form_events_session_ts',
+            ],
+            'postgres': [
+                'DROP INDEX IF EXISTS idx_sessions_start_time',
+                'DROP INDEX IF EXISTS idx_reps_session_rep',
+                'DROP INDEX IF EXISTS idx_form_events_session_ts',
+            ],
+        },
+    ),
+    (
+        2,
+        'Per-exercise rollup of completed sessions for /api/stats',
+        {
+            'sqlite': [
+                '''CREATE TABLE IF NOT EXISTS exercise_stats (
+                    exercise_type TEXT PRIMARY KEY,
+                    session_count INTEGER NOT NULL DEFAULT 0,
+                    total_reps INTEGER NOT NULL DEFAULT 0,
+                    score_sum REAL NOT NULL DEFAULT 0
+                )''',
+                'DELETE FROM exercise_stats',
+                EXERCISE_STATS_BACKFILL,
+            ],
+            'postgres': [
+                '''CREATE TABLE IF NOT EXISTS exercise_stats (
+                    exercise_type VARCHAR(50) PRIMARY KEY,
+                    session_count INTEGER NOT NULL DEFAULT 0,
+                    total_reps BIGINT NOT NULL DEFAULT 0,
+                    score_sum DOUBLE PRECISION NOT NULL DEFAULT 0
+                )''',
+                'DELETE FROM exercise_stats',
+                EXERCISE_STATS_BACKFILL,
+            ],
+        },
+        {
+            'sqlite': ['DROP TABLE IF EXISTS exercise_stats'],
+            'postgres': ['DROP TABLE IF EXISTS exercise_stats'],
+        },
+    ),
+    (
+        3,
+        'Cached analytics summaries of completed sessions',
+        {
+            'sqlite': [
+                '''CREATE TABLE IF NOT EXISTS session_summaries (
+                    session_id INTEGER PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    computed_at TEXT NOT NULL
+                )''',
+            ],
+            'postgres': [
+                '''CREATE TABLE IF NOT EXISTS session_summaries (
+                    session_id INTEGER PRIMARY KEY REFERENCES sessions (id) ON DELETE CASCADE,
+                    summary TEXT NOT NULL,
+                    computed_at TIMESTAMP NOT NULL
+                )''',
+            ],
+        },
+        {
+            'sqlite': ['DROP TABLE IF EXISTS session_summaries'],
+            'postgres': ['DROP TABLE IF EXISTS session_summaries'],
+        },
+    ),
+    (
+        4,
+        'Monthly partitions of reps/form_events and compacted form event rollups',
+        {
+            'sqlite': [
+                '''CREATE TABLE IF NOT EXISTS form_event_rollups (
+                    session_id INTEGER NOT NULL,
+                    event_type TEXT NOT NULL,
+                    form_status TEXT NOT NULL,
+                    event_count INTEGER NOT NULL,
+                    min_angle REAL,
+                    max_angle REAL,
+                    angle_sum REAL,
+                    first_at TEXT NOT NULL,
+                    last_at TEXT NOT NULL,
+                    PRIMARY KEY (session_id, event_type, form_status)
+                )''',
+                'CREATE INDEX IF NOT EXISTS idx_reps_timestamp ON reps (timestamp)',
+                'CREATE INDEX IF NOT EXISTS idx_form_events_timestamp ON form_events (timestamp)',
+            ],
+            'postgres': [
+                *_rebuild_table('reps', partitioned=True),
+                *_rebuild_table('form_events', partitioned=True),
+                '''CREATE TABLE IF NOT EXISTS form_event_rollups (
+                    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+                    event_type VARCHAR(50) NOT NULL,
+                    form_status VARCHAR(20) NOT NULL,
+                    event_count INTEGER NOT NULL,
+                    min_angle REAL,
+                    max_angle REAL,
+                    angle_sum DOUBLE PRECISION,
+                    first_at TIMESTAMP NOT NULL,
+                    last_at TIMESTAMP NOT NULL,
+                    PRIMARY KEY (session_id, event_type, form_status)
+                )''',
+            ],
+        },
+        {
+            'sqlite': [
+                'DROP TABLE IF EXISTS form_event_rollups',
+                'DROP INDEX IF EXISTS idx_reps_timestamp',
+                'DROP INDEX IF EXISTS idx_form_events_timestamp',
+            ],
+            'postgres': [
+                'DROP TABLE IF EXISTS form_event_rollups',
+                *_rebuild_table('reps', partitioned=False),
+                *_rebuild_table('form_events', partitioned=False),
+            ],
+        },
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers migrate (and
+# create partitions, see retention.py) once
+PG_LOCK_KEY = 72_310_001
+
+
+def _lock(cursor, backend):
+    """Serialize migrations across gunicorn workers starting at the same time"""
+    if backend == 'postgres':
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (PG_LOCK_KEY,))
+    else:
+        cursor.execute('BEGIN IMMEDIATE')
+
+
+def _ensure_table(conn, backend):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at {} NOT NULL
+        )
+    '''.format('TIMESTAMP DEFAULT CURRENT_TIMESTAMP' if backend == 'postgres'
+               else "TEXT DEFAULT (datetime('now'))"))
+    conn.commit()
+    cursor.close()
+
+
+def applied_versions(conn, backend):
+    """Set of migration versions already applied"""
+    _ensure_table(conn, backend)
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM schema_migrations')
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    conn.commit()
+    return versions
+
+
+def migrate(conn, backend, target=None):
+    """
+    Bring the schema to `target` (default: latest), applying or rolling back
+    migrations one per transaction. Returns the list of versions changed.
+    """
+    target = LATEST_VERSION if target is None else target
+    param = '%s' if backend == 'postgres' else '?'
+    _ensure_table(conn, backend)
+    changed = []
+
+    # Roll back newest-first, then apply oldest-first
+    plan = ([(m, True) for m in reversed(MIGRATIONS) if m[0] > target] +
+            [(m, False) for m in MIGRATIONS if m[0] <= target])
+
+    for (version, description, up, down), rollback in plan:
+        cursor = conn.cursor()
+        _lock(cursor, backend)
+
+        cursor.execute(f'SELECT 1 FROM schema_migrations WHERE version = {param}', (version,))
+        is_applied = cursor.fetchone() is not None
+
+        if is_applied == rollback:
+            for statement in (down if rollback else up)[backend]:
+                cursor.execute(statement)
+            if rollback:
+                cursor.execute(f'DELETE FROM schema_migrations WHERE version = {param}', (version,))
+            else:
+                cursor.execute(
+                    f'INSERT INTO schema_migrations (version, description) VALUES ({param}, {param})',
+                    (version, description)
+                )
+            changed.append(version)
+
+        conn.commit()
+        cursor.close()
+
+    return changed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Apply or roll back schema migrations')
+    parser.add_argument('--status', action='store_true', help='show migration status only')
+    parser.add_argument('--to', type=int, help='target version (default: latest)')
+    args = parser.parse_args()
+
+    # Importing app creates the base tables and applies pending migrations
+    from app import DATABASE_URL, get_db_connection
+
+    backend = 'postgres' if DATABASE_URL else 'sqlite'
+    conn = get_db_connection()
+
+    if not args.status:
+        changed = migrate(conn, backend, args.to)
+        print(f"Changed versions: {changed or 'none'}")
+
+    applied = applied_versions(conn, backend)
+    for version, description, _, _ in MIGRATIONS:
+        state = 'applied' if version in applied else 'pending'
+        print(f"{version:>4}  {state:<8} {description}")
+    conn.close()
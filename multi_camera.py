@@ -0,0 +1,288 @@
+"""
+Concurrent multi-camera session runner
+Tracks several patients at once: every camera stream gets its own pose
+worker process and its own database session, while one supervisor process
+owns the shared telemetry uploader
+
+Usage:
+    python multi_camera.py 0:squat 1:elbow
+    python multi_camera.py 0:squat 2:abduction rtsp://cam3/stream:hipflex --target-fps 12
+    python multi_camera.py exercise.mp4:squat --no-upload
+
+Each stream is SOURCE:EXERCISE where SOURCE is a camera index, a video file
+or a stream URL. Press Ctrl+C to end all sessions.
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from exercise_rules import EXERCISES
+from pipeline import StageStats
+from pose_angles import AngleEngine, landmarks_to_array
+from rep_scoring import RepTracker
+from telemetry import SESSION_ID, TelemetryUploader
+
+STATS_INTERVAL = 2.0
+
+# Worker-process state set by _init_worker
+_messages = None
+_stop = None
+
+
+def _init_worker(messages, stop):
+    global _messages, _stop
+    _messages, _stop = messages, stop
+    # The supervisor handles Ctrl+C and tells workers to stop through `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(1)
+
+
+def _make_pose(target_fps):
+    if target_fps:
+        from adaptive_pose import AdaptivePose
+        return AdaptivePose(target_fps=target_fps)
+
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=1,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def run_stream(stream_id, source, exercise, cpu=None, target_fps=None):
+    """
+    Capture, pose and rep detection for one stream (runs in a pool worker
+    for the lifetime of the stream). Sends ('rep', ...), ('stats', ...) and
+    a final ('done', ...) message to the supervisor.
+    """
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        _messages.put(('done', stream_id, {'error': f'Could not open {source!r}'}))
+        return
+
+    pose = _make_pose(target_fps)
+    engine = AngleEngine()
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    stats = {name: StageStats(name) for name in ('capture', 'inference')}
+
+    # Constant work per frame, nothing buffered between reps
+    tracker = RepTracker.live(exercise, target_fps or 30.0)
+    right, left = engine.columns_for(exercise)
+    last_stats = time.monotonic()
+    error = None
+
+    try:
+        while not _stop.is_set():
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            captured_at = datetime.now()
+            stats['capture'].record(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+            rgb.flags.writeable = False
+            result = pose.process(rgb)
+            stats['inference'].record(time.perf_counter() - start)
+
+            now = time.monotonic()
+            if result.pose_landmarks:
+                landmarks_to_array(result.pose_landmarks.landmark, out=landmarks)
+                frame_angles = engine.compute(landmarks, fill=np.nan)
+                completed = tracker.update(frame_angles[right], frame_angles[left], now)
+                if completed:
+                    _report_rep(stream_id, captured_at, *completed)
+
+            if now - last_stats >= STATS_INTERVAL:
+                last_stats = now
+                _messages.put(('stats', stream_id, _summary(stats)))
+    except Exception as e:
+        error = str(e)
+    finally:
+        cap.release()
+
+    summary = _summary(stats)
+    summary['reps'] = tracker.repcount
+    if error:
+        summary['error'] = error
+    _messages.put(('done', stream_id, summary))
+
+
+def _report_rep(stream_id, captured_at, rep, event):
+    """Send a rep completed on the frame captured at `captured_at` to the supervisor"""
+    timestamp = captured_at.isoformat()
+    rep.pop('offset')
+    event.pop('offset')
+    _messages.put(('rep', stream_id, dict(rep, timestamp=timestamp),
+                   dict(event, timestamp=timestamp)))
+
+
+def _summary(stats):
+    summary = {name: s.summary() for name, s in stats.items()}
+    return {
+        'fps': summary['capture']['fps'],
+        'inference_ms': summary['inference']['avg_ms'],
+        'frames': summary['capture']['frames'],
+    }
+
+
+class StreamSupervisor:
+    """
+    Starts one pool worker per stream, creates a session per stream through
+    a shared TelemetryUploader and forwards each worker's reps to the API.
+    """
+
+    def __init__(self, streams, api_url='http://localhost:5000/api', upload=True,
+                 target_fps=None, pin_cpus=True):
+        self.streams = streams
+        self.target_fps = target_fps
+        self.pin_cpus = pin_cpus
+        self.uploader = TelemetryUploader(api_url) if upload else None
+        self.session_refs = {}
+        self.rep_scores = {i: [] for i in range(len(streams))}
+        self.stats = {i: {} for i in range(len(streams))}
+        self.started_at = {}
+
+    def _cpus(self):
+        if not self.pin_cpus or not hasattr(os, 'sched_getaffinity'):
+            return [None] * len(self.streams)
+        cpus = sorted(os.sched_getaffinity(0))
+        # Leave the first core to the supervisor and the uploader when possible
+        usable = cpus[1:] if len(cpus) > len(self.streams) else cpus
+        return [usable[i % len(usable)] for i in range(len(self.streams))]
+
+    def run(self):
+        ctx = multiprocessing.get_context('spawn')
+        messages = ctx.Queue()
+        stop = ctx.Event()
+        done = set()
+
+        for i, (source, exercise) in enumerate(self.streams):
+            self.started_at[i] = time.time()
+            if self.uploader:
+                self.session_refs[i] = self.uploader.create_session(exercise, 'group')
+
+        with ProcessPoolExecutor(max_workers=len(self.streams), mp_context=ctx,
+                                 initializer=_init_worker, initargs=(messages, stop)) as pool:
+            futures = [pool.submit(run_stream, i, source, exercise, cpu, self.target_fps)
+                       for i, ((source, exercise), cpu) in enumerate(zip(self.streams, self._cpus()))]
+            last_print = time.monotonic()
+            try:
+                while len(done) < len(self.streams):
+                    try:
+                        message = messages.get(timeout=0.5)
+                    except queue.Empty:
+                        failed = [i for i, f in enumerate(futures) if f.done() and f.exception()]
+                        for i in failed:
+                            if i not in done:
+                                self._finish(i, {'error': str(futures[i].exception())})
+                                done.add(i)
+                        continue
+                    kind, stream_id = message[0], message[1]
+                    if kind == 'rep':
+                        self._log_rep(stream_id, *message[2:])
+                    elif kind == 'stats':
+                        self.stats[stream_id] = message[2]
+                    elif kind == 'done':
+                        self._finish(stream_id, message[2])
+                        done.add(stream_id)
+
+                    if time.monotonic() - last_print >= STATS_INTERVAL:
+                        last_print = time.monotonic()
+                        self._print_status()
+            except KeyboardInterrupt:
+                print("\nStopping streams...")
+                stop.set()
+                while len(done) < len(self.streams):
+                    try:
+                        kind, stream_id, *rest = messages.get(timeout=10)
+                    except queue.Empty:
+                        break
+                    if kind == 'rep':
+                        self._log_rep(stream_id, *rest)
+                    elif kind == 'done':
+                        self._finish(stream_id, rest[0])
+                        done.add(stream_id)
+
+        if self.uploader:
+            self.uploader.close()
+            if self.uploader.spooled:
+                print(f"API unreachable: {self.uploader.spooled} requests spooled for later upload")
+
+    def _log_rep(self, stream_id, rep, event):
+        self.rep_scores[stream_id].append(rep['score'])
+        source, exercise = self.streams[stream_id]
+        print(f"[{stream_id}] {exercise} rep {rep['rep_number']}: {rep['score']:.0f}")
+        if self.uploader:
+            ref = self.session_refs[stream_id]
+            self.uploader.submit('POST', '/reps', dict(rep, session_id=None), ref)
+            self.uploader.submit('POST', '/form_events', dict(event, session_id=None), ref)
+
+    def _finish(self, stream_id, summary):
+        scores = self.rep_scores[stream_id]
+        source, exercise = self.streams[stream_id]
+        if summary.get('error'):
+            print(f"[{stream_id}] {source}: {summary['error']}")
+        print(f"[{stream_id}] {exercise}: {len(scores)} reps, {summary.get('fps', 0)} FPS, "
+              f"{summary.get('inference_ms', 0)} ms inference")
+        if self.uploader and stream_id in self.session_refs:
+            self.uploader.submit('PUT', f'/sessions/{SESSION_ID}', {
+                'total_reps': len(scores),
+                'average_score': float(np.mean(scores)) if scores else 0.0,
+                'duration_seconds': int(time.time() - self.started_at[stream_id]),
+                'status': 'completed'
+            }, self.session_refs[stream_id])
+
+    def _print_status(self):
+        parts = []
+        for i, (source, exercise) in enumerate(self.streams):
+            s = self.stats[i]
+            parts.append(f"[{i}] {exercise} {s.get('fps', 0):>5} FPS {len(self.rep_scores[i])} reps")
+        print(' | '.join(parts))
+
+
+def parse_stream(spec):
+    """'0:squat' -> (0, 'squat'); sources may themselves contain colons (URLs)"""
+    source, _, exercise = spec.rpartition(':')
+    if not source or exercise not in EXERCISES:
+        raise argparse.ArgumentTypeError(
+            f"expected SOURCE:EXERCISE with exercise one of {', '.join(EXERCISES.names)}")
+    return (int(source) if source.isdigit() else source), exercise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('streams', nargs='+', type=parse_stream, metavar='SOURCE:EXERCISE')
+    parser.add_argument('--api-url', default='http://localhost:5000/api')
+    parser.add_argument('--no-upload', action='store_true', help='only print reps, do not log sessions')
+    parser.add_argument('--target-fps', type=float, help='adaptive inference per stream (see adaptive_pose.py)')
+    parser.add_argument('--no-affinity', action='store_true', help='do not pin streams to CPU cores')
+    args = parser.parse_args()
+
+    StreamSupervisor(
+        args.streams,
+        api_url=args.api_url,
+        upload=not args.no_upload,
+        target_fps=args.target_fps,
+        pin_cpus=not args.no_affinity
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
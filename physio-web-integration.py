@@ -11,29 +11,66 @@ import pyttsx3
 import threading
 import queue
 import time
-import requests
 import json
+import os
+
+from adaptive_pose import AdaptivePose
+from exercise_rules import EXERCISES
+from landmark_store import LandmarkRecorder
+from metrics import MetricsRegistry, serve
+from pipeline import FramePipeline
+from pose_angles import DEFAULT_ANGLE, AngleEngine, landmarks_to_array
+from profiler import SamplingProfiler
+from rep_scoring import RepTracker, score_from_ratio
+from telemetry import SESSION_ID, TelemetryUploader
 
 class SmartPhysioWebIntegrated:
-    def __init__(self, exercise, session_mode, api_url='http://localhost:5000/api'):
+    def __init__(self, exercise, session_mode, api_url='http://localhost:5000/api',
+                 buffered=False, flush_size=50, flush_interval=2.0, target_fps=None,
+                 metrics_port=None, profile_path=None):
         self.exercise = exercise.lower()
         self.session_mode = session_mode
         self.api_url = api_url
-        self.session_id = None
+        self.session_ref = None
+        
+        # All API calls go through a background sender so a slow or
+        # unreachable server never stalls the capture loop
+        self.uploader = TelemetryUploader(api_url)
+        
+        # Buffered mode: reps/form events are sent in batches to
+        # /sessions/<id>/events:batch when flush_size or flush_interval is hit
+        self.buffered = buffered
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending_reps = []
+        self.pending_form_events = []
+        self.last_flush_time = time.monotonic()
         
-        # Initialize MediaPipe
+        # Initialize MediaPipe. With a target FPS, inference adapts model
+        # complexity, skips frames beyond that rate and low-motion frames
         self.mppose = mp.solutions.pose
-        self.pose = self.mppose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        if target_fps:
+            self.pose = AdaptivePose(target_fps=target_fps)
+        else:
+            self.pose = self.mppose.Pose(
+                static_image_mode=False,
+                model_complexity=1,
+                enable_segmentation=False,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
         self.mpdrawing = mp.solutions.drawing_utils
         self.current_ex = self.exercise
         self.FPS = 30
         
+        # All joint angles for a frame are computed in one vectorized pass
+        self.angle_engine = AngleEngine()
+        self.landmark_buffer = np.zeros((33, 4), dtype=np.float32)
+        
+        # Every frame's landmarks, uploaded as one binary file per session
+        self.recorder = LandmarkRecorder()
+        self.recordings_dir = 'recordings'
+        
         # Audio setup
         self.audio_queue = queue.Queue()
         self.engine = pyttsx3.init()
@@ -48,123 +85,125 @@ class SmartPhysioWebIntegrated:
         self.last_status_message = ""
         self.last_key_press_time = 0
         
-        # Perfect thresholds
-        self.squat_perfect_angle = 90
-        self.abd_perfect_angle = 150
-        self.eflex_perfect_angle = 40
-        self.hflex_perfect_angle = 100
-        self.wext_perfect_angle = 120
-        
-        # Correct/Rest angles
-        self.down_knee_angle = 110
-        self.up_knee_angle = 160
-        self.abd_down_angle = 30
-        self.abd_up_angle = 90
-        self.abd_max_angle = 170
-        self.eflex_straight_angle = 160
-        self.eflex_bent_angle = 70
-        self.hflex_straight_angle = 165
-        self.hflex_bent_angle = 120
-        self.wext_straight_angle = 165
-        self.wext_bent_angle = 135
-        
-        # Exercise states
-        self.exercises = {
-            "squat": self._get_state(),
-            "abduction": self._get_state(),
-            "elbow": self._get_state(),
-            "hipflex": self._get_state(),
-            "wristext": self._get_state()
-        }
+        # Rest/correct/perfect thresholds per exercise, from exercises.json
+        self.rules = EXERCISES
+        
+        # Rep state machine per exercise, with live smoothing and debounce
+        self.exercises = {name: RepTracker.live(name, self.FPS, self.rules) for name in self.rules.names}
         
         if self.session_mode == "assisted":
             self.last_status_message = "SESSION PAUSED"
         
+        # Per-stage latency histograms and queue depths on
+        # http://127.0.0.1:<metrics_port>/metrics while the session runs
+        self.metrics = MetricsRegistry()
+        self.stage_duration = self.metrics.histogram(
+            'physio_client_stage_duration_seconds', 'Pose client latency by pipeline stage', ('stage',))
+        self.metrics.gauge('physio_client_audio_queue_depth', 'Audio cues waiting to be spoken',
+                           self.audio_queue.qsize)
+        self.metrics.gauge('physio_client_upload_queue_depth', 'API requests waiting to be sent',
+                           self.uploader.queue_depth)
+        self.metrics_server = serve(self.metrics, metrics_port) if metrics_port else None
+        
+        # Optional sampling profile of the whole run, as folded stacks
+        self.profile_path = profile_path
+        
         # Create session in database
         self._create_session()
     
+    @property
+    def session_id(self):
+        """Server-side session id, once the uploader has created the session"""
+        return self.uploader.session_id(self.session_ref) if self.session_ref else None
+    
     def _create_session(self):
-        """Create a new session in the database"""
-        try:
-            response = requests.post(f'{self.api_url}/sessions', json={
-                'exercise_type': self.exercise,
-                'session_mode': self.session_mode
-            })
-            if response.status_code == 200:
-                self.session_id = response.json()['session_id']
-                print(f"Session created with ID: {self.session_id}")
-            else:
-                print("Failed to create session in database")
-        except Exception as e:
-            print(f"Error creating session: {e}")
+        """Queue creation of a new session in the database"""
+        self.session_ref = self.uploader.create_session(self.exercise, self.session_mode)
     
     def _log_rep_to_db(self, rep_number, score, perfect_frames, standard_frames, tracked_side, best_angle):
         """Log a completed rep to the database"""
-        if not self.session_id:
+        if not self.session_ref:
             return
         
-        try:
-            requests.post(f'{self.api_url}/reps', json={
-                'session_id': self.session_id,
-                'rep_number': rep_number,
-                'score': float(score),
-                'perfect_frames': int(perfect_frames),
-                'standard_frames': int(standard_frames),
-                'tracked_side': tracked_side,
-                'best_angle': float(best_angle)
-            })
-        except Exception as e:
-            print(f"Error logging rep: {e}")
+        rep = {
+            'rep_number': rep_number,
+            'score': float(score),
+            'perfect_frames': int(perfect_frames),
+            'standard_frames': int(standard_frames),
+            'tracked_side': tracked_side,
+            'best_angle': float(best_angle),
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if self.buffered:
+            self.pending_reps.append(rep)
+            self._maybe_flush_events()
+            return
+        
+        self.uploader.submit('POST', '/reps', dict(rep, session_id=None), self.session_ref)
     
     def _log_form_event(self, event_type, angle, form_status, feedback_message=""):
         """Log form events to the database"""
-        if not self.session_id:
+        if not self.session_ref:
             return
         
-        try:
-            requests.post(f'{self.api_url}/form_events', json={
-                'session_id': self.session_id,
-                'event_type': event_type,
-                'angle': float(angle),
-                'form_status': form_status,
-                'feedback_message': feedback_message
-            })
-        except Exception as e:
-            print(f"Error logging form event: {e}")
+        event = {
+            'event_type': event_type,
+            'angle': float(angle),
+            'form_status': form_status,
+            'feedback_message': feedback_message,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if self.buffered:
+            self.pending_form_events.append(event)
+            self._maybe_flush_events()
+            return
+        
+        self.uploader.submit('POST', '/form_events', dict(event, session_id=None), self.session_ref)
+    
+    def _maybe_flush_events(self):
+        """Flush buffered events once the size or time threshold is reached"""
+        pending = len(self.pending_reps) + len(self.pending_form_events)
+        if pending >= self.flush_size or (
+                pending and time.monotonic() - self.last_flush_time >= self.flush_interval):
+            self._flush_events()
+    
+    def _flush_events(self):
+        """Queue all buffered reps and form events as a single batch request"""
+        self.last_flush_time = time.monotonic()
+        if not self.session_ref or not (self.pending_reps or self.pending_form_events):
+            return
+        
+        reps, self.pending_reps = self.pending_reps, []
+        form_events, self.pending_form_events = self.pending_form_events, []
+        
+        self.uploader.submit('POST', f'/sessions/{SESSION_ID}/events:batch', {
+            'reps': reps,
+            'form_events': form_events
+        }, self.session_ref)
     
     def _update_session(self, total_reps, average_score, duration_seconds):
-        """Update session data in database"""
-        if not self.session_id:
+        """Queue the final session update"""
+        if not self.session_ref:
             return
         
-        try:
-            requests.put(f'{self.api_url}/sessions/{self.session_id}', json={
-                'total_reps': int(total_reps),
-                'average_score': float(average_score),
-                'duration_seconds': int(duration_seconds),
-                'status': 'completed'
-            })
-            print("Session data updated successfully")
-        except Exception as e:
-            print(f"Error updating session: {e}")
+        self.uploader.submit('PUT', f'/sessions/{SESSION_ID}', {
+            'total_reps': int(total_reps),
+            'average_score': float(average_score),
+            'duration_seconds': int(duration_seconds),
+            'status': 'completed'
+        }, self.session_ref)
     
-    def _get_state(self):
-        """Returns a clean state dictionary for an exercise"""
-        return {
-            "repcount": 0, "phase": "none", "ready": False,
-            "start_frames_needed": 12, "start_frames_counter": 0,
-            "rep_scores": [], "rep_start_frame": 0,
-            "current_rep_perfect_frames": 0,
-            "current_rep_standard_frames": 0,
-            "error_persistence_counter": 0, "audio_lock_perfect": False,
-            "audio_lock_correct": False, "frame_counter": 0,
-            "session_data": [], "feedback": "", "tracked_side": "NONE",
-            "current_rep_best_angle": 180 if self.current_ex != "abduction" else 0,
-            "rest_persistence_counter": 0,
-            "in_incorrect_attempt": False,
-            "last_stopped_frame": 0,
-            "session_ended_for_ex": False,
-        }
+    def _upload_recording(self):
+        """Save the frame-level landmark recording and queue its upload"""
+        if not self.session_ref or not self.recorder.frames:
+            return
+        
+        path = self.recorder.save(f'{self.recordings_dir}/session_{self.session_ref}.npy')
+        self.uploader.submit('PUT', f'/sessions/{SESSION_ID}/landmarks', None,
+                             self.session_ref, file_path=path)
+        print(f"Recorded {self.recorder.frames} frames to {path}")
     
     def _audio_worker(self):
         while True:
@@ -204,64 +243,33 @@ class SmartPhysioWebIntegrated:
         cosine = np.clip(cosine, -1.0, 1.0)
         return np.degrees(np.arccos(cosine))
     
-    def get_bilateral_angles(self, lm, ex_type):
-        angles = {}
-        lmk = lambda i: lm[i] if i < len(lm) else None
-        
-        if ex_type == "squat":
-            angles['right'] = self.calc_angle(lmk(24), lmk(26), lmk(28))
-            angles['left'] = self.calc_angle(lmk(23), lmk(25), lmk(27))
-        elif ex_type == "abduction":
-            angles['right'] = self.calc_angle(lmk(24), lmk(12), lmk(14))
-            angles['left'] = self.calc_angle(lmk(23), lmk(11), lmk(13))
-        elif ex_type == "elbow":
-            angles['right'] = self.calc_angle(lmk(12), lmk(14), lmk(16))
-            angles['left'] = self.calc_angle(lmk(11), lmk(13), lmk(15))
-        elif ex_type == "hipflex":
-            angles['right'] = self.calc_angle(lmk(12), lmk(24), lmk(26))
-            angles['left'] = self.calc_angle(lmk(11), lmk(23), lmk(25))
-        elif ex_type == "wristext":
-            angles['right'] = self.calc_angle(lmk(14), lmk(16), lmk(20))
-            angles['left'] = self.calc_angle(lmk(13), lmk(15), lmk(19))
-        
-        return angles
+    def get_bilateral_angles(self, lm, ex_type, fill=DEFAULT_ANGLE):
+        """Right/left joint angles for an exercise from landmarks or a (33, 4) array;
+        hidden joints read `fill`"""
+        if not isinstance(lm, np.ndarray):
+            lm = landmarks_to_array(lm, out=self.landmark_buffer)
+        return self.angle_engine.bilateral(lm, ex_type, fill=fill)
     
     def check_form_correct(self, angle, ex):
-        if ex == "squat":
-            return angle <= self.down_knee_angle
-        elif ex == "abduction":
-            return self.abd_up_angle <= angle <= self.abd_max_angle
-        elif ex == "elbow":
-            return angle <= self.eflex_bent_angle
-        elif ex == "hipflex":
-            return angle <= self.hflex_bent_angle
-        elif ex == "wristext":
-            return angle <= self.wext_bent_angle
-        return False
+        return self.rules.is_correct(angle, ex)
     
     def check_perfect_form(self, angle, ex):
-        if ex == "squat":
-            return angle <= self.squat_perfect_angle
-        elif ex == "abduction":
-            return angle >= self.abd_perfect_angle
-        elif ex == "elbow":
-            return angle <= self.eflex_perfect_angle
-        elif ex == "hipflex":
-            return angle <= self.hflex_perfect_angle
-        elif ex == "wristext":
-            return angle <= self.wext_perfect_angle
-        return False
+        return self.rules.is_perfect(angle, ex)
     
     def calculate_rep_score(self, status_type, perfect_quality_ratio=0):
+        # Same deterministic bands as offline re-scoring and server analytics
         if status_type == "SUCCESS":
-            if perfect_quality_ratio > 0.8:
-                return np.random.randint(95, 101)
-            elif perfect_quality_ratio > 0.5:
-                return np.random.randint(85, 95)
-            else:
-                return np.random.randint(75, 85)
+            return round(score_from_ratio(perfect_quality_ratio))
         return 0
     
+    def _on_rep(self, rep, event):
+        """Log and announce a rep completed by the current exercise's tracker"""
+        self._log_rep_to_db(rep['rep_number'], rep['score'], rep['perfect_frames'],
+                            rep['standard_frames'], rep['tracked_side'], rep['best_angle'])
+        self._log_form_event(event['event_type'], event['angle'], event['form_status'],
+                             event['feedback_message'])
+        self.play_audio(f"{rep['rep_number']}")
+    
     # Additional methods would follow the same pattern as original soloHelpModes2.py
     # For brevity, core integration methods are shown
     
@@ -282,15 +290,38 @@ class SmartPhysioWebIntegrated:
         
         session_start_time = time.time()
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Failed to capture frame.")
-                break
+        # Capture and inference run on background threads; rendering and
+        # feedback stay here on the main thread
+        pipeline = FramePipeline(cap, self.pose, histogram=self.stage_duration).start()
+        profiler = SamplingProfiler().start() if self.profile_path else None
+        
+        while not pipeline.finished:
+            packet = pipeline.get(timeout=1.0)
+            if packet is None:
+                continue
+            
+            render_start = time.perf_counter()
+            frame = packet.image
+            result = packet.result
+            self.recorder.record(
+                result.pose_landmarks.landmark if result.pose_landmarks else None,
+                packet.captured_at
+            )
             
-            frame = cv2.flip(frame, 1)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            result = self.pose.process(rgb_frame)
+            if result.pose_landmarks:
+                angles_start = time.perf_counter()
+                # Hidden joints stay NaN for the tracker, as in batch analysis and
+                # re-scoring; a default angle would read as a side at rest
+                angles = self.get_bilateral_angles(result.pose_landmarks.landmark, self.current_ex,
+                                                   fill=np.nan)
+                pipeline.record_stage('angles', time.perf_counter() - angles_start)
+                shown = {side: DEFAULT_ANGLE if np.isnan(angle) else angle for side, angle in angles.items()}
+                cv2.putText(frame, f"R {shown['right']:.0f}  L {shown['left']:.0f}", (20, 40),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+                completed = self.exercises[self.current_ex].update(
+                    angles['right'], angles['left'], packet.captured_at)
+                if completed:
+                    self._on_rep(*completed)
             
             key = cv2.waitKey(1) & 0xFF
             if key == ord("q"):
@@ -298,27 +329,48 @@ class SmartPhysioWebIntegrated:
             
             # Display frame
             cv2.imshow(window_name, frame)
+            pipeline.record_render(packet, time.perf_counter() - render_start)
+            
+            if self.buffered:
+                self._maybe_flush_events()
+        
+        pipeline.stop()
+        if pipeline.error:
+            print(f"Error: {pipeline.error}")
+        if profiler:
+            profiler.stop().dump(self.profile_path)
+            print(f"Profile written to {self.profile_path} ({profiler.samples} samples)")
         
         cap.release()
         cv2.destroyAllWindows()
         self.audio_queue.put(None)
         self.audio_thread.join()
         
+        # Send anything still buffered before closing the session
+        self._flush_events()
+        
         # Update final session data
-        state = self.exercises[self.current_ex]
+        tracker = self.exercises[self.current_ex]
         duration = int(time.time() - session_start_time)
-        avg_score = np.mean(state['rep_scores']) if state['rep_scores'] else 0
+        avg_score = np.mean(tracker.scores) if tracker.scores else 0
         
         self._update_session(
-            total_reps=state['repcount'],
+            total_reps=tracker.repcount,
             average_score=avg_score,
             duration_seconds=duration
         )
+        self._upload_recording()
+        self.uploader.close()
+        if self.uploader.spooled:
+            print(f"API unreachable: {self.uploader.spooled} requests spooled for later upload")
         
         print(f"\n--- SESSION COMPLETE ---")
-        print(f"Total reps: {state['repcount']}")
+        print(f"Total reps: {tracker.repcount}")
         print(f"Average Score: {avg_score:.1f}")
         print(f"Duration: {duration}s")
+        print("Pipeline stages:")
+        for stage, stats in pipeline.report().items():
+            print(f"  {stage:<11} {stats}")
         print(f"View analysis at: http://localhost:5000/analysis?session={self.session_id}")
 
 
@@ -327,11 +379,23 @@ if __name__ == "__main__":
     while mode not in ["solo", "assisted"]:
         mode = input("Enter session mode ('solo' or 'assisted'): ").strip().lower()
     
-    exercise = input("Enter exercise ('squat', 'abduction', 'elbow', 'hipflex', or 'wristext'): ").strip().lower()
+    exercise = input(f"Enter exercise ({', '.join(EXERCISES.names)}): ").strip().lower()
     
-    if exercise not in ["squat", "abduction", "elbow", "hipflex", "wristext"]:
+    if exercise not in EXERCISES:
         print(f"Invalid exercise '{exercise}'. Defaulting to 'squat'.")
         exercise = "squat"
     
-    assistant = SmartPhysioWebIntegrated(exercise, mode)
+    # e.g. POSE_TARGET_FPS=12 on low-power machines
+    target_fps = float(os.environ.get('POSE_TARGET_FPS', 0)) or None
+    # e.g. CLIENT_METRICS_PORT=9101 to scrape stage latencies, POSE_PROFILE=pose.folded
+    metrics_port = int(os.environ.get('CLIENT_METRICS_PORT', 0)) or None
+    profile_path = os.environ.get('POSE_PROFILE') or None
+    # POSE_BUFFERED=1 sends reps/form events in batches (POSE_FLUSH_SIZE, POSE_FLUSH_INTERVAL)
+    buffered = os.environ.get('POSE_BUFFERED', '').lower() in ('1', 'true', 'yes')
+    flush_size = int(os.environ.get('POSE_FLUSH_SIZE', 50))
+    flush_interval = float(os.environ.get('POSE_FLUSH_INTERVAL', 2.0))
+    
+    assistant = SmartPhysioWebIntegrated(exercise, mode, buffered=buffered, flush_size=flush_size,
+                                         flush_interval=flush_interval, target_fps=target_fps,
+                                         metrics_port=metrics_port, profile_path=profile_path)
     assistant.run()
@@ -0,0 +1,186 @@
+"""
+Multi-stage frame pipeline for the pose client
+Capture and MediaPipe inference run on their own threads so camera I/O,
+inference and rendering overlap instead of running back to back
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+Frame = namedtuple('Frame', 'index captured_at image')
+PoseFrame = namedtuple('PoseFrame', 'index captured_at image result')
+
+
+class LatestFrameQueue:
+    """Single-slot queue: a new frame replaces one that was not consumed yet"""
+
+    def __init__(self):
+        self._item = None
+        self._cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the newest item, or None on timeout/close"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._item is not None or self.closed, timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Latency counters for one pipeline stage, optionally mirrored into a
+    metrics Histogram labelled by stage"""
+
+    def __init__(self, name, histogram=None):
+        self.name = name
+        self.histogram = histogram
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.started_at = time.perf_counter()
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=self.name)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            'frames': self.count,
+            'avg_ms': round(1000 * self.total / self.count, 2) if self.count else 0.0,
+            'max_ms': round(1000 * self.max, 2),
+            'fps': round(self.count / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+class FramePipeline:
+    """
+    capture thread -> LatestFrameQueue -> inference thread -> LatestFrameQueue -> caller
+
+    The render/feedback stage stays on the caller's thread (cv2.imshow must
+    run on the main thread on most platforms) and pulls PoseFrames with get().
+    When a stage falls behind, older frames are dropped rather than queued,
+    so feedback always reflects the most recent camera image.
+
+    'inference' is the sum of its 'convert' (cvtColor) and 'pose' sub-stages;
+    the caller can time its own stages (e.g. angles) with record_stage().
+    """
+
+    def __init__(self, cap, pose, flip=True, histogram=None):
+        self.cap = cap
+        self.pose = pose
+        self.flip = flip
+        self.histogram = histogram
+        self.running = False
+        self.error = None
+
+        self.captured = LatestFrameQueue()
+        self.inferred = LatestFrameQueue()
+        self.stats = {name: StageStats(name, histogram) for name in
+                      ('capture', 'inference', 'convert', 'pose', 'render', 'end_to_end')}
+
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='pose-capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='pose-inference', daemon=True),
+        ]
+
+    def start(self):
+        self.running = True
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.captured.close()
+        self.inferred.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def get(self, timeout=1.0):
+        """Next PoseFrame for the render stage, or None if none is ready"""
+        return self.inferred.get(timeout)
+
+    @property
+    def finished(self):
+        """True once capture has stopped and every frame has been handed out"""
+        return self.inferred.closed and self.inferred._item is None
+
+    def record_stage(self, name, seconds):
+        """Account a caller-side stage, created on first use"""
+        if name not in self.stats:
+            self.stats[name] = StageStats(name, self.histogram)
+        self.stats[name].record(seconds)
+
+    def record_render(self, packet, render_seconds):
+        """Account the caller's render stage for a PoseFrame"""
+        self.stats['render'].record(render_seconds)
+        self.stats['end_to_end'].record(time.perf_counter() - packet.captured_at)
+
+    def report(self):
+        """Per-stage latency plus dropped-frame counters"""
+        report = {name: stats.summary() for name, stats in self.stats.items()}
+        report['capture']['dropped'] = self.captured.dropped
+        report['inference']['dropped'] = self.inferred.dropped
+        if hasattr(self.pose, 'stats'):
+            # AdaptivePose: active complexity, skipped/throttled frame counts
+            # (beside, not over, the 'pose' stage latency)
+            report['adaptive'] = self.pose.stats()
+        return report
+
+    def _capture_loop(self):
+        index = 0
+        while self.running:
+            start = time.perf_counter()
+            ret, image = self.cap.read()
+            if not ret:
+                self.error = "Failed to capture frame."
+                break
+            if self.flip:
+                image = cv2.flip(image, 1)
+            self.stats['capture'].record(time.perf_counter() - start)
+            self.captured.put(Frame(index, start, image))
+            index += 1
+        self.running = False
+        self.captured.close()
+
+    def _inference_loop(self):
+        while True:
+            frame = self.captured.get(timeout=0.1)
+            if frame is None:
+                if self.captured.closed:
+                    break
+                continue
+            start = time.perf_counter()
+            rgb = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)
+            rgb.flags.writeable = False
+            converted = time.perf_counter()
+            result = self.pose.process(rgb)
+            done = time.perf_counter()
+            self.stats['convert'].record(converted - start)
+            self.stats['pose'].record(done - converted)
+            self.stats['inference'].record(done - start)
+            self.inferred.put(PoseFrame(frame.index, frame.captured_at, frame.image, result))
+        self.inferred.close()
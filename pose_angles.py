@@ -0,0 +1,85 @@
+"""
+Vectorized joint-angle engine
+Computes every configured joint angle for a frame (or a stack of frames)
+in one batched NumPy operation instead of one calc_angle call per triple
+"""
+
+import numpy as np
+
+from exercise_rules import EXERCISES
+
+NUM_LANDMARKS = 33
+MIN_VISIBILITY = 0.5
+DEFAULT_ANGLE = 180.0
+
+# (first, vertex, last) MediaPipe landmark indices per exercise and side,
+# from the exercise definitions file
+EXERCISE_JOINTS = EXERCISES.joints
+
+
+def landmarks_to_array(landmarks, out=None):
+    """Pack MediaPipe landmarks into a (33, 4) float32 array of x, y, z, visibility"""
+    if out is None:
+        out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    for i, lm in enumerate(landmarks[:NUM_LANDMARKS]):
+        out[i] = (lm.x, lm.y, lm.z, lm.visibility)
+    # Missing landmarks stay at visibility 0 and are masked out
+    out[len(landmarks):] = 0
+    return out
+
+
+class AngleEngine:
+    """
+    Precompiled set of joint triples evaluated together.
+
+    compute() takes a (33, 4) frame or a (frames, 33, 4) stack and returns
+    angles in degrees with shape (K,) or (frames, K), one column per
+    (exercise, side) pair listed in self.columns. Triples with a landmark
+    below min_visibility, or with a zero-length limb, read `fill`
+    (DEFAULT_ANGLE, matching the scalar calc_angle, unless overridden).
+    """
+
+    def __init__(self, joints=EXERCISE_JOINTS, min_visibility=MIN_VISIBILITY):
+        self.min_visibility = min_visibility
+        self.columns = [(ex, side) for ex, sides in joints.items() for side in ("right", "left")]
+        self.column_index = {col: i for i, col in enumerate(self.columns)}
+
+        triples = np.array([joints[ex][side] for ex, side in self.columns], dtype=np.intp)
+        self.a_idx, self.b_idx, self.c_idx = triples.T
+
+    def compute(self, landmarks, fill=DEFAULT_ANGLE):
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        a = landmarks[..., self.a_idx, :]
+        b = landmarks[..., self.b_idx, :]
+        c = landmarks[..., self.c_idx, :]
+
+        vba = a[..., :2] - b[..., :2]
+        vbc = c[..., :2] - b[..., :2]
+        dot = np.einsum('...i,...i->...', vba, vbc)
+        norms = np.linalg.norm(vba, axis=-1) * np.linalg.norm(vbc, axis=-1)
+
+        visible = ((a[..., 3] >= self.min_visibility) &
+                   (b[..., 3] >= self.min_visibility) &
+                   (c[..., 3] >= self.min_visibility))
+        valid = visible & (norms > 0)
+
+        cosine = np.divide(dot, norms, out=np.zeros_like(dot), where=valid)
+        angles = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        return np.where(valid, angles, np.float32(fill))
+
+    def columns_for(self, exercise):
+        """Column indices of the (right, left) angles for an exercise"""
+        return self.column_index[(exercise, "right")], self.column_index[(exercise, "left")]
+
+    def bilateral(self, landmarks, exercise, fill=DEFAULT_ANGLE):
+        """{'right': angle, 'left': angle} for a single (33, 4) frame"""
+        if exercise not in EXERCISE_JOINTS:
+            return {}
+        right, left = self.columns_for(exercise)
+        angles = self.compute(landmarks, fill)
+        return {'right': float(angles[right]), 'left': float(angles[left])}
+
+    def bilateral_series(self, landmarks, exercise, fill=DEFAULT_ANGLE):
+        """(frames, 2) array of right/left angles for a (frames, 33, 4) stack"""
+        right, left = self.columns_for(exercise)
+        return self.compute(landmarks, fill)[:, [right, left]]
@@ -0,0 +1,74 @@
+"""
+Sampling profiler producing flamegraph-ready folded stacks
+Samples every thread's Python stack at a fixed interval from a background
+thread; the output works with flamegraph.pl and speedscope
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Collects folded stacks ("thread;module:function;module:function count")
+    for all threads except its own. Overhead is one stack walk per thread per
+    `interval`, so it can stay on in production for short windows.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        return self
+
+    def profile(self, seconds):
+        """Sample for `seconds` and return the folded stacks"""
+        self.start()
+        time.sleep(seconds)
+        return self.stop().folded()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while self.running:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.stacks[_fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+
+def _fold(thread_name, frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        parts.append(f'{module}:{code.co_name}')
+        frame = frame.f_back
+    parts.append(thread_name.replace(';', '_').replace(' ', '_'))
+    return ';'.join(reversed(parts))
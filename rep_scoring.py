@@ -0,0 +1,311 @@
+"""
+Rep detection and scoring over joint angles
+One state machine (RepTracker) serves the live client frame by frame and
+batch analysis / re-scoring over whole angle series
+"""
+
+import math
+
+import numpy as np
+
+from exercise_rules import EXERCISES
+
+# RepTracker states
+WAITING, READY, IN_REP = 0, 1, 2
+
+
+def score_from_ratio(perfect_ratio):
+    """Deterministic version of calculate_rep_score's score bands"""
+    if perfect_ratio > 0.8:
+        return 95 + 5 * (perfect_ratio - 0.8) / 0.2
+    elif perfect_ratio > 0.5:
+        return 85 + 10 * (perfect_ratio - 0.5) / 0.3
+    return 75 + 10 * perfect_ratio / 0.5
+
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al., CHI 2012) for one angle channel: a
+    low-pass whose cutoff rises with speed, so a joint held still stops
+    jittering while fast movement is followed with little lag. NaN input
+    passes through without touching the state.
+    """
+
+    __slots__ = ('min_cutoff', 'beta', 'd_cutoff', 'value', 'derivative', 'last_t')
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.derivative = 0.0
+        self.last_t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if x != x:
+            return x
+        if self.value is None or t <= self.last_t:
+            self.value, self.last_t = x, t
+            return x
+        dt = t - self.last_t
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.derivative += a_d * ((x - self.value) / dt - self.derivative)
+        a = self._alpha(self.min_cutoff + self.beta * abs(self.derivative), dt)
+        self.value += a * (x - self.value)
+        self.last_t = t
+        return self.value
+
+
+class ExponentialFilter:
+    """Fixed-weight exponential moving average for one angle channel"""
+
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.value = None
+
+    def __call__(self, x, t):
+        if x != x:
+            return x
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RepTracker:
+    """
+    Rep state machine for one exercise with constant work and memory per
+    frame: WAITING (joint not yet seen at rest) -> READY (at rest) -> IN_REP
+    (reached the correct range) -> READY again when the joint returns to
+    rest, which completes the rep.
+
+    update() feeds one frame of right/left angles (live); run() feeds a whole
+    (frames, 2) series (batch) through the same transitions. Optional
+    smoothing for live input, all off by default so batch results stay
+    exactly those of the raw angles:
+
+    spike_window -- median of the last N raw angles per side (ring buffer),
+                    dropping single-frame landmark glitches
+    smoothing    -- 'one_euro', 'ema' or None, applied after the median
+    enter_frames -- consecutive correct-range frames needed to start a rep
+    rest_frames  -- consecutive rest frames needed to end it
+    """
+
+    __slots__ = (
+        'exercise', 'fps', 'rules', 'rising', 'sign', 'signed_rest', 'correct_low', 'correct_high',
+        'signed_perfect', 'enter_frames', 'rest_frames', 'spike_window', 'ring', 'ring_pos',
+        'filters', 'state', 'entry_count', 'rest_count', 'perfect_frames', 'standard_frames',
+        'best_angle', 'best_side', 'frame_index', 'repcount', 'scores',
+    )
+
+    def __init__(self, exercise, fps=30.0, rules=EXERCISES, smoothing=None, spike_window=1,
+                 enter_frames=1, rest_frames=1, min_cutoff=1.0, beta=0.05, alpha=0.5):
+        i = rules.index[exercise]
+        self.exercise = exercise
+        self.fps = fps
+        self.rules = rules
+        self.rising = rules.rising(exercise)
+        # Python floats of the float32 thresholds, so per-frame comparisons
+        # agree with ExerciseRules.classify on float32 angles
+        self.sign = float(rules.sign[i])
+        self.signed_rest = float(rules.signed_rest[i])
+        self.correct_low = float(rules.correct_low[i])
+        self.correct_high = float(rules.correct_high[i])
+        self.signed_perfect = float(rules.signed_perfect[i])
+        self.enter_frames = enter_frames
+        self.rest_frames = rest_frames
+
+        self.spike_window = spike_window
+        self.ring = [[math.nan] * spike_window, [math.nan] * spike_window]
+        self.ring_pos = 0
+        if smoothing == 'one_euro':
+            self.filters = (OneEuroFilter(min_cutoff, beta), OneEuroFilter(min_cutoff, beta))
+        elif smoothing == 'ema':
+            self.filters = (ExponentialFilter(alpha), ExponentialFilter(alpha))
+        elif smoothing is None:
+            self.filters = None
+        else:
+            raise ValueError(f"smoothing must be 'one_euro', 'ema' or None, not {smoothing!r}")
+
+        self.state = WAITING
+        self.entry_count = self.rest_count = 0
+        self.perfect_frames = self.standard_frames = 0
+        self.best_angle = self.best_side = None
+        self.frame_index = 0
+        self.repcount = 0
+        self.scores = []
+
+    @classmethod
+    def live(cls, exercise, fps=30.0, rules=EXERCISES):
+        """Tracker tuned for noisy camera input (about 100 ms of debounce at 30 FPS)"""
+        return cls(exercise, fps, rules, smoothing='one_euro', spike_window=3,
+                   enter_frames=3, rest_frames=3)
+
+    # Live input
+
+    def update(self, right, left, t=None):
+        """
+        Feed one frame (None/NaN for a side that is not visible); `t` is the
+        frame time in seconds (default frame_index / fps). Returns
+        (rep, form_event) when this frame completes a rep, else None.
+        """
+        t = self.frame_index / self.fps if t is None else t
+        self.frame_index += 1
+        right = math.nan if right is None else float(right)
+        left = math.nan if left is None else float(left)
+
+        if self.spike_window > 1:
+            right, left = self._median(right, left)
+        if self.filters is not None:
+            right, left = self.filters[0](right, t), self.filters[1](left, t)
+
+        # Track whichever side moves furthest (right on ties)
+        if left != left or (right >= left if self.rising else right <= left):
+            angle, side = right, 0
+        else:
+            angle, side = left, 1
+        if angle != angle:
+            return None
+
+        signed = angle * self.sign
+        return self._advance(
+            angle, side,
+            signed <= self.signed_rest,
+            self.correct_low <= angle <= self.correct_high,
+            signed >= self.signed_perfect,
+            t
+        )
+
+    def _median(self, right, left):
+        pos = self.ring_pos
+        self.ring[0][pos], self.ring[1][pos] = right, left
+        self.ring_pos = (pos + 1) % self.spike_window
+        medians = []
+        for values in self.ring:
+            seen = sorted(v for v in values if v == v)
+            medians.append(seen[len(seen) // 2] if seen else math.nan)
+        return medians
+
+    # Batch input
+
+    def run(self, angles, timestamps=None):
+        """
+        Feed a (frames, 2) array of right/left angles (NaN = not visible).
+        Returns (reps, form_events), each carrying the 'offset' in seconds
+        of the frame that completed it (or its timestamp when given).
+        """
+        angles = np.asarray(angles, dtype=np.float32)
+        if timestamps is None:
+            timestamps = np.arange(self.frame_index, self.frame_index + len(angles)) / self.fps
+        if self.spike_window > 1 or self.filters is not None:
+            # Stateful smoothing is sequential; the transitions still run below
+            reps, events = [], []
+            for (right, left), t in zip(angles.tolist(), timestamps):
+                completed = self.update(right, left, float(t))
+                if completed:
+                    reps.append(completed[0])
+                    events.append(completed[1])
+            return reps, events
+        self.frame_index += len(angles)
+
+        # Without smoothing, side selection and classification vectorize
+        with np.errstate(invalid='ignore'):
+            filled = np.where(np.isnan(angles), -np.inf if self.rising else np.inf, angles)
+            side_idx = filled.argmax(axis=1) if self.rising else filled.argmin(axis=1)
+            tracked = angles[np.arange(len(angles)), side_idx]
+        at_rest, correct, perfect = self.rules.classify(tracked, self.exercise)
+        visible = np.flatnonzero(~np.isnan(tracked))
+
+        reps, events = [], []
+        advance = self._advance
+        for i, angle, side, rest, ok, top in zip(
+                visible.tolist(), tracked[visible].tolist(), side_idx[visible].tolist(),
+                at_rest[visible].tolist(), correct[visible].tolist(), perfect[visible].tolist()):
+            completed = advance(angle, side, rest, ok, top, float(timestamps[i]))
+            if completed:
+                reps.append(completed[0])
+                events.append(completed[1])
+        return reps, events
+
+    # State machine
+
+    def _advance(self, angle, side, at_rest, correct, perfect, offset):
+        if self.state == IN_REP:
+            if correct:
+                self._count(angle, side, perfect)
+            if at_rest:
+                self.rest_count += 1
+                if self.rest_count >= self.rest_frames:
+                    return self._complete(offset)
+            else:
+                self.rest_count = 0
+            return None
+
+        if at_rest:
+            self.state = READY
+            self.entry_count = 0
+        elif self.state == READY:
+            if correct:
+                if self.entry_count == 0:
+                    self.perfect_frames = self.standard_frames = 0
+                    self.best_angle, self.best_side = angle, side
+                self.entry_count += 1
+                self._count(angle, side, perfect)
+                if self.entry_count >= self.enter_frames:
+                    self.state = IN_REP
+                    self.rest_count = 0
+            else:
+                # Left the correct range before the rep counted as started
+                self.entry_count = 0
+        return None
+
+    def _count(self, angle, side, perfect):
+        self.standard_frames += 1
+        self.perfect_frames += perfect
+        if (angle > self.best_angle) if self.rising else (angle < self.best_angle):
+            self.best_angle, self.best_side = angle, side
+
+    def _complete(self, offset):
+        self.state = READY
+        self.entry_count = 0
+        self.repcount += 1
+        ratio = self.perfect_frames / self.standard_frames if self.standard_frames else 0.0
+        score = round(score_from_ratio(ratio), 1)
+        self.scores.append(score)
+        best_angle = round(self.best_angle, 1)
+        rep = {
+            'rep_number': self.repcount,
+            'score': score,
+            'perfect_frames': self.perfect_frames,
+            'standard_frames': self.standard_frames,
+            'tracked_side': "RIGHT" if self.best_side == 0 else "LEFT",
+            'best_angle': best_angle,
+            'offset': offset
+        }
+        event = {
+            'event_type': 'rep_complete',
+            'angle': best_angle,
+            'form_status': "PERFECT" if ratio > 0.5 else "CORRECT",
+            'feedback_message': f"Rep {self.repcount} complete",
+            'offset': offset
+        }
+        return rep, event
+
+
+def count_reps(angles, exercise, fps, rules=EXERCISES):
+    """
+    Detect reps in a (frames, 2) array of right/left angles (NaN = not visible).
+
+    A rep starts when the tracked joint reaches the correct range from rest
+    and ends when it returns to rest. Returns (reps, form_events) where each
+    entry carries a frame offset in seconds instead of a timestamp.
+    """
+    return RepTracker(exercise, fps, rules).run(angles)
@@ -0,0 +1,364 @@
+"""
+Data access for the Flask API
+Every statement is written once with ? placeholders and compiled for the
+configured backend when the Repository is created, so the routes carry no
+SQLite/PostgreSQL branches. Rows are fetched as plain tuples and paired
+with known column names; timestamps are returned as the driver gives them
+(datetime on PostgreSQL, ISO text on SQLite) and serialized by the API's
+JSON encoder.
+"""
+
+from bulk_transfer import COPY_NULL, TABLE_COLUMNS, CsvReader, batched
+from migrations import EXERCISE_STATS_BACKFILL
+
+SESSION_COLUMNS = TABLE_COLUMNS['sessions']
+REP_COLUMNS = TABLE_COLUMNS['reps']
+FORM_EVENT_COLUMNS = TABLE_COLUMNS['form_events']
+ROLLUP_COLUMNS = ('event_type', 'form_status', 'event_count', 'min_angle', 'max_angle',
+                  'angle_sum', 'first_at', 'last_at')
+SUMMARY_SESSION_COLUMNS = ('id', 'exercise_type', 'session_mode', 'status',
+                           'start_time', 'duration_seconds')
+SUMMARY_REP_COLUMNS = ('rep_number', 'score', 'perfect_frames', 'standard_frames',
+                       'tracked_side', 'best_angle')
+
+# Insert columns of rep/form event rows built by the API (no id)
+REP_INSERT_COLUMNS = REP_COLUMNS[1:]
+FORM_EVENT_INSERT_COLUMNS = FORM_EVENT_COLUMNS[1:]
+
+# Session list filters: query argument -> (column, operator)
+SESSION_FILTERS = {
+    'exercise_type': ('exercise_type', '='),
+    'status': ('status', '='),
+    'from': ('start_time', '>='),
+    'to': ('start_time', '<'),
+}
+
+# Tables cleared of a session's rows before the session itself. PostgreSQL
+# would cascade, SQLite does not enforce foreign keys; deleting explicitly
+# behaves the same on both.
+SESSION_CHILD_TABLES = ('reps', 'form_events', 'form_event_rollups', 'session_summaries')
+
+STATEMENTS = {
+    'create_session': '''
+        INSERT INTO sessions (exercise_type, session_mode, start_time, status)
+        VALUES (?, ?, ?, 'active')
+    ''',
+    'get_session': f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions WHERE id = ?",
+    'session_exists': 'SELECT 1 FROM sessions WHERE id = ?',
+    'lock_session': '''
+        SELECT exercise_type, status, total_reps, average_score
+        FROM sessions WHERE id = ?
+    ''',
+    'update_session': '''
+        UPDATE sessions
+        SET end_time = ?,
+            total_reps = ?,
+            average_score = ?,
+            duration_seconds = ?,
+            status = ?
+        WHERE id = ?
+    ''',
+    'delete_session': 'DELETE FROM sessions WHERE id = ?',
+    'session_reps': f'''
+        SELECT {', '.join(REP_COLUMNS)} FROM reps
+        WHERE session_id = ?
+        ORDER BY rep_number
+    ''',
+    'session_events': f'''
+        SELECT {', '.join(FORM_EVENT_COLUMNS)} FROM form_events
+        WHERE session_id = ?
+        ORDER BY timestamp
+    ''',
+    # Form events past retention, compacted to counts per type and status
+    'session_rollups': f'''
+        SELECT {', '.join(ROLLUP_COLUMNS)} FROM form_event_rollups
+        WHERE session_id = ?
+        ORDER BY first_at
+    ''',
+    'insert_reps': f'''
+        INSERT INTO reps ({', '.join(REP_INSERT_COLUMNS)})
+        VALUES ({', '.join('?' * len(REP_INSERT_COLUMNS))})
+    ''',
+    'insert_form_events': f'''
+        INSERT INTO form_events ({', '.join(FORM_EVENT_INSERT_COLUMNS)})
+        VALUES ({', '.join('?' * len(FORM_EVENT_INSERT_COLUMNS))})
+    ''',
+    'update_exercise_stats': '''
+        INSERT INTO exercise_stats (exercise_type, session_count, total_reps, score_sum)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (exercise_type) DO UPDATE SET
+            session_count = exercise_stats.session_count + excluded.session_count,
+            total_reps = exercise_stats.total_reps + excluded.total_reps,
+            score_sum = exercise_stats.score_sum + excluded.score_sum
+    ''',
+    'exercise_stats': '''
+        SELECT exercise_type, session_count, total_reps, score_sum
+        FROM exercise_stats
+        WHERE session_count > 0
+        ORDER BY exercise_type
+    ''',
+    'stored_summary': 'SELECT summary FROM session_summaries WHERE session_id = ?',
+    'store_summary': '''
+        INSERT INTO session_summaries (session_id, summary, computed_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            summary = excluded.summary,
+            computed_at = excluded.computed_at
+    ''',
+    'summary_session': f"SELECT {', '.join(SUMMARY_SESSION_COLUMNS)} FROM sessions WHERE id = ?",
+    'summary_reps': f'''
+        SELECT {', '.join(SUMMARY_REP_COLUMNS)} FROM reps
+        WHERE session_id = ?
+        ORDER BY rep_number
+    ''',
+    # Raw events plus those already compacted by retention.py
+    'summary_form_counts': '''
+        SELECT form_status, SUM(n) FROM (
+            SELECT COALESCE(form_status, 'NONE') AS form_status, COUNT(*) AS n FROM form_events
+            WHERE session_id = ?
+            GROUP BY form_status
+            UNION ALL
+            SELECT form_status, event_count FROM form_event_rollups
+            WHERE session_id = ?
+        ) counts
+        GROUP BY form_status
+    ''',
+    'sessions_missing_summaries': '''
+        SELECT id FROM sessions
+        WHERE status = 'completed'
+          AND id IN (SELECT session_id FROM reps WHERE timestamp < ?)
+          AND id NOT IN (SELECT session_id FROM session_summaries)
+    ''',
+    'exercise_trend': '''
+        SELECT s.id, s.start_time, s.average_score, s.total_reps,
+               SUM(r.perfect_frames), SUM(r.standard_frames),
+               MIN(r.best_angle), MAX(r.best_angle)
+        FROM sessions s
+        LEFT JOIN reps r ON r.session_id = s.id
+        WHERE s.exercise_type = ? AND s.status = 'completed'
+        GROUP BY s.id, s.start_time, s.average_score, s.total_reps
+        ORDER BY s.start_time DESC, s.id DESC
+        LIMIT ?
+    ''',
+    **{f'export_{table}': f"SELECT {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id"
+       for table, columns in TABLE_COLUMNS.items()},
+    **{f'delete_{table}': f'DELETE FROM {table} WHERE session_id = ?'
+       for table in SESSION_CHILD_TABLES},
+}
+
+# Statements whose PostgreSQL form differs beyond placeholders
+POSTGRES_STATEMENTS = {
+    'create_session': STATEMENTS['create_session'] + '    RETURNING id\n',
+    'lock_session': STATEMENTS['lock_session'] + '    FOR UPDATE\n',
+    'insert_reps': f"INSERT INTO reps ({', '.join(REP_INSERT_COLUMNS)}) VALUES %s",
+    'insert_form_events': f"INSERT INTO form_events ({', '.join(FORM_EVENT_INSERT_COLUMNS)}) VALUES %s",
+}
+
+
+def records(columns, rows):
+    """JSON-ready dicts of tuple rows"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class Repository:
+    """
+    Queries of the API for one backend ('postgres' or 'sqlite'). Methods
+    take a cursor and never commit, so callers group them into
+    transactions; writes that read first call lock_session() or
+    begin_write() to take the write lock up front.
+    """
+
+    def __init__(self, backend):
+        if backend not in ('postgres', 'sqlite'):
+            raise ValueError(f"backend must be 'postgres' or 'sqlite', not {backend!r}")
+        self.backend = backend
+        self.postgres = backend == 'postgres'
+        self.param = '%s' if self.postgres else '?'
+        overrides = POSTGRES_STATEMENTS if self.postgres else {}
+        self.sql = {name: self.compile(sql) for name, sql in {**STATEMENTS, **overrides}.items()}
+        # Session list queries by (has cursor, filters given), compiled on first use
+        self._list_queries = {}
+        if self.postgres:
+            from psycopg2.extras import execute_values
+            self._execute_values = execute_values
+
+    def compile(self, sql):
+        """Backend form of a statement written with ? placeholders"""
+        return sql.replace('?', '%s') if self.postgres else sql
+
+    def begin_write(self, cursor):
+        """Take SQLite's write lock now so a read and the writes after it agree"""
+        if not self.postgres:
+            cursor.execute('BEGIN IMMEDIATE')
+
+    # Sessions
+
+    def create_session(self, cursor, exercise_type, session_mode, start_time):
+        cursor.execute(self.sql['create_session'], (exercise_type, session_mode, start_time))
+        return cursor.fetchone()[0] if self.postgres else cursor.lastrowid
+
+    def list_sessions(self, cursor, limit, after=None, filters=None):
+        """
+        Up to `limit` sessions newest first, keyset-paginated on
+        (start_time, id) after the `after` pair; `filters` maps keys of
+        SESSION_FILTERS to values
+        """
+        filters = {arg: value for arg, value in (filters or {}).items() if value}
+        key = (after is not None, tuple(arg for arg in SESSION_FILTERS if arg in filters))
+        query = self._list_queries.get(key)
+        if query is None:
+            conditions = ['(start_time, id) < (?, ?)'] if after is not None else []
+            conditions += [f'{SESSION_FILTERS[arg][0]} {SESSION_FILTERS[arg][1]} ?' for arg in key[1]]
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            query = self._list_queries[key] = self.compile(
+                f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions {where} "
+                f"ORDER BY start_time DESC, id DESC LIMIT ?")
+        params = [*(after or ()), *(filters[arg] for arg in key[1]), limit]
+        cursor.execute(query, params)
+        return records(SESSION_COLUMNS, cursor.fetchall())
+
+    def get_session(self, cursor, session_id):
+        """A session with its reps, form events and compacted events, or None"""
+        cursor.execute(self.sql['get_session'], (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        session = dict(zip(SESSION_COLUMNS, row))
+        cursor.execute(self.sql['session_reps'], (session_id,))
+        session['reps'] = records(REP_COLUMNS, cursor.fetchall())
+        cursor.execute(self.sql['session_events'], (session_id,))
+        session['events'] = records(FORM_EVENT_COLUMNS, cursor.fetchall())
+        cursor.execute(self.sql['session_rollups'], (session_id,))
+        session['compacted_events'] = records(ROLLUP_COLUMNS, cursor.fetchall())
+        return session
+
+    def session_exists(self, cursor, session_id):
+        cursor.execute(self.sql['session_exists'], (session_id,))
+        return cursor.fetchone() is not None
+
+    def lock_session(self, cursor, session_id):
+        """Lock a session row for the current transaction and return
+        (exercise_type, status, total_reps, average_score), or None"""
+        self.begin_write(cursor)
+        cursor.execute(self.sql['lock_session'], (session_id,))
+        return cursor.fetchone()
+
+    def update_session(self, cursor, session_id, end_time, total_reps, average_score,
+                       duration_seconds, status):
+        cursor.execute(self.sql['update_session'], (
+            end_time, total_reps, average_score, duration_seconds, status, session_id))
+
+    def delete_session(self, cursor, session_id):
+        """Delete a session and every row belonging to it"""
+        for table in SESSION_CHILD_TABLES:
+            cursor.execute(self.sql[f'delete_{table}'], (session_id,))
+        cursor.execute(self.sql['delete_session'], (session_id,))
+
+    # Reps and form events
+
+    def insert_events(self, cursor, rep_rows, event_rows):
+        """Insert rep and form event rows with one statement per table"""
+        for name, rows in (('insert_reps', rep_rows), ('insert_form_events', event_rows)):
+            if not rows:
+                continue
+            if self.postgres:
+                self._execute_values(cursor, self.sql[name], rows)
+            else:
+                cursor.executemany(self.sql[name], rows)
+
+    def bulk_insert(self, cursor, table, columns, rows):
+        """Load row tuples into a table in the current transaction; returns the row count"""
+        names = ', '.join(columns)
+        if self.postgres:
+            # One COPY fed from the row iterator
+            reader = CsvReader(rows)
+            cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                               reader)
+            if 'id' in columns:
+                # Explicit ids bypass the SERIAL sequence; move it past them
+                cursor.execute(f'''
+                    SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+                    FROM {table}
+                ''')
+            return reader.rows
+
+        insert = f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(columns))})"
+        count = 0
+        for batch in batched(rows):
+            cursor.executemany(insert, batch)
+            count += len(batch)
+        return count
+
+    def export(self, conn, table, after_id=0):
+        """
+        Cursor over the rows of a table with id > after_id, in id order. On
+        PostgreSQL it is a named cursor, so the result stays on the server
+        and fetchmany pulls one batch at a time; SQLite steps through its
+        result the same way.
+        """
+        cursor = conn.cursor(f'export_{table}') if self.postgres else conn.cursor()
+        try:
+            cursor.execute(self.sql[f'export_{table}'], (after_id,))
+        except Exception:
+            cursor.close()
+            raise
+        return cursor
+
+    # Rollups and summaries
+
+    def update_exercise_stats(self, cursor, exercise_type, sessions_delta, reps_delta, score_delta):
+        """Apply a delta to the exercise_stats rollup row for one exercise"""
+        cursor.execute(self.sql['update_exercise_stats'],
+                       (exercise_type, sessions_delta, reps_delta, score_delta))
+
+    def rebuild_exercise_stats(self, cursor):
+        """Recompute the exercise_stats rollup from the sessions table"""
+        self.begin_write(cursor)
+        cursor.execute('DELETE FROM exercise_stats')
+        cursor.execute(EXERCISE_STATS_BACKFILL)
+
+    def exercise_stats(self, cursor):
+        """(exercise_type, session_count, total_reps, score_sum) per exercise"""
+        cursor.execute(self.sql['exercise_stats'])
+        return cursor.fetchall()
+
+    def delete_summaries(self, cursor, session_ids):
+        """Drop stored analytics summaries of sessions whose rows changed"""
+        if not session_ids:
+            return
+        marks = ', '.join([self.param] * len(session_ids))
+        cursor.execute(f'DELETE FROM session_summaries WHERE session_id IN ({marks})', tuple(session_ids))
+
+    def stored_summary(self, cursor, session_id):
+        """Stored summary JSON of a session, or None"""
+        cursor.execute(self.sql['stored_summary'], (session_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def store_summary(self, cursor, session_id, body, computed_at):
+        cursor.execute(self.sql['store_summary'], (session_id, body, computed_at))
+
+    def summary_inputs(self, cursor, session_id):
+        """(session, reps, form_counts) that analytics.session_summary works from, or None"""
+        cursor.execute(self.sql['summary_session'], (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        session = dict(zip(SUMMARY_SESSION_COLUMNS, row))
+        cursor.execute(self.sql['summary_reps'], (session_id,))
+        reps = records(SUMMARY_REP_COLUMNS, cursor.fetchall())
+        cursor.execute(self.sql['summary_form_counts'], (session_id, session_id))
+        form_counts = {status: int(count) for status, count in cursor.fetchall()}
+        return session, reps, form_counts
+
+    def sessions_missing_summaries(self, cursor, before):
+        """Ids of completed sessions with reps older than `before` (ISO text) and no stored summary"""
+        cursor.execute(self.sql['sessions_missing_summaries'], (before,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def exercise_trend(self, cursor, exercise, limit):
+        """analytics.exercise_trends rows of the last `limit` completed sessions, oldest first"""
+        cursor.execute(self.sql['exercise_trend'], (exercise, limit))
+        rows = cursor.fetchall()
+        rows.reverse()
+        return rows
@@ -0,0 +1,120 @@
+"""
+In-process response cache for read endpoints
+LRU + TTL eviction, tag-based invalidation and ETag/Last-Modified support
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+CacheEntry = namedtuple('CacheEntry', 'body mimetype etag last_modified expires tags')
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized GET responses, keyed by path + query string.
+
+    Entries carry tags such as 'stats' or 'session:42'; write endpoints call
+    invalidate() with the tags they affect. The cache is per worker process,
+    so with several gunicorn workers `ttl` bounds how long a worker that did
+    not see the write can keep serving the old body.
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body, mimetype, tags):
+        entry = CacheEntry(
+            body=body,
+            mimetype=mimetype,
+            etag=hashlib.sha1(body).hexdigest(),
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            expires=time.monotonic() + self.ttl,
+            tags=frozenset(tags)
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.tags & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def cached(self, *tag_templates):
+        """
+        Decorator for GET views. Tags may reference view arguments,
+        e.g. @cache.cached('session:{session_id}'). Non-GET requests and
+        non-200 responses pass through untouched.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET' or not self.enabled:
+                    return view(*args, **kwargs)
+
+                key = request.full_path
+                entry = self.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    tags = [t.format(**kwargs) for t in tag_templates]
+                    entry = self.set(key, response.get_data(), response.mimetype, tags)
+
+                response = make_response(entry.body)
+                response.mimetype = entry.mimetype
+                response.set_etag(entry.etag)
+                response.last_modified = entry.last_modified
+                # Let browsers keep the body but revalidate on every fetch
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+def cache_from_env():
+    """Build a ResponseCache configured from RESPONSE_CACHE_* environment variables"""
+    return ResponseCache(
+        max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', 256)),
+        ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 30)),
+    )
@@ -0,0 +1,273 @@
+"""
+Retention for the fast-growing reps and form_events tables
+Form events older than FORM_EVENT_RETENTION_DAYS are compacted into one
+form_event_rollups row per (session, event type, form status) and removed
+from the hot table; reps can be given a retention period the same way.
+
+PostgreSQL partitions both tables by month, so old rows leave as whole
+partitions (detached as plain tables to archive, or dropped) instead of row
+by row. SQLite moves old rows into a separate archive database file.
+
+Usage:
+    python retention.py              # compact/archive old rows, create upcoming partitions
+    python retention.py --dry-run    # show what would be removed
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from migrations import PG_LOCK_KEY
+
+# Days of raw form events kept in the hot table (0 keeps everything)
+FORM_EVENT_RETENTION_DAYS = int(os.environ.get('FORM_EVENT_RETENTION_DAYS', 90))
+# Days of reps kept in the hot table (0 keeps everything)
+REP_RETENTION_DAYS = int(os.environ.get('REP_RETENTION_DAYS', 0))
+# 'archive' keeps removed rows (detached partitions / ARCHIVE_PATH), 'delete' drops them
+RETENTION_ACTION = os.environ.get('RETENTION_ACTION', 'archive')
+# SQLite database file receiving archived rows
+ARCHIVE_PATH = os.environ.get('ARCHIVE_PATH', 'physio_archive.db')
+# Monthly partitions created ahead of time on PostgreSQL
+PARTITION_MONTHS_AHEAD = 2
+
+PARTITIONED_TABLES = ('reps', 'form_events')
+
+ROLLUP_SQL = '''
+    INSERT INTO form_event_rollups (session_id, event_type, form_status, event_count,
+                                    min_angle, max_angle, angle_sum, first_at, last_at)
+    SELECT session_id, event_type, COALESCE(form_status, 'NONE'), COUNT(*),
+           MIN(angle), MAX(angle), SUM(angle), MIN(timestamp), MAX(timestamp)
+    FROM {source}
+    WHERE {where}
+    GROUP BY session_id, event_type, COALESCE(form_status, 'NONE')
+    ON CONFLICT (session_id, event_type, form_status) DO UPDATE SET
+        event_count = form_event_rollups.event_count + excluded.event_count,
+        min_angle = {least}(COALESCE(form_event_rollups.min_angle, excluded.min_angle),
+                            COALESCE(excluded.min_angle, form_event_rollups.min_angle)),
+        max_angle = {greatest}(COALESCE(form_event_rollups.max_angle, excluded.max_angle),
+                               COALESCE(excluded.max_angle, form_event_rollups.max_angle)),
+        angle_sum = COALESCE(form_event_rollups.angle_sum, 0) + COALESCE(excluded.angle_sum, 0),
+        first_at = {least}(form_event_rollups.first_at, excluded.first_at),
+        last_at = {greatest}(form_event_rollups.last_at, excluded.last_at)
+'''
+
+
+def month_start(moment):
+    """First day (midnight) of the month containing `moment`"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_{month.year}_{month.month:02d}'
+
+
+def retention_cutoffs(now=None):
+    """{table: datetime before which rows leave the hot table} for tables with retention"""
+    now = now or datetime.now()
+    days = {'form_events': FORM_EVENT_RETENTION_DAYS, 'reps': REP_RETENTION_DAYS}
+    return {table: now - timedelta(days=d) for table, d in days.items() if d > 0}
+
+
+def _rollup(cursor, backend, source, where, params=()):
+    least, greatest = ('LEAST', 'GREATEST') if backend == 'postgres' else ('MIN', 'MAX')
+    cursor.execute(ROLLUP_SQL.format(source=source, where=where, least=least, greatest=greatest),
+                   params)
+
+
+# PostgreSQL
+
+def create_partition(cursor, table, month):
+    """
+    Create the partition of `table` for one month. Rows of that month that
+    already landed in the default partition are moved into it.
+    """
+    name = partition_name(table, month)
+    # Workers booting together all run this; the lock (held until the
+    # caller commits) makes the others wait and then find the partition
+    cursor.execute('SELECT pg_advisory_xact_lock(%s)', (PG_LOCK_KEY,))
+    cursor.execute('SELECT to_regclass(%s)', (name,))
+    if cursor.fetchone()[0]:
+        return False
+    bounds = (month, add_months(month, 1))
+    cursor.execute(f'CREATE TEMP TABLE moving (LIKE {table}) ON COMMIT DROP')
+    cursor.execute(f'''
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE timestamp >= %s AND timestamp < %s RETURNING *
+        )
+        INSERT INTO moving SELECT * FROM moved
+    ''', bounds)
+    cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)', bounds)
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM moving')
+    cursor.execute('DROP TABLE moving')
+    return True
+
+
+def ensure_partitions(conn, now=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create this month's and the next months' partitions; returns their names"""
+    current = month_start(now or datetime.now())
+    created = []
+    cursor = conn.cursor()
+    for table in PARTITIONED_TABLES:
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if create_partition(cursor, table, month):
+                created.append(partition_name(table, month))
+    conn.commit()
+    cursor.close()
+    return created
+
+
+def monthly_partitions(cursor, table):
+    """[(month, name)] of the attached monthly partitions of `table`, oldest first"""
+    cursor.execute('''
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE parent.relname = %s
+    ''', (table,))
+    partitions = []
+    for (name,) in cursor.fetchall():
+        suffix = name[len(table) + 1:].split('_')
+        if len(suffix) == 2 and all(part.isdigit() for part in suffix):
+            partitions.append((datetime(int(suffix[0]), int(suffix[1]), 1), name))
+    return sorted(partitions)
+
+
+def _archive_name(cursor, name):
+    """First free name of {name}_archived, {name}_archived_2, ... for a detached partition"""
+    archived, n = f'{name}_archived', 1
+    while True:
+        cursor.execute('SELECT to_regclass(%s)', (archived,))
+        if not cursor.fetchone()[0]:
+            return archived
+        n += 1
+        archived = f'{name}_archived_{n}'
+
+
+def _drop_foreign_keys(cursor, name):
+    """
+    Drop the foreign keys a detached partition kept from its parent. The
+    inherited ON DELETE CASCADE would otherwise delete archived rows along
+    with their session.
+    """
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                   (name,))
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+
+
+def _expire_postgres(conn, table, cutoff, dry_run):
+    """
+    Remove the monthly partitions wholly older than `cutoff`, so retention
+    is rounded up to whole months. Old rows that fell into the default
+    partition first get their own monthly partitions.
+    """
+    cursor = conn.cursor()
+    if not dry_run:
+        cursor.execute(f'''
+            SELECT DISTINCT date_trunc('month', timestamp) FROM {table}_default
+            WHERE timestamp < %s
+        ''', (month_start(cutoff),))
+        for (month,) in cursor.fetchall():
+            create_partition(cursor, table, month)
+        conn.commit()
+
+    removed = []
+    for month, name in monthly_partitions(cursor, table):
+        if add_months(month, 1) > cutoff:
+            break
+        removed.append(name)
+        if dry_run:
+            continue
+        # One transaction per partition: rolled up and detached together
+        if table == 'form_events':
+            _rollup(cursor, 'postgres', name, 'true')
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        if RETENTION_ACTION == 'delete':
+            cursor.execute(f'DROP TABLE {name}')
+        else:
+            # Renamed so a late row for that month gets a fresh partition
+            archived = _archive_name(cursor, name)
+            cursor.execute(f'ALTER TABLE {name} RENAME TO {archived}')
+            _drop_foreign_keys(cursor, archived)
+        conn.commit()
+    cursor.close()
+    return removed
+
+
+# SQLite
+
+def _expire_sqlite(conn, table, cutoff, dry_run):
+    """Compact, copy to ARCHIVE_PATH (unless deleting) and delete rows older than `cutoff`"""
+    cutoff = cutoff.isoformat()
+    cursor = conn.cursor()
+    if dry_run:
+        cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE timestamp < ?', (cutoff,))
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return [f'{count} rows of {table}'] if count else []
+
+    archive = RETENTION_ACTION != 'delete'
+    if archive:
+        # ATTACH is not allowed inside a transaction, so it comes first
+        cursor.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_PATH,))
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        if table == 'form_events':
+            _rollup(cursor, 'sqlite', 'form_events', 'timestamp < ?', (cutoff,))
+        if archive:
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0')
+            cursor.execute(f'INSERT INTO archive.{table} SELECT * FROM main.{table} WHERE timestamp < ?',
+                           (cutoff,))
+        cursor.execute(f'DELETE FROM main.{table} WHERE timestamp < ?', (cutoff,))
+        count = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if archive:
+            cursor.execute('DETACH DATABASE archive')
+        cursor.close()
+    return [f'{count} rows of {table}'] if count else []
+
+
+def expire(conn, backend, table, cutoff, dry_run=False):
+    """Move rows of `table` older than `cutoff` out of the hot table; returns what was removed"""
+    if backend == 'postgres':
+        return _expire_postgres(conn, table, cutoff, dry_run)
+    return _expire_sqlite(conn, table, cutoff, dry_run)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compact and archive old reps and form events')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be removed')
+    args = parser.parse_args()
+
+    from app import DATABASE_URL, get_db_connection, store_missing_summaries
+
+    backend = 'postgres' if DATABASE_URL else 'sqlite'
+    conn = get_db_connection()
+    cutoffs = retention_cutoffs()
+
+    if backend == 'postgres' and not args.dry_run:
+        for name in ensure_partitions(conn):
+            print(f"Created partition {name}")
+
+    if 'reps' in cutoffs and not args.dry_run:
+        # Summaries of completed sessions are computed from reps, so store
+        # them before those reps leave
+        stored = store_missing_summaries(conn, cutoffs['reps'])
+        print(f"Stored {stored} session summaries")
+
+    for table, cutoff in cutoffs.items():
+        removed = expire(conn, backend, table, cutoff, args.dry_run)
+        verb = 'Would remove' if args.dry_run else ('Archived' if RETENTION_ACTION != 'delete' else 'Deleted')
+        print(f"{table} before {cutoff:%Y-%m-%d}: {verb} {', '.join(removed) or 'nothing'}")
+    conn.close()
@@ -0,0 +1,267 @@
+"""
+Background telemetry uploader for the pose client
+Sends API calls off the capture thread, with retries and an on-disk spool
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SESSION_ID = '{session_id}'
+
+
+class TelemetryUploader:
+    """
+    Sends session/rep/form-event requests from a daemon thread.
+
+    Calls made from the frame loop only enqueue a job and never touch the
+    network. Jobs refer to sessions through a local session_ref, so reps can
+    be queued before the server has assigned an id. When the API cannot be
+    reached, jobs are appended to a JSONL spool and replayed in order once it
+    comes back - including on the next start of the client.
+    """
+
+    def __init__(self, api_url, spool_dir='telemetry_spool', max_queue=1000,
+                 max_retries=3, backoff=0.5, max_backoff=30.0, timeout=(3.05, 10)):
+        self.api_url = api_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.http = requests.Session()
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_path = os.path.join(spool_dir, 'pending.jsonl')
+        self.sessions_path = os.path.join(spool_dir, 'sessions.json')
+        self.spool_lock = threading.Lock()
+        self.session_ids = self._load_session_ids()
+
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.retry_at = 0.0
+        self.failures = 0
+        self.closing = threading.Event()
+        self.close_deadline = None
+
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # Producer side (called from the capture/inference threads)
+
+    def create_session(self, exercise_type, session_mode):
+        """Queue session creation; returns the local session_ref"""
+        session_ref = uuid.uuid4().hex
+        self.submit('POST', '/sessions', {
+            'exercise_type': exercise_type,
+            'session_mode': session_mode
+        }, session_ref=session_ref, bind=True)
+        return session_ref
+
+    def submit(self, method, path, payload, session_ref=None, bind=False, file_path=None):
+        """
+        Queue one API call without blocking; spools to disk when the queue is full.
+        With file_path the file is streamed as the request body instead of JSON.
+        """
+        job = {'method': method, 'path': path, 'json': payload,
+               'session_ref': session_ref, 'bind': bind, 'file_path': file_path}
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self._spool([job])
+
+    def session_id(self, session_ref):
+        """Server-side id for a session_ref, or None if not created yet"""
+        return self.session_ids.get(session_ref)
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def close(self, timeout=5.0):
+        """
+        Keep sending for up to `timeout` seconds; then the sender thread spools
+        whatever is left, in order, and exits. Only that thread touches the
+        queue, so a request in flight is never also spooled.
+        """
+        self.close_deadline = time.monotonic() + timeout
+        self.closing.set()
+        # A request in flight at the deadline still gets its HTTP timeout
+        request_timeout = sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+        self.thread.join(timeout + request_timeout + 1.0)
+        if self.thread.is_alive():
+            print("Telemetry sender still busy; it spools its remaining jobs when done")
+            return
+        self.http.close()
+
+    # Sender thread
+
+    def _worker(self):
+        while not self._finished():
+            if self._has_spool() and time.monotonic() >= self.retry_at:
+                self._replay_spool()
+
+            try:
+                job = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Keep ordering: while anything is spooled, new jobs queue behind it
+            if self._has_spool():
+                self._spool([job])
+                continue
+
+            if not self._send_with_retry(job):
+                self._spool([job])
+
+        # Closed: whatever was not sent goes to the spool behind the rest
+        leftover = []
+        while True:
+            try:
+                leftover.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._spool(leftover)
+
+    def _finished(self):
+        """True once close() was called and the queue is empty or its deadline passed"""
+        if not self.closing.is_set():
+            return False
+        if self._past_deadline():
+            return True
+        if self.jobs.empty():
+            # Last chance to deliver the spool before exiting
+            if self._has_spool():
+                self._replay_spool()
+            return True
+        return False
+
+    def _past_deadline(self):
+        return self.closing.is_set() and time.monotonic() >= self.close_deadline
+
+    def _send_with_retry(self, job):
+        """Send a job, retrying transient errors; False means spool it"""
+        for attempt in range(self.max_retries):
+            result = self._send(job)
+            if result is not None:
+                self.failures = 0
+                return result
+            if self._past_deadline():
+                break
+            time.sleep(min(self.backoff * 2 ** attempt, self.max_backoff))
+        self._schedule_retry()
+        return False
+
+    def _send(self, job):
+        """One HTTP attempt: True on success or permanent failure, None to retry"""
+        path = job['path']
+        payload = dict(job['json'] or {})
+        session_ref = job.get('session_ref')
+
+        if session_ref and not job.get('bind'):
+            session_id = self.session_ids.get(session_ref)
+            if session_id is None:
+                # The session was rejected by the server; nothing to attach to
+                print(f"Dropping telemetry for unknown session {session_ref}")
+                self.dropped += 1
+                return True
+            path = path.replace(SESSION_ID, str(session_id))
+            if 'session_id' in payload:
+                payload['session_id'] = session_id
+
+        try:
+            if job.get('file_path'):
+                with open(job['file_path'], 'rb') as f:
+                    response = self.http.request(
+                        job['method'], self.api_url + path, data=f, timeout=self.timeout,
+                        headers={'Content-Type': 'application/octet-stream'})
+            else:
+                response = self.http.request(job['method'], self.api_url + path,
+                                             json=payload, timeout=self.timeout)
+        except FileNotFoundError:
+            print(f"Dropping upload of missing file {job['file_path']}")
+            self.dropped += 1
+            return True
+        except requests.RequestException:
+            return None
+
+        if response.status_code >= 500:
+            return None
+        if response.status_code >= 400:
+            print(f"Telemetry rejected ({response.status_code}): {job['method']} {path}")
+            self.dropped += 1
+            return True
+
+        if job.get('bind'):
+            self.session_ids[session_ref] = response.json()['session_id']
+            self._save_session_ids()
+        self.sent += 1
+        return True
+
+    def _schedule_retry(self):
+        self.failures += 1
+        delay = min(self.backoff * 2 ** (self.max_retries + self.failures), self.max_backoff)
+        self.retry_at = time.monotonic() + delay
+
+    # On-disk spool
+
+    def _has_spool(self):
+        return os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) > 0
+
+    def _spool(self, jobs):
+        with self.spool_lock:
+            with open(self.spool_path, 'a') as f:
+                for job in jobs:
+                    f.write(json.dumps(job) + '\n')
+        self.spooled += len(jobs)
+
+    def _replay_spool(self):
+        """Send spooled jobs in order, keeping the unsent tail on failure"""
+        with self.spool_lock:
+            with open(self.spool_path) as f:
+                pending = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.spool_path)
+
+        for i, job in enumerate(pending):
+            if self._past_deadline():
+                self._unspool(pending[i:])
+                return
+            if self._send(job) is None:
+                self._unspool(pending[i:])
+                self._schedule_retry()
+                return
+        self.failures = 0
+
+    def _unspool(self, jobs):
+        """Put unsent jobs back at the head of the spool"""
+        with self.spool_lock:
+            # Jobs spooled meanwhile were appended after this batch
+            tail = []
+            if os.path.exists(self.spool_path):
+                with open(self.spool_path) as f:
+                    tail = f.readlines()
+            with open(self.spool_path, 'w') as f:
+                for remaining in jobs:
+                    f.write(json.dumps(remaining) + '\n')
+                f.writelines(tail)
+
+    def _load_session_ids(self):
+        try:
+            with open(self.sessions_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_session_ids(self):
+        with open(self.sessions_path, 'w') as f:
+            json.dump(self.session_ids, f)
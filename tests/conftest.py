@@ -0,0 +1,19 @@
+"""
+Shared fixtures: one app instance per test run on a throwaway SQLite database
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    # app reads its configuration at import time, once per process
+    os.environ.pop('DATABASE_URL', None)
+    os.environ['SQLITE_PATH'] = str(tmp_path_factory.mktemp('db') / 'physio_tracker.db')
+    import app
+    return app.app.test_client()
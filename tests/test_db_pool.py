@@ -0,0 +1,27 @@
+"""
+Connection pool tests
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import ConnectionPool
+
+
+def test_connection_is_returned_when_the_block_raises():
+    pool = ConnectionPool(lambda: sqlite3.connect(':memory:'), size=1, timeout=0.1)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError('response failed')
+
+    assert pool.stats()['checked_out'] == 0
+    # The single slot is free again instead of timing out
+    with pool.connection() as conn:
+        assert conn.execute('SELECT 1').fetchone() == (1,)
@@ -0,0 +1,27 @@
+"""
+Write-behind ingestion queue tests
+Run from the repository root: python -m pytest tests
+"""
+
+import threading
+
+from ingest_queue import IngestQueue
+
+
+def test_writer_survives_a_failing_on_commit_callback():
+    written = []
+
+    def on_commit(rep_rows, event_rows):
+        raise RuntimeError('cache backend down')
+
+    ingest = IngestQueue(lambda reps, events: written.extend(reps), durability='commit', on_commit=on_commit)
+    assert ingest.submit([('rep', 1)], [])
+
+    # A later request is still committed instead of waiting forever
+    second = threading.Thread(target=ingest.submit, args=([('rep', 2)], []), daemon=True)
+    second.start()
+    second.join(5)
+    assert not second.is_alive()
+    assert written == [('rep', 1), ('rep', 2)]
+    assert ingest.thread.is_alive()
+    ingest.close()
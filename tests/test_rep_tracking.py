@@ -0,0 +1,76 @@
+"""
+Live and offline rep tracking over the same landmark series
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pose_angles import EXERCISE_JOINTS, NUM_LANDMARKS, AngleEngine
+from rep_scoring import RepTracker, count_reps
+
+FPS = 30.0
+
+
+def frame(exercise, right, left):
+    """(33, 4) landmarks whose joint angles are right/left degrees; None hides that side"""
+    landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    for side, angle, x in (('right', right, 0.3), ('left', left, 0.7)):
+        if angle is None:
+            continue
+        a, b, c = EXERCISE_JOINTS[exercise][side]
+        theta = np.radians(angle)
+        landmarks[b] = (x, 0.5, 0.0, 1.0)
+        landmarks[a] = (x, 0.7, 0.0, 1.0)
+        landmarks[c] = (x + 0.2 * np.sin(theta), 0.5 + 0.2 * np.cos(theta), 0.0, 1.0)
+    return landmarks
+
+
+def motion(rest, peak, reps, seconds_per_rep=2.0):
+    """Joint angle per frame moving rest -> peak -> rest `reps` times"""
+    t = np.arange(int(reps * seconds_per_rep * FPS)) / FPS
+    return rest + (peak - rest) * (1 - np.cos(2 * np.pi * t / seconds_per_rep)) / 2
+
+
+def live_reps(exercise, frames):
+    """Per-frame path of the live client: NaN for hidden joints into RepTracker.update"""
+    engine = AngleEngine()
+    tracker = RepTracker.live(exercise, FPS)
+    for i, landmarks in enumerate(frames):
+        angles = engine.bilateral(landmarks, exercise, fill=np.nan)
+        tracker.update(angles['right'], angles['left'], i / FPS)
+    return tracker.repcount
+
+
+def offline_reps(exercise, frames):
+    """Batch analysis / re-scoring path over the whole stack"""
+    angles = AngleEngine().bilateral_series(np.stack(frames), exercise, fill=np.nan)
+    reps, _ = count_reps(angles, exercise, FPS)
+    return len(reps)
+
+
+def test_abduction_with_one_arm_hidden():
+    frames = [frame('abduction', angle, None) for angle in motion(20, 160, 5)]
+    assert offline_reps('abduction', frames) == 5
+    assert live_reps('abduction', frames) == 5
+
+
+def test_squat_with_landmarks_dropping_out_mid_rep():
+    angles = motion(175, 80, 5)
+    # Both legs lost for a third of a second around the bottom of every rep
+    hidden = np.abs(((np.arange(len(angles)) / FPS) % 2.0) - 1.0) < 1 / 6
+    frames = [frame('squat', None, None) if gone else frame('squat', angle, angle)
+              for angle, gone in zip(angles, hidden)]
+    assert offline_reps('squat', frames) == 5
+    assert live_reps('squat', frames) == 5
+
+
+@pytest.mark.parametrize('exercise, rest, peak', [('squat', 175, 80), ('elbow', 170, 30)])
+def test_live_and_offline_agree_on_visible_motion(exercise, rest, peak):
+    frames = [frame(exercise, angle, angle + 5) for angle in motion(rest, peak, 4)]
+    assert live_reps(exercise, frames) == offline_reps(exercise, frames) == 4
@@ -0,0 +1,100 @@
+"""
+Retention tests: archived rows outlive the session they belonged to
+The PostgreSQL test needs TEST_DATABASE_URL pointing at a throwaway database
+Run from the repository root: python -m pytest tests
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import retention
+from migrations import _PARTITIONED_COLUMNS
+
+OLD = datetime(2020, 1, 15)
+CUTOFF = datetime(2021, 1, 1)
+
+
+def test_sqlite_archived_rows_survive_session_delete(client, tmp_path, monkeypatch):
+    import app
+
+    archive_path = str(tmp_path / 'archive.db')
+    monkeypatch.setattr(retention, 'ARCHIVE_PATH', archive_path)
+    monkeypatch.setattr(retention, 'RETENTION_ACTION', 'archive')
+
+    response = client.post('/api/sessions', json={'exercise_type': 'squat', 'session_mode': 'solo'})
+    session_id = response.get_json()['session_id']
+    client.post('/api/reps', json={'session_id': session_id, 'rep_number': 1, 'score': 90,
+                                   'timestamp': OLD.isoformat()})
+
+    with app.db_pool.connection() as conn:
+        assert retention.expire(conn, 'sqlite', 'reps', CUTOFF) == ['1 rows of reps']
+    assert client.delete(f'/api/sessions/{session_id}/delete').status_code == 200
+
+    archive = sqlite3.connect(archive_path)
+    rows = archive.execute('SELECT COUNT(*) FROM reps WHERE session_id = ?', (session_id,)).fetchone()
+    archive.close()
+    assert rows == (1,)
+
+
+@pytest.fixture
+def pg_conn():
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL not set')
+    psycopg2 = pytest.importorskip('psycopg2')
+    conn = psycopg2.connect(url)
+    schema = f'retention_test_{os.getpid()}'
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE SCHEMA {schema}')
+    cursor.execute(f'SET search_path TO {schema}')
+    cursor.execute('CREATE TABLE sessions (id SERIAL PRIMARY KEY)')
+    cursor.execute('CREATE SEQUENCE reps_id_seq')
+    cursor.execute(f"CREATE TABLE reps ({_PARTITIONED_COLUMNS['reps']}, PRIMARY KEY (id, timestamp))"
+                   f' PARTITION BY RANGE (timestamp)')
+    cursor.execute('CREATE TABLE reps_default PARTITION OF reps DEFAULT')
+    conn.commit()
+    yield conn
+    conn.rollback()
+    cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+    conn.commit()
+    conn.close()
+
+
+def test_postgres_archived_partition_survives_session_delete(pg_conn, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_ACTION', 'archive')
+    cursor = pg_conn.cursor()
+    cursor.execute('INSERT INTO sessions DEFAULT VALUES RETURNING id')
+    session_id = cursor.fetchone()[0]
+    cursor.execute('INSERT INTO reps (session_id, rep_number, score, timestamp) VALUES (%s, 1, 90, %s)',
+                   (session_id, OLD))
+    pg_conn.commit()
+
+    assert retention.expire(pg_conn, 'postgres', 'reps', CUTOFF) == ['reps_2020_01']
+
+    cursor.execute('DELETE FROM sessions WHERE id = %s', (session_id,))
+    pg_conn.commit()
+    cursor.execute('SELECT COUNT(*) FROM reps_2020_01_archived WHERE session_id = %s', (session_id,))
+    assert cursor.fetchone() == (1,)
+
+
+def test_postgres_archived_month_gets_a_new_partition(pg_conn, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_ACTION', 'archive')
+    cursor = pg_conn.cursor()
+    cursor.execute('INSERT INTO sessions DEFAULT VALUES RETURNING id')
+    session_id = cursor.fetchone()[0]
+    insert = 'INSERT INTO reps (session_id, rep_number, score, timestamp) VALUES (%s, %s, 90, %s)'
+    cursor.execute(insert, (session_id, 1, OLD))
+    pg_conn.commit()
+    assert retention.expire(pg_conn, 'postgres', 'reps', CUTOFF) == ['reps_2020_01']
+
+    # A back-filled row for the archived month leaves the default partition again
+    cursor.execute(insert, (session_id, 2, OLD))
+    pg_conn.commit()
+    assert retention.expire(pg_conn, 'postgres', 'reps', CUTOFF) == ['reps_2020_01']
+    cursor.execute('SELECT COUNT(*) FROM reps_default')
+    assert cursor.fetchone() == (0,)
+    cursor.execute('SELECT COUNT(*) FROM reps_2020_01_archived_2')
+    assert cursor.fetchone() == (1,)
@@ -0,0 +1,125 @@
+"""
+Session API tests against a throwaway SQLite database
+Run from the repository root: python -m pytest tests
+"""
+
+import json
+
+import pytest
+
+
+def create_session(client, exercise_type='squat'):
+    response = client.post('/api/sessions', json={'exercise_type': exercise_type, 'session_mode': 'solo'})
+    assert response.status_code == 200
+    return response.get_json()['session_id']
+
+
+def test_put_with_null_score_and_reps_counts_as_zero(client):
+    session_id = create_session(client, 'null_score')
+    response = client.put(f'/api/sessions/{session_id}', json={
+        'total_reps': None, 'average_score': None, 'duration_seconds': None, 'status': 'completed'})
+    assert response.status_code == 200
+
+    session = client.get(f'/api/sessions/{session_id}').get_json()
+    assert session['status'] == 'completed'
+    assert session['total_reps'] == 0
+    assert session['average_score'] == 0
+
+    stats = client.get('/api/stats').get_json()
+    breakdown = {row['exercise_type']: row for row in stats['exercise_breakdown']}
+    assert breakdown['null_score']['session_count'] == 1
+    assert breakdown['null_score']['total_reps'] == 0
+    assert breakdown['null_score']['avg_score'] == 0
+
+
+def test_put_again_replaces_null_score_in_stats(client):
+    session_id = create_session(client, 'rescored')
+    client.put(f'/api/sessions/{session_id}', json={'average_score': None})
+    client.put(f'/api/sessions/{session_id}', json={'total_reps': 5, 'average_score': 80.0})
+
+    stats = client.get('/api/stats').get_json()
+    breakdown = {row['exercise_type']: row for row in stats['exercise_breakdown']}
+    assert breakdown['rescored'] == {
+        'exercise_type': 'rescored', 'session_count': 1, 'total_reps': 5, 'avg_score': 80.0}
+
+
+@pytest.mark.parametrize('body', [[{'rep_number': 1, 'score': 90}], 'reps', 3])
+def test_batch_rejects_a_body_that_is_not_an_object(client, body):
+    session_id = create_session(client, 'batch_shape')
+    response = client.post(f'/api/sessions/{session_id}/events:batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_rep_without_angle_has_no_range_of_motion(client):
+    session_id = create_session(client, 'squat')
+    client.post('/api/reps', json={'session_id': session_id, 'rep_number': 1, 'score': 90, 'best_angle': 85.0})
+    client.post('/api/reps', json={'session_id': session_id, 'rep_number': 2, 'score': 80})
+
+    summary = client.get(f'/api/sessions/{session_id}/summary').get_json()
+    assert summary['reps']['best_angle'] == [85.0, None]
+    assert summary['reps']['range_of_motion'][1] is None
+    assert summary['range_of_motion']['best'] == summary['reps']['range_of_motion'][0]
+
+
+def test_summary_is_stored_only_once_the_session_is_completed(client):
+    import app
+
+    session_id = create_session(client, 'squat')
+    client.post('/api/reps', json={'session_id': session_id, 'rep_number': 1, 'score': 90, 'best_angle': 85.0})
+
+    assert client.get(f'/api/sessions/{session_id}/summary').get_json()['status'] == 'active'
+    with app.db_cursor() as cursor:
+        assert app.repository.stored_summary(cursor, session_id) is None
+
+    client.put(f'/api/sessions/{session_id}', json={'total_reps': 1, 'average_score': 90.0})
+    assert client.get(f'/api/sessions/{session_id}/summary').get_json()['status'] == 'completed'
+    with app.db_cursor() as cursor:
+        assert app.repository.stored_summary(cursor, session_id) is not None
+
+
+def test_summary_of_missing_session_is_404(client):
+    assert client.get('/api/sessions/999999/summary').status_code == 404
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'columnar'])
+def test_import_loads_an_export_of_reps(client, fmt):
+    session_id = create_session(client, 'import_' + fmt)
+    for number in (1, 2):
+        client.post('/api/reps', json={'session_id': session_id, 'rep_number': number, 'score': 80 + number})
+    exported = client.get(f'/api/export/reps?format={fmt}').data
+
+    copy_id = create_session(client, 'import_' + fmt)
+    if fmt == 'ndjson':
+        lines = [json.loads(line) for line in exported.splitlines()]
+        body = '\n'.join(json.dumps({**{k: v for k, v in rep.items() if k != 'id'}, 'session_id': copy_id})
+                         for rep in lines if rep['session_id'] == session_id)
+        response = client.post('/api/import/reps', data=body)
+        assert response.get_json() == {'status': 'success', 'table': 'reps', 'rows': 2}
+    else:
+        # Rows keeping their ids collide with the originals; nothing is written
+        response = client.post('/api/import/reps?format=columnar', data=exported)
+        assert response.status_code == 400
+
+    detail = client.get(f'/api/sessions/{copy_id}/summary').get_json()
+    assert detail['total_reps'] == (2 if fmt == 'ndjson' else 0)
+
+
+@pytest.mark.parametrize('limit, expected', [('-1', 1), ('0', 1), ('1000', 2)])
+def test_trend_limit_is_clamped(client, limit, expected):
+    for _ in range(2):
+        session_id = create_session(client, f'trend_limit_{limit}')
+        client.put(f'/api/sessions/{session_id}', json={'total_reps': 1, 'average_score': 80.0})
+
+    response = client.get(f'/api/exercises/trend_limit_{limit}/trends?limit={limit}')
+    assert response.status_code == 200
+    assert response.get_json()['sessions'] == expected
+
+
+@pytest.mark.parametrize('seconds, status', [('-1', 200), ('0', 200), ('soon', 400)])
+def test_profile_seconds_are_clamped(client, monkeypatch, seconds, status):
+    import app
+
+    monkeypatch.setattr(app, 'PROFILER_ENABLED', True)
+    response = client.get(f'/api/debug/profile?seconds={seconds}')
+    assert response.status_code == status